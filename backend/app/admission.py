@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Lower rank is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# Priority class of the pipeline running in the current task/thread;
+# run_in_threadpool copies it into the worker thread.
+current_priority = contextvars.ContextVar("current_priority", default="interactive")
+
+
+def priority_rank(priority: str) -> int:
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority}; use one of {', '.join(PRIORITIES)}")
+    return PRIORITIES[priority]
+
+
+class QueueFull(Exception):
+    """Raised when the admission queue is full; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class WaitStats:
+    """Rolling window of queue wait times."""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {"avg_wait_ms": 0.0, "p95_wait_ms": 0.0, "max_wait_ms": 0.0}
+        p95 = samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+        return {
+            "avg_wait_ms": round(sum(samples) / len(samples) * 1000, 1),
+            "p95_wait_ms": round(p95 * 1000, 1),
+            "max_wait_ms": round(samples[-1] * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """
+    Bounds the number of /query pipelines in flight. Requests beyond the limit
+    wait in a priority queue (interactive before batch, FIFO within a class);
+    once max_queue requests are waiting, new ones are rejected with QueueFull
+    instead of piling up behind exhausted LLM and DB capacity.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.rejected = 0
+        self.admitted = 0
+        self.waits = WaitStats()
+        self._waiters = []  # heap of (rank, seq, future, priority)
+        self._seq = itertools.count()
+        self._service_time = None  # smoothed seconds per pipeline
+
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {priority: 0 for priority in PRIORITIES}
+        for _, _, future, priority in self._waiters:
+            if not future.done():
+                depth[priority] += 1
+        return depth
+
+    def retry_after(self) -> int:
+        service_time = self._service_time or 1.0
+        waiting = len(self._waiters) + 1
+        return max(1, math.ceil(service_time * waiting / self.max_concurrent))
+
+    async def acquire(self, priority: str = "interactive", bounded: bool = True) -> float:
+        """
+        Wait for a pipeline slot and return the time spent queued.
+
+        Args:
+            priority: Priority class ("interactive" or "batch")
+            bounded: If False, wait even when the queue is full (used by batch
+                requests, which already bound their own concurrency)
+
+        Raises:
+            QueueFull: If bounded and max_queue requests are already waiting
+        """
+        rank = priority_rank(priority)
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self.waits.add(0.0)
+            return 0.0
+        if bounded and len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        entry = (rank, next(self._seq), future, priority)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        waited = time.perf_counter() - start
+        self.admitted += 1
+        self.waits.add(waited)
+        return waited
+
+    def release(self, service_time: Optional[float] = None):
+        if service_time is not None:
+            self._service_time = service_time if self._service_time is None else (
+                0.8 * self._service_time + 0.2 * service_time)
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self.queue_depth(),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            **self.waits.summary(),
+        }
+
+
+class PrioritySlots:
+    """
+    Thread-safe counting semaphore that wakes waiters by priority class.
+
+    Used as a context manager around LLM calls and SQL executions; the
+    priority comes from current_priority, so interactive pipelines get the
+    next free slot ahead of batch ones.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self.waits = WaitStats()
+        self._waiters = []  # heap of (rank, seq)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        start = time.perf_counter()
+        entry = (priority_rank(current_priority.get()), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            while self.in_use >= self.limit or self._waiters[0] != entry:
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self.in_use += 1
+            # Let the next waiter re-check in case more slots are free
+            self._cond.notify_all()
+        self.waits.add(time.perf_counter() - start)
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"in_use": self.in_use, "limit": self.limit, "waiting": len(self._waiters),
+                    **self.waits.summary()}
@@ -2,12 +2,17 @@ from typing import Dict, Any, Optional
 import logging
 import json
 import os
-import anthropic
 import sys
+import time
 from dotenv import load_dotenv
+from src.mssql.cache import cache_from_env
+from .admission import PrioritySlots
+from .llm import CircuitBreaker, LLMClient, LLMError
+from .logs import log_event
+from .results import ResultStore
+from .session import LOCAL_MARKER, SessionStore, is_local_query, is_truncated, result_to_rows
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and the root level are set up by api.configure_logging
 logger = logging.getLogger("answer")
 
 # Load environment variables
@@ -16,18 +21,113 @@ load_dotenv()
 # Initialize MCP client and check if we're running in MCP context
 IN_MCP = "MCP_FUNCTION" in os.environ
 
-# Try to import anthropic
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
-    if ANTHROPIC_API_KEY:
-        anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY)
-    else:
+# Upper bounds on concurrent LLM calls and SQL executions across every
+# pipeline in this process; interactive pipelines get free slots before batch ones
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", "8"))
+llm_slots = PrioritySlots(LLM_CONCURRENCY)
+db_slots = PrioritySlots(DB_CONCURRENCY)
+
+# Resilient LLM calls: hedge a call still running past the observed p95,
+# retry overload errors with jittered backoff, and fail fast while the
+# circuit breaker is open
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+llm = LLMClient(
+    lambda: get_anthropic_client(),
+    slots=llm_slots,
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+    hedge=os.getenv("LLM_HEDGE", "true").lower() not in ("0", "false", "no"),
+    hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0")),
+    hedge_max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1")),
+    breaker=CircuitBreaker(
+        threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+    ),
+)
+
+# Shared on-disk cache for NL->SQL translations and query results, usable by
+# every uvicorn worker (None unless MSSQL_CACHE_PATH is set)
+cache = cache_from_env()
+# Model that translates questions to SQL; part of the NL->SQL cache key
+SQL_MODEL = "claude-3-opus-20240229"
+SQL_CACHE_TTL = float(os.getenv("MSSQL_SQL_CACHE_TTL", "86400"))
+RESULT_CACHE_TTL = float(os.getenv("MSSQL_RESULT_CACHE_TTL", "300"))
+
+# Recent result sets per conversation, so follow-up questions can be answered
+# from an in-memory SQLite copy instead of another SQL Server round trip
+sessions = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX", "200")),
+    max_results=int(os.getenv("SESSION_MAX_RESULTS", "3")),
+    max_rows=int(os.getenv("SESSION_MAX_ROWS", "50000")),
+    ttl=float(os.getenv("SESSION_TTL", "1800")),
+)
+
+# Full result sets of recent answers, paged to the frontend via /results
+results = ResultStore(
+    max_rows=int(os.getenv("RESULT_STORE_MAX_ROWS", "1000000")),
+    ttl=float(os.getenv("RESULT_STORE_TTL", "1800")),
+)
+
+# The Anthropic SDK is slow to import, so the client is built on first use
+# (or by warm_up at startup). Tests may set anthropic_client directly.
+_UNSET = object()
+anthropic_client = _UNSET
+
+# Cached SQL documentation; fetched once per process
+_sql_docs = None
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
+
+def get_anthropic_client():
+    """
+    Return the shared Anthropic client, creating it on first use.
+
+    Returns:
+        Anthropic client, or None if AI features are disabled
+    """
+    global anthropic_client
+    if anthropic_client is not _UNSET:
+        return anthropic_client
+    try:
+        from anthropic import Anthropic
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if api_key:
+            # Retries are handled by the llm layer, not the SDK
+            anthropic_client = Anthropic(api_key=api_key, max_retries=0, timeout=LLM_TIMEOUT)
+        else:
+            anthropic_client = None
+            logger.warning("No ANTHROPIC_API_KEY found, AI features will be disabled")
+    except ImportError:
         anthropic_client = None
-        logger.warning("No ANTHROPIC_API_KEY found, AI features will be disabled")
-except ImportError:
-    anthropic_client = None
-    logger.warning("anthropic package not found, AI features will be disabled")
+        logger.warning("anthropic package not found, AI features will be disabled")
+    return anthropic_client
+
+
+def warm_up():
+    """
+    Build the Anthropic client, fetch the SQL documentation and preload the
+    shared cache ahead of the first request.
+
+    Returns:
+        dict: Time taken by each step in milliseconds
+    """
+    timings = {}
+    steps = (
+        ("anthropic_client", get_anthropic_client),
+        ("sql_docs", get_sql_documentation),
+        ("cache", lambda: cache.preload() if cache else None),
+    )
+    for step, func in steps:
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"Warm-up step {step} failed: {str(e)}")
+        timings[f"{step}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
 
 def get_sql_documentation():
     """
@@ -36,6 +136,10 @@ def get_sql_documentation():
     Returns:
         str: SQL documentation or empty string if Context7 is not available
     """
+    global _sql_docs
+    if _sql_docs:
+        return _sql_docs
+
     if not IN_MCP:
         logger.warning("Not running in MCP context, cannot fetch SQL documentation")
         return ""
@@ -59,7 +163,8 @@ def get_sql_documentation():
         )
         
         if docs_result and "textContent" in docs_result:
-            return docs_result["textContent"]
+            _sql_docs = docs_result["textContent"]
+            return _sql_docs
         else:
             logger.warning("Could not fetch SQL Server documentation")
             return ""
@@ -67,12 +172,25 @@ def get_sql_documentation():
         logger.error(f"Error fetching SQL documentation: {str(e)}")
         return ""
 
-def execute_sql_query(sql_query):
+def database_scope() -> str:
+    """Prefix for cache keys; the cache file may be shared by processes on other databases."""
+    return f"{os.getenv('MSSQL_SERVER')}/{os.getenv('MSSQL_DATABASE')}"
+
+def answer_cache_key(question):
+    """Cache key for a warmed answer."""
+    return f"{database_scope()}\n{normalize_question(question)}"
+
+def result_cache_key(sql_query):
+    """Cache key for a query's result."""
+    return f"{database_scope()}\n{sql_query}"
+
+def execute_sql_query(sql_query, refresh=False):
     """
     Execute an SQL query using the MCP SQL server.
     
     Args:
         sql_query: SQL query to execute
+        refresh: Skip the cached result and store a fresh one
         
     Returns:
         dict: Query result or error
@@ -81,77 +199,115 @@ def execute_sql_query(sql_query):
         logger.warning("Not running in MCP context, cannot execute SQL query")
         return {"error": "Not running in MCP context"}
     
+    if cache and not refresh:
+        cached = cache.get("api_result", result_cache_key(sql_query))
+        if cached is not None:
+            return cached
+    
     try:
         from mcp.function import execute_sql
         
         # Call the MCP SQL server to execute the query
-        result = execute_sql(query=sql_query)
+        with db_slots:
+            result = execute_sql(query=sql_query)
         
         # Parse the result
         if isinstance(result, str):
             try:
-                return json.loads(result)
+                result = json.loads(result)
             except json.JSONDecodeError:
-                return {"data": result}
+                result = {"data": result}
+        # Budgets depend on concurrent load, so truncated results are not cached
+        if cache and not (isinstance(result, dict) and "error" in result) and not is_truncated(result):
+            cache.set("api_result", result_cache_key(sql_query), result, ttl=RESULT_CACHE_TTL)
         return result
     except Exception as e:
         logger.error(f"Error executing SQL query: {str(e)}")
         return {"error": str(e)}
 
-def generate_sql_from_question(question, docs=""):
+def generate_sql_from_question(question, docs="", session_context=""):
     """
     Use AI to generate an SQL query from a natural language question.
     
     Args:
         question: Natural language question
         docs: SQL documentation to help the AI
+        session_context: Description of the conversation's cached result
+            tables; when given, the AI may answer with a SQLite query over
+            them, marked by a leading LOCAL_MARKER line
         
     Returns:
         str: SQL query
+
+    Raises:
+        LLMError: If the AI service failed or is unavailable; the caller must
+            not execute anything in that case
     """
-    if not anthropic_client:
+    # Translations depend on the database's schema and the model; follow-ups
+    # also depend on the cached tables, so they get their own key
+    cache_key = f"{database_scope()}\n{SQL_MODEL}\n{normalize_question(question)}"
+    if session_context:
+        cache_key += "\n" + session_context
+    if cache:
+        cached = cache.get("nl2sql", cache_key)
+        if cached is not None:
+            return cached
+    
+    client = get_anthropic_client()
+    if not client:
         # If no AI is available, return a placeholder query
         logger.warning("No AI client available, returning placeholder query")
         return "SELECT 'AI not available' AS message"
     
-    try:
-        # Create a prompt for the AI
-        prompt = f"""You are an expert SQL developer. Convert the following natural language question into a SQL query for SQL Server. 
+    # Create a prompt for the AI
+    prompt = f"""You are an expert SQL developer. Convert the following natural language question into a SQL query for SQL Server. 
 The query should be valid SQL that could be executed against a database.
 Only return the SQL query itself, nothing else.
 
 {docs}
-
+"""
+    if session_context:
+        prompt += f"""
+Earlier in this conversation these results were fetched and are cached locally as SQLite tables:
+{session_context}
+If the question can be answered entirely from these tables (for example by sorting, filtering or
+aggregating an earlier result), write a SQLite query over them instead, and make its first line
+exactly "{LOCAL_MARKER}". Otherwise write a SQL Server query as usual.
+"""
+    prompt += f"""
 Question: {question}
 
 SQL query:"""
 
-        # Call the Anthropic API
-        response = anthropic_client.messages.create(
-            model="claude-3-opus-20240229",
+    # Call the Anthropic API
+    try:
+        response = llm.create(
+            model=SQL_MODEL,
             max_tokens=1000,
             messages=[
                 {"role": "user", "content": prompt}
             ]
         )
-        
-        # Extract the SQL query from the response
-        if response and response.content:
-            sql_query = response.content[0].text.strip()
-            # Clean up any markdown code blocks
-            if sql_query.startswith("```sql"):
-                sql_query = sql_query[6:]
-            if sql_query.startswith("```"):
-                sql_query = sql_query[3:]
-            if sql_query.endswith("```"):
-                sql_query = sql_query[:-3]
-            return sql_query.strip()
-        else:
-            logger.error("Empty response from AI")
-            return "SELECT 'AI error: empty response' AS message"
-    except Exception as e:
+    except LLMError as e:
         logger.error(f"Error generating SQL from question: {str(e)}")
-        return f"SELECT 'AI error: {str(e)}' AS message"
+        raise
+
+    # Extract the SQL query from the response
+    if not (response and response.content):
+        logger.error("Empty response from AI")
+        raise LLMError("empty response")
+    sql_query = response.content[0].text.strip()
+    # Clean up any markdown code blocks
+    if sql_query.startswith("```sql"):
+        sql_query = sql_query[6:]
+    if sql_query.startswith("```"):
+        sql_query = sql_query[3:]
+    if sql_query.endswith("```"):
+        sql_query = sql_query[:-3]
+    sql_query = sql_query.strip()
+    if cache:
+        cache.set("nl2sql", cache_key, sql_query, ttl=SQL_CACHE_TTL)
+    return sql_query
 
 def generate_answer_from_result(question, sql_query, result):
     """
@@ -165,7 +321,8 @@ def generate_answer_from_result(question, sql_query, result):
     Returns:
         str: Natural language answer
     """
-    if not anthropic_client:
+    client = get_anthropic_client()
+    if not client:
         # If no AI is available, return a simple answer
         logger.warning("No AI client available, returning simple answer")
         return f"Here's the result of your query: {result}"
@@ -196,7 +353,7 @@ Explain the data in a way that directly answers their question. Be conversationa
 """
 
         # Call the Anthropic API
-        response = anthropic_client.messages.create(
+        response = llm.create(
             model="claude-3-haiku-20240307",
             max_tokens=1000,
             messages=[
@@ -214,35 +371,114 @@ Explain the data in a way that directly answers their question. Be conversationa
         logger.error(f"Error generating answer from result: {str(e)}")
         return f"Here's the result of your query: {result} (Error: {str(e)})"
 
-def answer_question(question: str) -> Dict[str, Any]:
+def warm_answer(question: str, ttl: float) -> Dict[str, Any]:
+    """
+    Precompute the full answer to a question with a fresh result and store it
+    in the shared cache, so answer_question can serve it without calling the
+    LLM or the database.
+
+    Raises:
+        LLMError: If SQL generation failed
+        RuntimeError: If the cache is not configured or the query failed
+    """
+    if not cache:
+        raise RuntimeError("Answer warming needs the shared cache (set MSSQL_CACHE_PATH)")
+    docs = get_sql_documentation()
+    sql_query = generate_sql_from_question(question, docs)
+    result = execute_sql_query(sql_query, refresh=True)
+    if isinstance(result, dict) and "error" in result:
+        raise RuntimeError(result["error"])
+    if is_truncated(result):
+        raise RuntimeError("Result exceeded the memory budget; a partial answer is not warmed")
+    warmed = {"answer": generate_answer_from_result(question, sql_query, result), "sql": sql_query}
+    # The result is stored with the answer: the result cache entry expires
+    # after RESULT_CACHE_TTL, long before a warmed answer does
+    cache.set("answer", answer_cache_key(question), {**warmed, "result": result}, ttl=ttl)
+    return warmed
+
+def _with_result_handle(response: Dict[str, Any], result) -> Dict[str, Any]:
+    parsed = result_to_rows(result)
+    if parsed is not None:
+        columns, rows = parsed
+        result_id = results.put(columns, rows)
+        if result_id:
+            response.update(result_id=result_id, columns=columns, row_count=len(rows))
+            if is_truncated(result):
+                response["truncated"] = True
+    return response
+
+def _ai_unavailable(error: Exception) -> Dict[str, Any]:
+    return {
+        "answer": f"The AI service is unavailable right now, please try again shortly. ({str(error)})",
+        "sql": None
+    }
+
+def answer_question(question: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Main function to answer a natural language question about the database.
     
     Args:
         question: Natural language question
+        session_id: Conversation id; recent results of the session are kept
+            locally so follow-ups can be answered without querying SQL Server
         
     Returns:
-        dict: Answer and SQL query (if available)
+        dict: Answer and SQL query (if available), plus result_id, columns
+        and row_count when the result is tabular and can be paged
     """
-    logger.info(f"Processing question: {question}")
+    log_event(logger, "processing_question", question=question, session_id=session_id)
     
+    # Answers precomputed by the warmer are served as-is, unless the question
+    # may be a follow-up that depends on the session's earlier results
+    session = sessions.get(session_id) if session_id else None
+    if cache and not (session and session.results):
+        warmed = cache.get("answer", answer_cache_key(question))
+        if warmed is not None:
+            log_event(logger, "warmed_answer", question=question)
+            response = {"answer": warmed["answer"], "sql": warmed["sql"]}
+            return _with_result_handle(response, warmed.get("result"))
+
     # Get SQL documentation if available in MCP context
     docs = get_sql_documentation()
+    session_context = session.describe() if session else ""
     
     # Generate SQL query from the question using AI
-    sql_query = generate_sql_from_question(question, docs)
-    logger.info(f"Generated SQL query: {sql_query}")
+    try:
+        sql_query = generate_sql_from_question(question, docs, session_context=session_context)
+    except LLMError as e:
+        # Nothing was generated, so there is nothing to execute
+        return _ai_unavailable(e)
+    log_event(logger, "generated_sql", sql=sql_query)
     
-    # Execute the SQL query
-    result = execute_sql_query(sql_query)
-    logger.info(f"Query result: {result}")
+    # Execute the SQL query, locally if it refines a cached result
+    result = None
+    if session and is_local_query(sql_query):
+        try:
+            result = session.query(sql_query)
+            sessions.record_local_hit()
+        except Exception as e:
+            logger.warning(f"Local follow-up query failed, asking SQL Server instead: {str(e)}")
+            try:
+                sql_query = generate_sql_from_question(question, docs)
+            except LLMError as e:
+                return _ai_unavailable(e)
+    if result is None:
+        result = execute_sql_query(sql_query)
+    # Results can be large; log their shape, not their rows
+    if isinstance(result, dict):
+        log_event(logger, "query_result", chars=len(str(result.get("data", ""))), error=result.get("error"))
+    else:
+        log_event(logger, "query_result", result=result)
+    if session:
+        session.add(question, sql_query, result)
     
     # Generate a natural language answer from the result
     answer = generate_answer_from_result(question, sql_query, result)
-    logger.info(f"Generated answer: {answer}")
+    log_event(logger, "generated_answer", answer=answer)
     
-    # Return the answer and SQL query for display
-    return {
+    # Return the answer and SQL query for display, and a handle on the full
+    # result for the paged grid
+    return _with_result_handle({
         "answer": answer,
         "sql": sql_query
-    }
\ No newline at end of file
+    }, result)
@@ -1,18 +1,86 @@
-from fastapi import FastAPI, HTTPException, Request
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
-from .answer import answer_question
+from typing import Dict, Any, List, Optional
+from .admission import AdmissionController, QueueFull, current_priority, PRIORITIES
+from . import answer as answer_module
+from .answer import answer_question, normalize_question, warm_up
+from .warmer import AnswerWarmer, QuestionStats, parse_schedule
+from .encoding import CompressionMiddleware, ETagMiddleware, FastJSONResponse, dumps
+from .logs import configure_logging, log_event, logging_stats
 import logging
+import os
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-)
+# Log through a bounded background queue so handlers never block requests;
+# the queue is flushed at exit
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Natural Language SQL Chat")
+# Batch limits: questions per request and pipelines running at once per batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Largest page of result rows served by /results
+RESULT_PAGE_MAX = int(os.getenv("RESULT_PAGE_MAX", "1000"))
+
+# Admission control: pipelines in flight and how many more may wait for a slot
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("QUERY_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("QUERY_MAX_QUEUE", "64")),
+)
+
+# Popular-question tracking and the scheduled answer warmer
+question_stats = QuestionStats()
+warmer = AnswerWarmer(
+    question_stats,
+    top_n=int(os.getenv("WARMER_TOP_N", "30")),
+    min_count=int(os.getenv("WARMER_MIN_COUNT", "2")),
+    schedule=parse_schedule(os.getenv("WARMER_SCHEDULE", "")),
+    change_query=os.getenv("WARMER_CHANGE_QUERY") or None,
+    change_interval=float(os.getenv("WARMER_CHANGE_INTERVAL", "300")),
+    ttl=float(os.getenv("WARMER_TTL", "86400")),
+)
+
+IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run the warm-up before uvicorn starts accepting requests so the first
+    request does not pay for client construction and documentation fetches.
+    """
+    timings = {"import_ms": IMPORT_MS}
+    if os.getenv("WARM_UP", "true").lower() == "true":
+        start = time.perf_counter()
+        timings.update(await run_in_threadpool(warm_up))
+        timings["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    app.state.startup_timings = timings
+    log_event(logger, "startup", **timings)
+    warmer_task = None
+    if os.getenv("WARMER_ENABLED", "false").lower() == "true":
+        if answer_module.cache is None:
+            logger.warning("Answer warmer disabled: it needs the shared cache (set MSSQL_CACHE_PATH)")
+        elif not (warmer.schedule or warmer.change_query):
+            logger.warning("Answer warmer disabled: set WARMER_SCHEDULE or WARMER_CHANGE_QUERY")
+        else:
+            warmer_task = asyncio.create_task(warmer.run())
+    yield
+    if warmer_task:
+        warmer_task.cancel()
+
+
+app = FastAPI(title="Natural Language SQL Chat", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Add CORS middleware to allow cross-origin requests from the frontend
 app.add_middleware(
@@ -23,14 +91,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ETags are computed on the uncompressed body, so compression wraps them
+app.add_middleware(ETagMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
 
 class QueryRequest(BaseModel):
     question: str
+    # Conversation id; lets follow-up questions refine earlier results locally
+    session_id: Optional[str] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
     sql: Optional[str] = None
+    # Handle on the full result, paged through GET /results/{result_id}
+    result_id: Optional[str] = None
+    columns: Optional[List[str]] = None
+    row_count: Optional[int] = None
+    # The result was cut short by the memory budget; row_count covers the partial rows
+    truncated: Optional[bool] = None
+
+
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+
+
+def to_query_response(result) -> QueryResponse:
+    # Check if result is a dictionary with both answer and SQL
+    if isinstance(result, dict) and "answer" in result:
+        return QueryResponse(
+            answer=result["answer"],
+            sql=result.get("sql"),
+            result_id=result.get("result_id"),
+            columns=result.get("columns"),
+            row_count=result.get("row_count"),
+            truncated=result.get("truncated")
+        )
+
+    # Otherwise, assume it's just a string answer
+    return QueryResponse(answer=result)
 
 
 @app.get("/")
@@ -38,30 +138,140 @@ async def root():
     return {"message": "Natural Language SQL Chat API is running"}
 
 
+@app.get("/health")
+async def health(request: Request):
+    return {
+        "status": "ok",
+        "startup": getattr(request.app.state, "startup_timings", None)
+    }
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "admission": admission.stats(),
+        "llm": answer_module.llm.stats(),
+        "llm_slots": answer_module.llm_slots.stats(),
+        "db_slots": answer_module.db_slots.stats(),
+        "sessions": answer_module.sessions.stats(),
+        "results": answer_module.results.stats(),
+        "warmer": warmer.status(),
+        "logging": logging_stats(),
+    }
+
+
+async def run_admitted(question: str, priority: str, bounded: bool = True, session_id: Optional[str] = None):
+    """
+    Run answer_question in the threadpool once the admission controller
+    grants a slot. Raises QueueFull if the queue is full. The slot is held
+    until the thread finishes, even if the caller is cancelled first.
+    """
+    await admission.acquire(priority, bounded=bounded)
+    token = current_priority.set(priority)
+    start = time.perf_counter()
+    try:
+        work = asyncio.ensure_future(run_in_threadpool(answer_question, question, session_id=session_id))
+    finally:
+        current_priority.reset(token)
+
+    def finished(future):
+        admission.release(time.perf_counter() - start)
+        if not future.cancelled():
+            future.exception()  # the caller may be gone; don't warn about an unretrieved error
+
+    work.add_done_callback(finished)
+    return await asyncio.shield(work)
+
+
 @app.post("/query", response_model=QueryResponse)
-async def query(request: QueryRequest):
+async def query(request: QueryRequest, http_request: Request):
+    priority = http_request.headers.get("X-Priority", "interactive").lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of {', '.join(PRIORITIES)}")
+    question_stats.record(request.question)
     try:
-        logger.info(f"Received question: {request.question}")
-        result = answer_question(request.question)
-        
-        # Check if result is a dictionary with both answer and SQL
-        if isinstance(result, dict) and "answer" in result:
-            return QueryResponse(
-                answer=result["answer"],
-                sql=result.get("sql")
-            )
-        
-        # Otherwise, assume it's just a string answer
-        return QueryResponse(answer=result)
+        log_event(logger, "question", question=request.question, priority=priority)
+        result = await run_admitted(request.question, priority, session_id=request.session_id)
+        return to_query_response(result)
 
+    except QueueFull as e:
+        log_event(logger, "query_rejected", logging.WARNING, queue_depth=admission.queue_depth())
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
-        logger.error(f"Error processing query: {str(e)}")
+        log_event(logger, "query_failed", logging.ERROR, error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def run_batch(questions: List[str]):
+    """
+    Answer each distinct question once, at most BATCH_CONCURRENCY at a time,
+    and yield one NDJSON line per original question as pipelines complete.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(index)
+
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(indices: List[int]):
+        async with slots:
+            try:
+                # Batch items wait behind interactive queries but are never rejected
+                result = await run_admitted(questions[indices[0]], "batch", bounded=False)
+                item = to_query_response(result).model_dump()
+                item["error"] = None
+            except Exception as e:
+                log_event(logger, "batch_question_failed", logging.ERROR, error=str(e))
+                item = {"answer": None, "sql": None, "error": str(e)}
+        return indices, item
+
+    tasks = [asyncio.create_task(run(indices)) for indices in groups.values()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, item = await next_done
+            for index in indices:
+                yield dumps({"index": index, "question": questions[index], **item}) + "\n"
+    finally:
+        # Stop outstanding pipelines if the client goes away mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest):
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(request.questions)} questions; the limit is {BATCH_MAX_QUESTIONS}"
+        )
+    log_event(logger, "batch", questions=len(request.questions))
+    return StreamingResponse(run_batch(request.questions), media_type="application/x-ndjson")
+
+
+@app.post("/warm")
+async def warm():
+    """Warm the popular answers now, e.g. from an external cron job."""
+    if answer_module.cache is None:
+        raise HTTPException(status_code=409, detail="Answer warming needs the shared cache (set MSSQL_CACHE_PATH)")
+    return await run_in_threadpool(warmer.warm)
+
+
+@app.get("/results/{result_id}")
+async def result_page(response: Response, result_id: str, offset: int = Query(0, ge=0),
+                      limit: int = Query(200, ge=1)):
+    page = answer_module.results.page(result_id, offset, min(limit, RESULT_PAGE_MAX))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    # A stored result never changes, so pages can be reused and revalidated by ETag
+    response.headers["Cache-Control"] = "private, max-age=300"
+    return page
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
+    # One sampled event per request (LOG_SAMPLE) rather than two unconditional lines
+    start = time.perf_counter()
     response = await call_next(request)
-    logger.info(f"Response status code: {response.status_code}")
+    log_event(logger, "request", method=request.method, path=request.url.path,
+              status=response.status_code, elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
     return response
\ No newline at end of file
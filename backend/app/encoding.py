@@ -0,0 +1,206 @@
+import hashlib
+import json
+import zlib
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def dumps(value) -> str:
+    """Serialize to JSON text with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode("utf-8")
+    return json.dumps(value, default=str)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed."""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _header(headers, name: bytes):
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _weak_etag(headers) -> list:
+    """
+    Headers with a strong ETag made weak. The tag is computed on the
+    uncompressed body, so the compressed and identity representations must
+    not share a strong validator.
+    """
+    return [(k, b"W/" + v if k.lower() == b"etag" and v.startswith(b'"') else v) for k, v in headers]
+
+
+def choose_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header, preferring br."""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[token.strip().lower()] = quality
+    for encoding in (("br",) if brotli is not None else ()) + ("gzip",):
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            # wbits 31 = gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._brotli = None
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so each streamed chunk reaches the client promptly."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON and NDJSON responses with brotli (if installed) or gzip
+    when the client accepts it and the body is at least minimum_size bytes.
+    Streaming responses are compressed chunk by chunk with a flush after
+    each, so NDJSON lines are not held back.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(_header(scope["headers"], b"accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] == 304:
+                    # Revalidated against the ETag this middleware weakened
+                    start = {**start, "headers": _weak_etag(start["headers"])}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = start["headers"]
+                content_type = _header(headers, b"content-type") or ""
+                if (_header(headers, b"content-encoding")
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                vary = _header(headers, b"vary")
+                headers = [(k, v) for k, v in _weak_etag(headers) if k.lower() not in (b"content-length", b"vary")]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode("latin-1")))
+                if not more_body:
+                    compressed = compressor.finish(body)
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    return await send({"type": "http.response.body", "body": compressed})
+                await send({**start, "headers": headers})
+            data = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, wrapped_send)
+        if start is not None and compressor is None and not passthrough:
+            # The app sent headers but no body message
+            await send(start)
+
+
+class ETagMiddleware:
+    """
+    Add a strong ETag to successful, non-streaming GET responses and answer
+    a matching If-None-Match with 304 Not Modified, so clients that poll
+    unchanged data (result pages, listings) do not download it again.
+    CompressionMiddleware weakens the tag on compressed responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        if_none_match = _header(scope["headers"], b"if-none-match")
+        start = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] != 200 or _header(start["headers"], b"etag"):
+                    passthrough = True
+                    await send(start)
+                return
+            if passthrough or message["type"] != "http.response.body":
+                return await send(message)
+            if message.get("more_body", False):
+                # Streaming: the full body is not known, so no validator
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            body = message.get("body", b"")
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            tags = [tag.strip().removeprefix("W/") for tag in (if_none_match or "").split(",")]
+            if etag in tags or "*" in tags:
+                headers = [(k, v) for k, v in start["headers"]
+                           if k.lower() not in (b"content-length", b"content-type")]
+                headers.append((b"etag", etag.encode("latin-1")))
+                await send({**start, "status": 304, "headers": headers})
+                return await send({"type": "http.response.body", "body": b""})
+            await send({**start, "headers": list(start["headers"]) + [(b"etag", etag.encode("latin-1"))]})
+            await send(message)
+
+        await self.app(scope, receive, wrapped_send)
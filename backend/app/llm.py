@@ -0,0 +1,253 @@
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger("llm")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server
+# errors and Anthropic's 529 "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "RateLimitError",
+                    "InternalServerError", "OverloadedError"}
+
+
+class LLMError(Exception):
+    """The LLM call failed after all retries."""
+
+
+class CircuitOpen(LLMError):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+def is_retryable(error: Exception) -> bool:
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, pct: float):
+        """Percentile in seconds, or None until min_samples calls have been seen."""
+        with self.lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures so callers fail fast instead
+    of queueing behind a broken upstream; after `reset_timeout` seconds one
+    trial call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release(self):
+        """End a trial call whose outcome says nothing about upstream health."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    logger.warning(f"LLM circuit breaker opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class LLMClient:
+    """
+    Resilient wrapper around client.messages.create.
+
+    - Hedging: if a call is still running after the observed p95 latency
+      (never earlier than hedge_min_delay), a second identical request is sent
+      and whichever finishes first wins. Hedges are capped at hedge_max_ratio
+      of calls so a slow upstream is not flooded.
+    - Retries: overload/rate-limit/connection errors are retried with full
+      jitter exponential backoff, honouring a retry-after header if present.
+    - Circuit breaker: after repeated failures calls fail fast with
+      CircuitOpen until the upstream recovers.
+
+    Worker threads run in a copy of the caller's context, so context variables
+    such as the admission priority follow the call.
+    """
+
+    def __init__(self, get_client, slots=None, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0, hedge: bool = True, hedge_min_delay: float = 1.0,
+                 hedge_max_ratio: float = 0.1, breaker: CircuitBreaker = None, max_workers: int = 64):
+        self.get_client = get_client
+        self.slots = slots
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0,
+                         "hedge_wins": 0, "failures": 0, "rejected": 0}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def create(self, **kwargs):
+        """
+        Call messages.create with hedging, retries and the circuit breaker.
+
+        Raises:
+            CircuitOpen: If the breaker is open
+            LLMError: If every attempt failed or the error is not retryable
+        """
+        self._count("calls")
+        client = self.get_client()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise CircuitOpen("AI service circuit breaker is open") from last_error
+            try:
+                response = self._hedged(client, kwargs)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    # A rejected request is the caller's fault, not a sign the upstream is down
+                    self.breaker.release()
+                    break
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    break
+                self._count("retries")
+                delay = self._backoff(attempt, e)
+                logger.warning(f"LLM call failed ({str(e)}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+        self._count("failures")
+        raise LLMError(str(last_error)) from last_error
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call(self, client, kwargs):
+        self._count("attempts")
+        if self.slots is not None:
+            with self.slots:
+                start = time.perf_counter()
+                response = client.messages.create(**kwargs)
+        else:
+            start = time.perf_counter()
+            response = client.messages.create(**kwargs)
+        self.latency.add(time.perf_counter() - start)
+        return response
+
+    def _submit(self, client, kwargs):
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._call, client, kwargs)
+
+    def _hedge_delay(self):
+        if not self.hedge:
+            return None
+        p95 = self.latency.percentile(95)
+        if p95 is None:
+            return None
+        with self._lock:
+            if self.counters["hedges"] >= self.hedge_max_ratio * max(self.counters["calls"], 1):
+                return None
+        return max(p95, self.hedge_min_delay)
+
+    def _hedged(self, client, kwargs):
+        delay = self._hedge_delay()
+        if delay is None:
+            return self._call(client, kwargs)
+        first = self._submit(client, kwargs)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+        self._count("hedges")
+        second = self._submit(client, kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    # The loser keeps running in the background; the sync SDK
+                    # has no way to cancel an in-flight request.
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self) -> dict:
+        p95 = self.latency.percentile(95)
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit": self.breaker.state,
+        }
@@ -0,0 +1,179 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from typing import Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """
+    Log a structured event. Fields are rendered (and truncated) on the
+    logging thread, and high-volume events may be sampled, so pass objects
+    as they are rather than pre-formatting them into the message.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"event": event, "fields": fields})
+
+
+def truncate(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}...[{len(text) - limit} more chars]"
+    return text
+
+
+def parse_sample_rates(text: str) -> Dict[str, float]:
+    """Parse "request=0.1,query_result=0.05" into {event: rate}."""
+    rates = {}
+    for part in (text or "").split(","):
+        event, _, rate = part.partition("=")
+        if event.strip() and rate.strip():
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records with their event fields appended as key=value pairs (or
+    as one JSON object per line with json_lines=True). Strings were already
+    cut by BackgroundQueueHandler; other values are cut to max_field_chars
+    once rendered.
+    """
+
+    def __init__(self, max_field_chars: int = 2000, json_lines: bool = False):
+        super().__init__(TEXT_FORMAT)
+        self.max_field_chars = max_field_chars
+        self.json_lines = json_lines
+
+    def _field(self, value) -> str:
+        return value if isinstance(value, str) else truncate(repr(value), self.max_field_chars)
+
+    def _message(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        return truncate(message, self.max_field_chars) if record.args else message
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {k: self._field(v) for k, v in getattr(record, "fields", {}).items()}
+        if self.json_lines:
+            entry = {"time": self.formatTime(record), "logger": record.name, "level": record.levelname,
+                     "message": self._message(record), **fields}
+            if record.exc_text:
+                entry["exception"] = record.exc_text
+            return json.dumps(entry, default=str)
+        record.message = self._message(record)
+        record.asctime = self.formatTime(record)
+        line = self.formatMessage(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller: records go onto a bounded
+    queue and are dropped (and counted) when it is full. Sampled events are
+    thinned out before they are queued; warnings and errors always pass.
+    Only cheap work happens on the calling thread; formatting and I/O are
+    left to the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample_rates: Dict[str, float] = None,
+                 max_field_chars: int = 2000):
+        super().__init__(log_queue)
+        self.sample_rates = sample_rates or {}
+        self.max_field_chars = max_field_chars
+        self.dropped = 0
+        self.sampled_out = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.sample_rates.get(getattr(record, "event", None))
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            with self._lock:
+                self.sampled_out += 1
+            return False
+        return super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Tracebacks must be captured now, while the exception is current
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        # Plain strings are cut here so a huge message is not held in the queue
+        if isinstance(record.msg, str) and not record.args:
+            record.msg = truncate(record.msg, self.max_field_chars)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {k: truncate(v, self.max_field_chars) if isinstance(v, str) else v
+                             for k, v in fields.items()}
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"queued": self.queue.qsize(), "dropped": self.dropped, "sampled_out": self.sampled_out}
+
+
+_listener = None
+_handler = None
+
+
+def configure_logging(level=None) -> Optional[BackgroundQueueHandler]:
+    """
+    Route all logging through a BackgroundQueueHandler, unless the root
+    logger already has handlers (an embedding application configured
+    logging first). The root level is set from level or LOG_LEVEL, and
+    defaults to INFO when the handler is installed here; an embedding
+    application's level is otherwise left alone. Other settings come from LOG_QUEUE_SIZE, LOG_MAX_FIELD_CHARS,
+    LOG_SAMPLE and LOG_FORMAT. Returns None if logging was left alone;
+    calling it again returns the same handler.
+    """
+    global _listener, _handler
+    root = logging.getLogger()
+    level = level or os.getenv("LOG_LEVEL")
+    if level:
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _handler is not None or root.handlers:
+        return _handler
+    if not level:
+        root.setLevel(logging.INFO)
+    max_field_chars = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+    output = logging.StreamHandler()
+    output.setFormatter(StructuredFormatter(max_field_chars, json_lines=os.getenv("LOG_FORMAT") == "json"))
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    _handler = BackgroundQueueHandler(
+        log_queue,
+        sample_rates=parse_sample_rates(
+            os.getenv("LOG_SAMPLE", "request=0.1,query_result=0.1,generated_answer=0.1")),
+        max_field_chars=max_field_chars,
+    )
+    root.addHandler(_handler)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _handler
+
+
+def logging_stats() -> dict:
+    return _handler.stats() if _handler else {}
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,67 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ResultStore:
+    """
+    Result sets of recent answers, kept so the frontend can page through
+    them instead of receiving every row in the /query response.
+
+    Bounded by the total number of rows held and an idle TTL; the least
+    recently read results are dropped first. Results live in this process
+    only, like sessions.
+    """
+
+    def __init__(self, max_rows: int = 1_000_000, ttl: float = 1800.0):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.rows_held = 0
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, columns: List[str], rows: List[list]) -> Optional[str]:
+        """Store a result set and return its id, or None if it can never fit."""
+        if len(rows) > self.max_rows:
+            return None
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._results[result_id] = {"columns": columns, "rows": rows, "last_used": time.monotonic()}
+            self.rows_held += len(rows)
+            self._evict()
+        return result_id
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._results:
+            oldest_id, oldest = next(iter(self._results.items()))
+            if self.rows_held <= self.max_rows and now - oldest["last_used"] <= self.ttl:
+                break
+            del self._results[oldest_id]
+            self.rows_held -= len(oldest["rows"])
+
+    def page(self, result_id: str, offset: int, limit: int) -> Optional[Dict[str, Any]]:
+        """
+        Rows [offset, offset + limit) of a stored result, or None if the id is
+        unknown or expired.
+        """
+        with self._lock:
+            self._evict()
+            result = self._results.get(result_id)
+            if result is None:
+                return None
+            result["last_used"] = time.monotonic()
+            self._results.move_to_end(result_id)
+            rows = result["rows"]
+            return {
+                "columns": result["columns"],
+                "offset": offset,
+                "total": len(rows),
+                "rows": rows[offset:offset + limit],
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"results": len(self._results), "rows_held": self.rows_held, "max_rows": self.max_rows}
@@ -0,0 +1,206 @@
+import csv
+import io
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.mssql.memory import TRUNCATION_PREFIX
+
+logger = logging.getLogger("session")
+
+# First line of generated SQL that should run against the session's cached
+# results instead of SQL Server
+LOCAL_MARKER = "-- session"
+
+# Cell text that format_rows produces for NULL
+_NULLS = {"", "None"}
+
+# sqlite3 authorizer actions a follow-up query may perform
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION}
+if hasattr(sqlite3, "SQLITE_RECURSIVE"):
+    _ALLOWED_ACTIONS.add(sqlite3.SQLITE_RECURSIVE)
+
+
+def is_local_query(sql: Optional[str]) -> bool:
+    return bool(sql) and sql.lstrip().lower().startswith(LOCAL_MARKER)
+
+
+def is_truncated(result) -> bool:
+    """Whether an execute_sql_query result was cut short by the SQL tool's memory budget."""
+    data = result.get("data") if isinstance(result, dict) else None
+    return isinstance(data, str) and data.rstrip("\n").rpartition("\n")[2].startswith(TRUNCATION_PREFIX)
+
+
+def result_to_rows(result) -> Optional[Tuple[List[str], List[list]]]:
+    """
+    Turn an execute_sql_query result ({"data": "<csv>"}) into (columns, rows),
+    or None if it is an error or not tabular.
+    """
+    if not isinstance(result, dict) or "error" in result or not isinstance(result.get("data"), str):
+        return None
+    data = result["data"]
+    if is_truncated(result):
+        # Drop the marker line the SQL tool appends when a memory budget cut the result short
+        data = data.rstrip("\n").rpartition("\n")[0]
+    lines = list(csv.reader(io.StringIO(data)))
+    if not lines or not lines[0]:
+        return None
+    columns, rows = lines[0], lines[1:]
+    if any(len(row) != len(columns) for row in rows):
+        # Values containing commas are not quoted by the SQL tool, so the
+        # split cannot be trusted
+        return None
+    return columns, rows
+
+
+def _column_names(columns: List[str]) -> List[str]:
+    names = []
+    for i, column in enumerate(columns):
+        name = re.sub(r"\W+", "_", column.strip()).strip("_") or f"col_{i + 1}"
+        while name.lower() in (n.lower() for n in names):
+            name += "_"
+        names.append(name)
+    return names
+
+
+def _convert(values: List[str]) -> Tuple[str, List[Any]]:
+    """Pick INTEGER, REAL or TEXT for a column of CSV cells and convert them."""
+    present = [v for v in values if v not in _NULLS]
+    for type_name, cast in (("INTEGER", int), ("REAL", float)):
+        try:
+            for value in present:
+                cast(value)
+        except ValueError:
+            continue
+        return type_name, [None if v in _NULLS else cast(v) for v in values]
+    return "TEXT", [None if v in _NULLS else v for v in values]
+
+
+class Session:
+    """
+    Recent result sets of one conversation, held as tables in a private
+    in-memory SQLite database so follow-ups can be answered without a round
+    trip to SQL Server.
+    """
+
+    def __init__(self, max_results: int, max_rows: int):
+        self.max_results = max_results
+        self.max_rows = max_rows
+        self.results: List[Dict[str, Any]] = []
+        self.last_used = time.monotonic()
+        self._counter = 0
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def add(self, question: str, sql: str, result) -> Optional[str]:
+        """Store a result as a new table; returns its name, or None if not storable."""
+        if is_truncated(result):
+            # Follow-ups computed over part of a result would be silently wrong
+            return None
+        parsed = result_to_rows(result)
+        if parsed is None or len(parsed[1]) > self.max_rows:
+            return None
+        columns, rows = parsed
+        names = _column_names(columns)
+        converted = [_convert([row[i] for row in rows]) for i in range(len(columns))]
+        with self._lock:
+            self._counter += 1
+            table = f"result_{self._counter}"
+            definition = ", ".join(f'"{name}" {type_name}' for name, (type_name, _) in zip(names, converted))
+            self._conn.execute(f"CREATE TABLE {table} ({definition})")
+            self._conn.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(names))})",
+                zip(*(values for _, values in converted)) if rows else [],
+            )
+            self.results.append({"table": table, "question": question, "sql": sql,
+                                 "columns": names, "rows": len(rows)})
+            while len(self.results) > self.max_results:
+                dropped = self.results.pop(0)
+                self._conn.execute(f"DROP TABLE {dropped['table']}")
+        return table
+
+    def describe(self) -> str:
+        """Prompt text listing the cached tables, most recent last."""
+        with self._lock:
+            results = list(self.results)
+        return "\n".join(
+            f"- {r['table']} ({r['rows']} rows; columns: {', '.join(r['columns'])}) "
+            f"answered \"{r['question']}\""
+            for r in results
+        )
+
+    def query(self, sql: str) -> Dict[str, Any]:
+        """
+        Run a read-only SQLite query over the cached tables and return it in
+        the same {"data": "<csv>"} shape as execute_sql_query.
+        """
+        def authorize(action, *args):
+            return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+        with self._lock:
+            self._conn.set_authorizer(authorize)
+            try:
+                cursor = self._conn.execute(sql)
+                columns = [desc[0] for desc in cursor.description]
+                rows = cursor.fetchmany(self.max_rows)
+            finally:
+                self._conn.set_authorizer(None)
+        text = "\n".join([",".join(columns)] + [",".join(map(str, row)) for row in rows])
+        return {"data": text, "source": "session"}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SessionStore:
+    """
+    Sessions by id, least recently used first; sessions idle for longer than
+    ttl seconds or beyond max_sessions are dropped. Sessions live in this
+    process only, so with several workers a follow-up that lands elsewhere
+    simply goes to SQL Server.
+    """
+
+    def __init__(self, max_sessions: int = 200, max_results: int = 3, max_rows: int = 50000,
+                 ttl: float = 1800.0):
+        self.max_sessions = max_sessions
+        self.max_results = max_results
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.local_hits = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, create: bool = True) -> Optional[Session]:
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_used <= self.ttl and len(self._sessions) <= self.max_sessions:
+                    break
+                expired.append(self._sessions.pop(oldest_id))
+            session = self._sessions.get(session_id)
+            if session is None and create:
+                session = self._sessions[session_id] = Session(self.max_results, self.max_rows)
+                if len(self._sessions) > self.max_sessions:
+                    expired.append(self._sessions.popitem(last=False)[1])
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+        for old in expired:
+            old.close()
+        return session
+
+    def record_local_hit(self):
+        with self._lock:
+            self.local_hits += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions,
+                    "local_hits": self.local_hits}
@@ -0,0 +1,165 @@
+import asyncio
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import answer as answer_module
+from .admission import current_priority
+from .answer import normalize_question
+from .logs import log_event
+
+logger = logging.getLogger("warmer")
+
+
+class QuestionStats:
+    """Counts of /query questions by normalized text, keeping one original wording each."""
+
+    def __init__(self, max_questions: int = 10000):
+        self.max_questions = max_questions
+        self._counts = Counter()
+        self._wording = {}
+        self._lock = threading.Lock()
+
+    def record(self, question: str):
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            self._counts[key] += 1
+            self._wording.setdefault(key, question.strip())
+            if len(self._counts) > self.max_questions:
+                # Forget the rarest half rather than growing without bound
+                for rare, _ in self._counts.most_common()[self.max_questions // 2:]:
+                    del self._counts[rare]
+                    del self._wording[rare]
+
+    def top(self, n: int, min_count: int = 1) -> List[Tuple[str, int]]:
+        with self._lock:
+            return [(self._wording[key], count) for key, count in self._counts.most_common(n)
+                    if count >= min_count]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
+
+
+def parse_schedule(text: str) -> List[Tuple[int, int]]:
+    """Parse "06:30,12:00" into [(6, 30), (12, 0)]."""
+    times = []
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        hour, _, minute = part.partition(":")
+        hour, minute = int(hour), int(minute or 0)
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"Invalid warmer time: {part}")
+        times.append((hour, minute))
+    return sorted(times)
+
+
+def next_run(schedule: List[Tuple[int, int]], now: datetime.datetime) -> Optional[datetime.datetime]:
+    """Next scheduled time strictly after now, or None without a schedule."""
+    for day in (0, 1):
+        date = (now + datetime.timedelta(days=day)).date()
+        for hour, minute in schedule:
+            candidate = datetime.datetime.combine(date, datetime.time(hour, minute))
+            if candidate > now:
+                return candidate
+    return None
+
+
+class AnswerWarmer:
+    """
+    Precomputes answers to the most frequently asked questions so peak-hour
+    askers are served from the shared cache.
+
+    Warming runs at the daily times in `schedule` and, if change_query is
+    set, whenever its result changes (polled every change_interval seconds),
+    e.g. a query returning the latest modification time of the tables the
+    popular questions read. Questions are warmed one at a time at batch
+    priority, so interactive traffic keeps first claim on LLM and DB slots.
+    """
+
+    def __init__(self, stats: QuestionStats, top_n: int = 30, min_count: int = 2,
+                 schedule: List[Tuple[int, int]] = None, change_query: str = None,
+                 change_interval: float = 300.0, ttl: float = 86400.0):
+        self.stats = stats
+        self.top_n = top_n
+        self.min_count = min_count
+        self.schedule = schedule or []
+        self.change_query = change_query
+        self.change_interval = change_interval
+        self.ttl = ttl
+        self.runs = 0
+        self.last_run = None
+        self.last_summary = None
+        self._data_version = None
+
+    def warm(self) -> dict:
+        """Warm the current top questions; returns counts and timing."""
+        start = time.perf_counter()
+        token = current_priority.set("batch")
+        warmed, failed = 0, 0
+        try:
+            for question, _ in self.stats.top(self.top_n, self.min_count):
+                try:
+                    answer_module.warm_answer(question, self.ttl)
+                    warmed += 1
+                except Exception as e:
+                    failed += 1
+                    log_event(logger, "warm_failed", logging.WARNING, question=question, error=str(e))
+        finally:
+            current_priority.reset(token)
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_summary = {"warmed": warmed, "failed": failed,
+                             "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+        log_event(logger, "warmer_finished", **self.last_summary)
+        return self.last_summary
+
+    def data_changed(self) -> bool:
+        """Run change_query and report whether its result differs from last time."""
+        result = answer_module.execute_sql_query(self.change_query, refresh=True)
+        if isinstance(result, dict) and "error" in result:
+            logger.warning(f"Warmer change query failed: {result['error']}")
+            return False
+        previous, self._data_version = self._data_version, result
+        return previous is not None and previous != result
+
+    async def run(self):
+        next_time = next_run(self.schedule, datetime.datetime.now())
+        while True:
+            timeout = None
+            if next_time is not None:
+                timeout = max(0.0, (next_time - datetime.datetime.now()).total_seconds())
+            if self.change_query:
+                timeout = self.change_interval if timeout is None else min(timeout, self.change_interval)
+            if timeout is None:
+                return
+            await asyncio.sleep(timeout)
+            due = next_time is not None and datetime.datetime.now() >= next_time
+            try:
+                changed = bool(self.change_query) and await run_in_threadpool(self.data_changed)
+                if due or changed:
+                    logger.info("Warming popular answers " + ("(scheduled)" if due else "(data changed)"))
+                    await run_in_threadpool(self.warm)
+            except Exception as e:
+                logger.warning(f"Answer warmer failed: {str(e)}")
+            if due:
+                next_time = next_run(self.schedule, datetime.datetime.now())
+
+    def status(self) -> dict:
+        return {
+            "tracked_questions": len(self.stats),
+            "schedule": [f"{h:02d}:{m:02d}" for h, m in self.schedule],
+            "change_query": bool(self.change_query),
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_summary": self.last_summary,
+        }
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Load-testing harness for the FastAPI backend.
+
+Runs backend.app.api:app under a single in-process uvicorn worker with
+deterministic stand-ins for the Anthropic API and the MCP SQL tool, replays a
+corpus of questions at a fixed concurrency and reports throughput, latency
+percentiles and error rates for every pipeline stage.
+
+Usage:
+    python -m backend.loadtest --concurrency 8 --requests 200
+    python -m backend.loadtest --corpus questions.txt --llm-latency 0.8 --llm-error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import random
+import os
+import socket
+import sys
+import threading
+import time
+import types
+from collections import defaultdict
+from contextlib import contextmanager
+
+import httpx
+import uvicorn
+
+from backend.app import answer
+
+logger = logging.getLogger("loadtest")
+
+DEFAULT_CORPUS = [
+    "How many products are there?",
+    "List all customers from California",
+    "Show me the most expensive products",
+    "What are the different product categories?",
+    "How many orders were placed in 2004?",
+]
+
+# answer.py function name -> stage name used in the report
+STAGES = {
+    "get_sql_documentation": "docs",
+    "generate_sql_from_question": "generate_sql",
+    "execute_sql_query": "execute_sql",
+    "generate_answer_from_result": "generate_answer",
+}
+
+# Stage of the pipeline call in progress. A mutable dict rather than a plain
+# value so that fakes running in worker threads (e.g. hedged LLM calls, which
+# run in a copy of the caller's context) can flag the failure they injected.
+_current = contextvars.ContextVar("loadtest_stage", default=None)
+
+
+class InjectedOverload(RuntimeError):
+    """Injected LLM failure that looks like Anthropic's 529 overloaded error."""
+
+    status_code = 529
+
+
+def _record_injected(stats, default):
+    current = _current.get()
+    if current is None:
+        stats.record_error(default)
+        return
+    current["failed"] = True
+    stats.record_error(current["stage"])
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+
+    Args:
+        values: Sample values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value, or 0.0 for an empty sample
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class StageStats:
+    """Thread-safe latency and error counters keyed by stage name."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.latencies.clear()
+            self.errors.clear()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+
+    def record_error(self, stage):
+        with self.lock:
+            self.errors[stage] += 1
+
+    def summary(self):
+        """
+        Summarize every stage seen so far.
+
+        Returns:
+            dict: stage -> count, errors, error_rate and p50/p95/p99 in milliseconds
+        """
+        with self.lock:
+            stages = list(self.latencies) + [s for s in self.errors if s not in self.latencies]
+            result = {}
+            for stage in stages:
+                samples = self.latencies.get(stage, [])
+                count = max(len(samples), self.errors.get(stage, 0))
+                result[stage] = {
+                    "count": count,
+                    "errors": self.errors.get(stage, 0),
+                    "error_rate": self.errors.get(stage, 0) / count if count else 0.0,
+                    "p50_ms": percentile(samples, 50) * 1000,
+                    "p95_ms": percentile(samples, 95) * 1000,
+                    "p99_ms": percentile(samples, 99) * 1000,
+                }
+            return result
+
+
+class FakeAnthropic:
+    """
+    Deterministic stand-in for anthropic.Anthropic.
+
+    Each messages.create call sleeps for a fixed time-to-first-token plus the
+    time needed to "stream" output_tokens at tokens_per_second, and fails with
+    probability error_rate (seeded, so runs are reproducible).
+    """
+
+    def __init__(self, stats, latency=0.5, tokens_per_second=50.0, output_tokens=40,
+                 error_rate=0.0, seed=0, sql="SELECT COUNT(*) AS total FROM dbo.Products"):
+        self.stats = stats
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.sql = sql
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.messages = self
+
+    def create(self, model=None, max_tokens=None, messages=None, **kwargs):
+        with self.lock:
+            fail = self.rng.random() < self.error_rate
+        delay = self.latency
+        if self.tokens_per_second > 0:
+            delay += self.output_tokens / self.tokens_per_second
+        time.sleep(delay)
+        if fail:
+            _record_injected(self.stats, "llm")
+            raise InjectedOverload("Overloaded (injected by load test)")
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=self.sql)])
+
+
+def make_fake_mcp_function(stats, latency=0.05, rows=20, error_rate=0.0, seed=0):
+    """
+    Build a stand-in for the mcp.function module used by answer.py.
+
+    Args:
+        stats: StageStats receiving injected errors
+        latency: Seconds each execute_sql call takes
+        rows: Number of CSV rows each query returns
+        error_rate: Probability that execute_sql fails
+        seed: Seed for the failure generator
+
+    Returns:
+        module: Module exposing execute_sql and the Context7 doc helpers
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    body = "\n".join(["id,name,price"] + [f"{i},Product {i},{i * 9.99:.2f}" for i in range(rows)])
+
+    def execute_sql(query):
+        with lock:
+            fail = rng.random() < error_rate
+        time.sleep(latency)
+        if fail:
+            _record_injected(stats, "execute_sql")
+            raise RuntimeError("Database error (injected by load test)")
+        return body
+
+    module = types.ModuleType("mcp.function")
+    module.execute_sql = execute_sql
+    module.resolve_context7_library_id = lambda libraryName: {"id": "/microsoft/sql-server"}
+    module.get_context7_library_docs = lambda **kwargs: {"textContent": "SELECT ... FROM ... WHERE ..."}
+    return module
+
+
+def _timed(stage, func, stats):
+    def wrapper(*args, **kwargs):
+        current = {"stage": stage, "failed": False}
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            # Failures injected by the fakes were already counted
+            if not current["failed"]:
+                stats.record_error(stage)
+            raise
+        finally:
+            stats.record(stage, time.perf_counter() - start)
+            _current.reset(token)
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+@contextmanager
+def stubbed_backend(stats, args):
+    """
+    Swap the Anthropic client and MCP SQL tool in answer.py for the fakes and
+    time each pipeline stage. Everything is restored on exit.
+    """
+    saved = {name: getattr(answer, name) for name in ("anthropic_client", "IN_MCP", "_sql_docs", *STAGES)}
+    saved_module = sys.modules.get("mcp.function")
+    try:
+        answer._sql_docs = None
+        answer.anthropic_client = FakeAnthropic(
+            stats,
+            latency=args.llm_latency,
+            tokens_per_second=args.llm_token_rate,
+            output_tokens=args.llm_output_tokens,
+            error_rate=args.llm_error_rate,
+            seed=args.seed,
+        )
+        answer.IN_MCP = True
+        sys.modules["mcp.function"] = make_fake_mcp_function(
+            stats,
+            latency=args.sql_latency,
+            rows=args.sql_rows,
+            error_rate=args.sql_error_rate,
+            seed=args.seed + 1,
+        )
+        for name, stage in STAGES.items():
+            setattr(answer, name, _timed(stage, saved[name], stats))
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(answer, name, value)
+        if saved_module is None:
+            sys.modules.pop("mcp.function", None)
+        else:
+            sys.modules["mcp.function"] = saved_module
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_server(port):
+    """Run backend.app.api:app in a single uvicorn worker on a background thread."""
+    config = uvicorn.Config("backend.app.api:app", host="127.0.0.1", port=port,
+                            workers=1, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+async def replay(base_url, corpus, total, concurrency, stats, timeout=60.0):
+    """
+    Send total /query requests drawn round-robin from corpus, keeping at most
+    concurrency requests in flight.
+
+    Returns:
+        float: Wall-clock seconds for the whole run
+    """
+    counter = iter(range(total))
+
+    async def worker(client):
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/query", json={"question": corpus[i % len(corpus)]})
+                if response.status_code != 200:
+                    stats.record_error("request")
+            except httpx.HTTPError:
+                stats.record_error("request")
+            finally:
+                stats.record("request", time.perf_counter() - start)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+
+def run_load_test(args):
+    """
+    Run one load test and return the report.
+
+    Args:
+        args: Parsed command-line options (see build_parser)
+
+    Returns:
+        dict: Throughput and per-stage latency/error summary
+    """
+    corpus = load_corpus(args.corpus)
+    stats = StageStats()
+    with stubbed_backend(stats, args), running_server(args.port or _free_port()) as base_url:
+        # Only measure the replay, not the startup warm-up
+        stats.reset()
+        elapsed = asyncio.run(replay(base_url, corpus, args.requests, args.concurrency, stats,
+                                     timeout=args.timeout))
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "throughput_rps": args.requests / elapsed if elapsed else 0.0,
+        "stages": stats.summary(),
+    }
+
+
+def load_corpus(path):
+    """Read one question per line from path, or return the built-in corpus."""
+    if not path:
+        return list(DEFAULT_CORPUS)
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    if not questions:
+        raise ValueError(f"Corpus file {path} contains no questions")
+    return questions
+
+
+def format_report(report):
+    lines = [
+        f"Requests: {report['requests']}  Concurrency: {report['concurrency']}  "
+        f"Elapsed: {report['elapsed_s']:.2f}s  Throughput: {report['throughput_rps']:.2f} req/s",
+        "",
+        f"{'stage':<16}{'count':>8}{'errors':>8}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    order = ["request"] + list(STAGES.values())
+    stages = report["stages"]
+    for stage in order + [s for s in stages if s not in order]:
+        if stage not in stages:
+            continue
+        s = stages[stage]
+        lines.append(
+            f"{stage:<16}{s['count']:>8}{s['errors']:>8}{s['error_rate'] * 100:>7.1f}%"
+            f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load test the Natural Language SQL Chat API")
+    parser.add_argument("--requests", type=int, default=100, help="Total /query requests to send")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests kept in flight")
+    parser.add_argument("--corpus", help="File with one question per line")
+    parser.add_argument("--port", type=int, default=0, help="Port for the uvicorn worker (default: random)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--llm-token-rate", type=float, default=50.0, help="Output tokens per second")
+    parser.add_argument("--llm-output-tokens", type=int, default=40, help="Output tokens per completion")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Probability an LLM call fails")
+    parser.add_argument("--sql-latency", type=float, default=0.05, help="Seconds per execute_sql call")
+    parser.add_argument("--sql-rows", type=int, default=20, help="Rows returned by each query")
+    parser.add_argument("--sql-error-rate", type=float, default=0.0, help="Probability a query fails")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected failures")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--log-level", default="WARNING", help="Log level for the backend while testing")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # The backend's configure_logging reads LOG_LEVEL when the app is imported
+    os.environ["LOG_LEVEL"] = args.log_level
+    logging.getLogger().setLevel(args.log_level.upper())
+    for name in ("answer", "backend.app.api"):
+        logging.getLogger(name).setLevel(args.log_level.upper())
+    report = run_load_test(args)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import uvicorn
 import os
+import sys
 from dotenv import load_dotenv
 
+# The backend shares modules under src/ with the MCP server
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 # Load environment variables
 load_dotenv()
 
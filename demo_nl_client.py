@@ -7,9 +7,9 @@ This version automatically runs some example queries to demonstrate functionalit
 import asyncio
 import os
 import sys
-import time
 import anthropic
 from fastmcp import Client
+from schema_snapshot import SchemaSnapshot
 
 # Path to the MCP-MSSQL server
 SERVER_PATH = os.path.join(os.getcwd(), "src/mssql/server.py")
@@ -27,53 +27,36 @@ DEMO_QUESTIONS = [
 ]
 
 async def get_schema_info(mcp_client):
-    """Get database schema information"""
-    schema_info = {}
-    
-    # Get list of tables
-    resources = await mcp_client.list_resources()
-    tables = [str(resource.uri).split('/')[2] for resource in resources]
-    
-    # Get schema to know which schema tables are in
-    schema_query = "SELECT SCHEMA_NAME(schema_id) as schema_name, name FROM sys.tables"
-    result = await mcp_client.call_tool("execute_sql", {"query": schema_query})
-    
-    if result and hasattr(result[0], 'text'):
-        lines = result[0].text.strip().split('\n')
-        table_schemas = {}
-        
-        # Skip header row
-        for i, line in enumerate(lines):
-            if i == 0:  # Skip header
-                continue
-                
-            parts = line.split(',')
-            if len(parts) >= 2:
-                schema_name = parts[0].strip()
-                table_name = parts[1].strip()
-                table_schemas[table_name] = schema_name
-                
-        # Store tables with their schemas
-        for table in tables:
-            if table in table_schemas:
-                schema = table_schemas[table]
-                full_name = f"{schema}.{table}"
-                
-                # Get columns for each table
-                col_query = f"SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = '{table}' AND TABLE_SCHEMA = '{schema}'"
-                try:
-                    col_result = await mcp_client.call_tool("execute_sql", {"query": col_query})
-                    if col_result and hasattr(col_result[0], 'text'):
-                        # Skip header row and parse column names
-                        col_lines = col_result[0].text.strip().split('\n')[1:]
-                        columns = [col.strip() for col in col_lines]
-                        schema_info[full_name] = columns
-                except Exception as e:
-                    print(f"Error getting columns for {full_name}: {e}")
-    
-    return tables, table_schemas, schema_info
+    """
+    Load the schema snapshot from disk, reading it from the server only on
+    the first run. A loaded snapshot is revalidated in the background.
+    """
+    snapshot = SchemaSnapshot.load()
+    if not snapshot:
+        await snapshot.refresh(mcp_client)
+        return snapshot, None
+    return snapshot, asyncio.create_task(revalidate_schema(mcp_client, snapshot))
+
+async def revalidate_schema(mcp_client, snapshot):
+    """Pick up tables added, altered or dropped since the snapshot was saved"""
+    try:
+        changed = await snapshot.refresh(mcp_client)
+        if changed:
+            print(f"\n(Schema snapshot updated: {', '.join(changed)})")
+    except Exception as e:
+        print(f"\nError revalidating schema snapshot: {e}")
+
+async def get_column_profiles(mcp_client):
+    """Get cached column profiles (distinct counts, ranges, top values) as prompt text"""
+    try:
+        result = await mcp_client.call_tool("profile_table", {"format": "text"})
+        if result and hasattr(result[0], 'text') and not result[0].text.startswith("Error"):
+            return result[0].text
+    except Exception as e:
+        print(f"Error getting column profiles: {e}")
+    return ""
 
-async def nl_to_sql(query, tables, table_schemas, schema_info):
+async def nl_to_sql(query, tables, table_schemas, schema_info, profiles_text=""):
     """Use Claude to convert natural language to SQL"""
     # Special case for listing tables
     if query.lower() in ["list all tables", "show all tables", "what tables are in the database"]:
@@ -86,6 +69,8 @@ async def nl_to_sql(query, tables, table_schemas, schema_info):
         schema_text += f"Table: {full_name}\n"
         if full_name in schema_info:
             schema_text += f"  Columns: {', '.join(schema_info[full_name])}\n"
+    if profiles_text:
+        schema_text += f"\nColumn profiles (use them to pick selective filters):\n{profiles_text}\n"
     
     # Create prompt for Claude
     prompt = f"""
@@ -140,11 +125,12 @@ async def main():
         print("Connecting to MCP-MSSQL server...")
         async with client:
             print("Connected! Loading database schema...")
-            tables, table_schemas, schema_info = await get_schema_info(client)
+            snapshot, revalidation = await get_schema_info(client)
+            profiles_text = await get_column_profiles(client)
             
-            print(f"Loaded schema for {len(tables)} tables")
+            print(f"Loaded schema for {len(snapshot.tables)} tables")
             print("\nAvailable tables:")
-            for table, schema in table_schemas.items():
+            for table, schema in snapshot.table_schemas().items():
                 print(f"- {schema}.{table}")
             
             print("\nRunning demo questions:")
@@ -156,13 +142,15 @@ async def main():
                 # Handle listing tables
                 if "list all tables" in question.lower() or "show all tables" in question.lower():
                     print("\nAvailable tables:")
-                    for table, schema in table_schemas.items():
+                    for table, schema in snapshot.table_schemas().items():
                         print(f"- {schema}.{table}")
                     continue
                 
                 # Convert natural language to SQL
                 print("Translating to SQL...")
-                sql = await nl_to_sql(question, tables, table_schemas, schema_info)
+                table_schemas = snapshot.table_schemas()
+                sql = await nl_to_sql(question, list(table_schemas), table_schemas, snapshot.schema_info(),
+                                      profiles_text)
                 
                 if not sql:
                     print("Sorry, I couldn't convert that to SQL.")
@@ -196,9 +184,11 @@ async def main():
                     print(f"Error executing query: {e}")
                     
                 # Pause between questions for readability
-                time.sleep(1)
+                await asyncio.sleep(1)
             
             print("\nDemo completed!")
+            if revalidation:
+                await revalidation
     
     except Exception as e:
         print(f"Error connecting to server: {e}")
@@ -8,6 +8,7 @@ import sys
 import os
 import anthropic
 from fastmcp import Client
+from schema_snapshot import SchemaSnapshot
 
 # Path to the MCP-MSSQL server
 SERVER_PATH = os.path.join(os.getcwd(), "src/mssql/server.py")
@@ -16,33 +17,24 @@ SERVER_PATH = os.path.join(os.getcwd(), "src/mssql/server.py")
 claude_client = anthropic.Anthropic()
 
 async def get_schema_info(mcp_client):
-    """Get database schema information"""
-    schema_info = {}
-    
-    # Get list of tables
-    resources = await mcp_client.list_resources()
-    tables = [str(resource.uri).split('/')[2] for resource in resources]
-    
-    # Get schema to know which schema tables are in
-    schema_query = "SELECT SCHEMA_NAME(schema_id) as schema_name, name FROM sys.tables"
-    result = await mcp_client.call_tool("execute_sql", {"query": schema_query})
-    
-    if result and hasattr(result[0], 'text'):
-        lines = result[0].text.strip().split('\n')
-        table_schemas = {}
-        
-        # Skip header row
-        for i, line in enumerate(lines):
-            if i == 0:  # Skip header
-                continue
-                
-            parts = line.split(',')
-            if len(parts) >= 2:
-                schema_name = parts[0].strip()
-                table_name = parts[1].strip()
-                table_schemas[table_name] = schema_name
-    
-    return tables, table_schemas
+    """
+    Load the schema snapshot from disk, reading it from the server only on
+    the first run. A loaded snapshot is revalidated in the background.
+    """
+    snapshot = SchemaSnapshot.load()
+    if not snapshot:
+        await snapshot.refresh(mcp_client)
+        return snapshot, None
+    return snapshot, asyncio.create_task(revalidate_schema(mcp_client, snapshot))
+
+async def revalidate_schema(mcp_client, snapshot):
+    """Pick up tables added, altered or dropped since the snapshot was saved"""
+    try:
+        changed = await snapshot.refresh(mcp_client)
+        if changed:
+            print(f"\n(Schema snapshot updated: {', '.join(changed)})")
+    except Exception as e:
+        print(f"\nError revalidating schema snapshot: {e}")
 
 async def nl_to_sql(query, tables, table_schemas):
     """Use Claude to convert natural language to SQL"""
@@ -108,30 +100,32 @@ async def main():
         print("Connecting to MCP-MSSQL server...")
         async with client:
             print("Connected!")
-            tables, table_schemas = await get_schema_info(client)
+            snapshot, revalidation = await get_schema_info(client)
             
             print("\nAvailable tables:")
-            for table, schema in table_schemas.items():
+            for table, schema in snapshot.table_schemas().items():
                 print(f"- {schema}.{table}")
             
             print("\nType your natural language questions and press Enter.")
             print("Type 'exit' to quit.")
             
             while True:
-                query = input("\nYour question: ")
+                # Read input off the event loop so schema revalidation keeps running
+                query = await asyncio.to_thread(input, "\nYour question: ")
                 if query.lower() == "exit":
                     break
                 
                 # Handle listing tables
                 if "list tables" in query.lower() or "show tables" in query.lower():
                     print("\nAvailable tables:")
-                    for table, schema in table_schemas.items():
+                    for table, schema in snapshot.table_schemas().items():
                         print(f"- {schema}.{table}")
                     continue
                 
                 # Convert natural language to SQL
                 print("Translating to SQL...")
-                sql = await nl_to_sql(query, tables, table_schemas)
+                table_schemas = snapshot.table_schemas()
+                sql = await nl_to_sql(query, list(table_schemas), table_schemas)
                 
                 if not sql:
                     print("Sorry, I couldn't convert that to SQL. Please try a different question.")
@@ -140,7 +134,7 @@ async def main():
                 print(f"SQL: {sql}")
                 
                 # Ask for confirmation
-                confirm = input("Execute this SQL query? (y/n): ")
+                confirm = await asyncio.to_thread(input, "Execute this SQL query? (y/n): ")
                 if confirm.lower() != "y":
                     print("Query execution cancelled.")
                     continue
@@ -169,6 +163,9 @@ async def main():
                                     print("  " + " | ".join(cells))
                 except Exception as e:
                     print(f"Error executing query: {e}")
+
+            if revalidation:
+                revalidation.cancel()
     
     except Exception as e:
         print(f"Error connecting to server: {e}")
@@ -0,0 +1,149 @@
+"""
+Versioned on-disk schema snapshot for the command-line clients.
+
+The clients load the snapshot instantly at startup and revalidate it in the
+background: one cheap query over sys.tables decides whether anything changed,
+and only tables that were added or altered since the snapshot have their
+columns fetched again.
+"""
+
+import json
+import os
+import time
+
+# Bump when the file layout changes; older snapshots are then ignored
+SNAPSHOT_FORMAT = 1
+
+DEFAULT_PATH = os.getenv("MSSQL_SCHEMA_SNAPSHOT", ".schema_snapshot.json")
+
+# Past this many changed tables it is cheaper to fetch every column at once
+MAX_FILTERED_TABLES = 50
+
+# Changes whenever a table is created, dropped or altered
+VERSION_QUERY = (
+    "SELECT COUNT(*) AS tables, CHECKSUM_AGG(CHECKSUM(object_id, modify_date)) AS version "
+    "FROM sys.tables"
+)
+TABLES_QUERY = (
+    "SELECT SCHEMA_NAME(schema_id) AS schema_name, name, "
+    "CONVERT(varchar(27), modify_date, 126) AS modified FROM sys.tables"
+)
+COLUMNS_QUERY = "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS"
+
+
+def _source() -> str:
+    # A snapshot only applies to the database it was taken from
+    return f"{os.getenv('MSSQL_SERVER', '')}/{os.getenv('MSSQL_DATABASE', '')}"
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+async def _rows(mcp_client, query: str) -> list:
+    """
+    Run a query through execute_sql and split the CSV text into rows, without
+    the header. The result cache is bypassed: a cached version would hide
+    schema changes for as long as the entry lives.
+    """
+    result = await mcp_client.call_tool("execute_sql", {"query": query, "cache": False})
+    text = result[0].text if result and hasattr(result[0], 'text') else ""
+    if text.startswith("Error"):
+        raise RuntimeError(text)
+    lines = text.strip().split('\n')[1:]
+    return [[part.strip() for part in line.split(',')] for line in lines if line.strip()]
+
+
+class SchemaSnapshot:
+    """
+    Tables with their schema, modify_date and column names, keyed by
+    "schema.table", plus the schema version they were read at.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, version: str = None, tables: dict = None):
+        self.path = path
+        self.version = version
+        self.tables = tables or {}
+        self.saved_at = None
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> "SchemaSnapshot":
+        """Load the snapshot at path; an empty one if it is missing, unreadable or stale in format."""
+        snapshot = cls(path)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return snapshot
+        if data.get("format") != SNAPSHOT_FORMAT or data.get("source") != _source():
+            return snapshot
+        snapshot.version = data.get("version")
+        snapshot.tables = data.get("tables", {})
+        snapshot.saved_at = data.get("saved_at")
+        return snapshot
+
+    def save(self):
+        """Write the snapshot atomically so a crash never leaves a partial file."""
+        self.saved_at = time.time()
+        data = {"format": SNAPSHOT_FORMAT, "source": _source(), "version": self.version,
+                "saved_at": self.saved_at, "tables": self.tables}
+        temp = f"{self.path}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp, self.path)
+
+    def __bool__(self):
+        return self.version is not None
+
+    def table_schemas(self) -> dict:
+        """{table name: schema name}, the shape the clients' prompts use."""
+        return {t["name"]: t["schema"] for t in self.tables.values()}
+
+    def schema_info(self) -> dict:
+        """{"schema.table": [column names]}."""
+        return {full_name: t["columns"] for full_name, t in self.tables.items()}
+
+    async def refresh(self, mcp_client) -> list:
+        """
+        Bring the snapshot up to date and save it if anything changed.
+
+        Costs a single one-row query when the schema version is unchanged.
+        Otherwise sys.tables is listed and columns are fetched only for new
+        or altered tables; dropped tables are removed.
+
+        Returns:
+            list: "schema.table" names that were added, altered or dropped
+        """
+        version = ":".join((await _rows(mcp_client, VERSION_QUERY) or [[""]])[0])
+        if version == self.version:
+            return []
+
+        current = {}
+        for row in await _rows(mcp_client, TABLES_QUERY):
+            if len(row) >= 3:
+                current[f"{row[0]}.{row[1]}"] = {"schema": row[0], "name": row[1], "modified": row[2]}
+        changed = [full_name for full_name, table in current.items()
+                   if self.tables.get(full_name, {}).get("modified") != table["modified"]]
+        dropped = [full_name for full_name in self.tables if full_name not in current]
+
+        if changed:
+            query = COLUMNS_QUERY
+            if len(changed) <= MAX_FILTERED_TABLES:
+                query += " WHERE " + " OR ".join(
+                    f"(TABLE_SCHEMA = {_quote(current[n]['schema'])} AND TABLE_NAME = {_quote(current[n]['name'])})"
+                    for n in changed)
+            query += " ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION"
+            columns = {full_name: [] for full_name in changed}
+            for row in await _rows(mcp_client, query):
+                full_name = f"{row[0]}.{row[1]}"
+                if full_name in columns and len(row) >= 3:
+                    columns[full_name].append(row[2])
+            for full_name in changed:
+                self.tables[full_name] = {**current[full_name], "columns": columns[full_name]}
+        for full_name in dropped:
+            del self.tables[full_name]
+
+        # Stored last, so a failed refresh is retried from scratch next time
+        self.version = version
+        self.save()
+        return changed + dropped
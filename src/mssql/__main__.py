@@ -0,0 +1,6 @@
+"""Run the MCP server: python -m src.mssql (python src/mssql/server.py ends up here too)."""
+import asyncio
+
+from .server import main
+
+asyncio.run(main())
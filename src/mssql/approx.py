@@ -0,0 +1,200 @@
+import math
+import re
+
+try:
+    from .preview import quote_table
+except ImportError:  # run as a script: python src/mssql/server.py
+    from preview import quote_table
+
+# z for a two-sided 95% interval
+Z_95 = 1.96
+
+# Aggregates that can be scaled up from a sample; MIN/MAX cannot
+ESTIMABLE = {"count", "count_big", "sum", "avg"}
+
+_QUERY = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<table>(?:\[[^\]]+\]|\w+)(?:\.(?:\[[^\]]+\]|\w+))?)"
+    r"(?:\s+(?:AS\s+)?(?P<alias>(?!WHERE\b|GROUP\b|ORDER\b)\w+))?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"\s*;?\s*$",
+    re.I | re.S,
+)
+_AGGREGATE = re.compile(
+    r"^(?P<func>COUNT_BIG|COUNT|SUM|AVG)\s*\(\s*(?P<arg>.+?)\s*\)(?:\s+(?:AS\s+)?(?P<alias>\[[^\]]+\]|\w+))?$",
+    re.I | re.S,
+)
+_ALIAS = re.compile(r"^(?P<expr>.+?)\s+(?:AS\s+)?(?P<alias>\[[^\]]+\]|\w+)$", re.I | re.S)
+_UNSUPPORTED = re.compile(r"\b(JOIN|UNION|INTERSECT|EXCEPT|HAVING|TOP|DISTINCT|OVER|TABLESAMPLE|SELECT|INTO)\b", re.I)
+
+
+def split_top_level(text: str) -> list:
+    """Split on commas that are not inside parentheses or brackets."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def _norm(expr: str) -> str:
+    return re.sub(r"\s+", "", expr).lower()
+
+
+def _unbracket(name: str) -> str:
+    return name[1:-1] if name.startswith("[") and name.endswith("]") else name
+
+
+class AggregatePlan:
+    """
+    A single-table GROUP BY query with COUNT/SUM/AVG aggregates, and the
+    sampled variant of it used for estimates.
+    """
+
+    def __init__(self, table, alias, where, keys, outputs, order):
+        self.table = table
+        self.alias = alias
+        self.where = where
+        self.keys = keys          # group-by expressions
+        self.outputs = outputs    # [("key", name, key index) | ("agg", name, func, arg)]
+        self.order = order
+
+    @property
+    def columns(self) -> list:
+        return [output[1] for output in self.outputs]
+
+    def sample_query(self, percent: float, seed: int) -> str:
+        select = list(self.keys) + ["COUNT_BIG(*) AS [__n]"]
+        for i, output in enumerate(self.outputs):
+            if output[0] == "agg" and output[3] != "*":
+                value = f"CAST({output[3]} AS float)"
+                select += [f"SUM({value}) AS [__s{i}]", f"SUM(SQUARE({value})) AS [__q{i}]",
+                           f"COUNT_BIG({output[3]}) AS [__c{i}]"]
+        sql = f"SELECT {', '.join(select)} FROM {quote_table(self.table)}"
+        if self.alias:
+            sql += f" AS {self.alias}"
+        sql += f" TABLESAMPLE SYSTEM ({percent:g} PERCENT) REPEATABLE ({seed})"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        if self.keys:
+            sql += f" GROUP BY {', '.join(self.keys)}"
+        return sql
+
+    def estimate(self, columns: list, rows: list, fraction: float) -> dict:
+        """
+        Scale a sample_query result up to the whole table.
+
+        Bounds are 95% intervals under a row-level sampling model.
+        TABLESAMPLE picks whole pages, so on data clustered by the grouped
+        or aggregated columns the real error can be larger.
+
+        Returns:
+            dict: columns, rows (estimate then "±" bound per aggregate) and
+            max_relative_error over every estimate
+        """
+        index = {name: i for i, name in enumerate(columns)}
+        out_columns = []
+        for output in self.outputs:
+            out_columns.append(output[1])
+            if output[0] == "agg":
+                out_columns.append(f"{output[1]}_ci95")
+        out_rows = []
+        worst = 0.0
+        for row in rows:
+            out = []
+            for i, output in enumerate(self.outputs):
+                if output[0] == "key":
+                    out.append(row[output[2]])
+                    continue
+                func, arg = output[2], output[3]
+                n = row[index["__n"]]
+                if arg == "*" or func in ("count", "count_big"):
+                    count = n if arg == "*" else row[index[f"__c{i}"]]
+                    value = count / fraction
+                    bound = Z_95 * math.sqrt(count * (1 - fraction)) / fraction
+                else:
+                    total, squares, count = (row[index[f"__s{i}"]], row[index[f"__q{i}"]],
+                                             row[index[f"__c{i}"]])
+                    if not count:
+                        out += [None, None]
+                        continue
+                    if func == "sum":
+                        value = total / fraction
+                        bound = Z_95 * math.sqrt(max(squares, 0.0) * (1 - fraction)) / fraction
+                    else:
+                        value = total / count
+                        variance = (squares - total * total / count) / (count - 1) if count > 1 else 0.0
+                        bound = Z_95 * math.sqrt(max(variance, 0.0) / count * (1 - fraction))
+                if value:
+                    worst = max(worst, abs(bound / value))
+                out += [value, bound]
+            out_rows.append(out)
+        self._sort(out_columns, out_rows)
+        return {"columns": out_columns, "rows": out_rows, "max_relative_error": worst}
+
+    def _sort(self, columns, rows):
+        # Apply ORDER BY terms that name an output column; others are ignored
+        for term in reversed(split_top_level(self.order or "")):
+            parts = term.split()
+            descending = len(parts) > 1 and parts[-1].lower() == "desc"
+            name = _unbracket(parts[0]) if parts else ""
+            if name in columns:
+                i = columns.index(name)
+                rows.sort(key=lambda r: (r[i] is None, r[i]), reverse=descending)
+
+
+def parse_aggregate_query(query: str):
+    """
+    Return an AggregatePlan if the query can be estimated from a sample,
+    or None: it must read one table, aggregate only with COUNT/SUM/AVG
+    (no DISTINCT), and select nothing but aggregates and GROUP BY keys.
+    """
+    match = _QUERY.match(query)
+    if not match:
+        return None
+    select, where, group = match.group("select"), match.group("where"), match.group("group")
+    if any(part and _UNSUPPORTED.search(part) for part in (select, where, group)):
+        return None
+    keys = split_top_level(group) if group else []
+    normalized_keys = [_norm(k) for k in keys]
+    outputs = []
+    for i, item in enumerate(split_top_level(select)):
+        aggregate = _AGGREGATE.match(item)
+        if aggregate:
+            func, arg = aggregate.group("func").lower(), aggregate.group("arg").strip()
+            if func not in ESTIMABLE or (arg == "*" and func not in ("count", "count_big")):
+                return None
+            name = _unbracket(aggregate.group("alias") or f"{func}_{i + 1}")
+            outputs.append(("agg", name, func, arg))
+            continue
+        aliased = _ALIAS.match(item)
+        expr, name = (aliased.group("expr"), aliased.group("alias")) if aliased else (item, item)
+        if _norm(expr) not in normalized_keys:
+            if _norm(item) not in normalized_keys:
+                return None
+            expr, name = item, item
+        outputs.append(("key", _unbracket(name.split(".")[-1]), normalized_keys.index(_norm(expr))))
+    if not any(output[0] == "agg" for output in outputs):
+        return None
+    return AggregatePlan(match.group("table"), match.group("alias"), where, keys, outputs,
+                         match.group("order"))
+
+
+def format_estimate(estimate: dict) -> str:
+    def cell(value):
+        if isinstance(value, float):
+            return f"{value:.6g}"
+        return str(value)
+
+    lines = [",".join(estimate["columns"])]
+    lines += [",".join(cell(v) for v in row) for row in estimate["rows"]]
+    return "\n".join(lines)
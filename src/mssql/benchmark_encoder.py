@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark for RowEncoder: rows per second against worker count on a
+synthetic wide result (ints, decimals, datetimes, floats and strings).
+One worker is the inline encoding; the pool is started before timing.
+
+Usage:
+    python -m src.mssql.benchmark_encoder --rows 200000 --columns 24
+    python -m src.mssql.benchmark_encoder --workers 1,2,4,8 --repeat 5
+"""
+
+import argparse
+import datetime
+import decimal
+import os
+import random
+import time
+
+try:
+    from .encoder import RowEncoder, encode_rows
+except ImportError:  # run as a script: python src/mssql/benchmark_encoder.py
+    from encoder import RowEncoder, encode_rows
+
+
+def make_rows(count: int, columns: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1)
+    makers = [
+        lambda: rng.randrange(10 ** 9),
+        lambda: decimal.Decimal(rng.randrange(10 ** 8)).scaleb(-2),
+        lambda: start + datetime.timedelta(seconds=rng.randrange(10 ** 8)),
+        lambda: rng.random() * 1000,
+        lambda: "".join(rng.choice("abcdefghij") for _ in range(12)),
+    ]
+    kinds = [makers[i % len(makers)] for i in range(columns)]
+    return [tuple(make() for make in kinds) for _ in range(count)]
+
+
+def run(rows: list, workers: list, repeat: int, chunk_rows: int) -> list:
+    expected = encode_rows(rows)
+    results = []
+    for count in workers:
+        encoder = RowEncoder(workers=count, min_rows=0, chunk_rows=chunk_rows)
+        try:
+            # Start the pool before timing, as a long-running server would have
+            encoder.encode(rows[:1])
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                text = encoder.encode(rows)
+                best = min(best, time.perf_counter() - started)
+                if text != expected:
+                    raise AssertionError(f"Output with {count} workers differs from the inline encoding")
+        finally:
+            encoder.close()
+        results.append({"workers": count, "seconds": best, "rows_per_second": len(rows) / best})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=24)
+    parser.add_argument("--workers", default=None,
+                        help="comma-separated worker counts (default: 1, 2, 4, ... up to the core count)")
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per worker count; the best is reported")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        workers = [int(w) for w in args.workers.split(",")]
+    else:
+        cores = os.cpu_count() or 1
+        workers = sorted({1, cores} | {2 ** i for i in range(1, cores.bit_length()) if 2 ** i <= cores})
+
+    rows = make_rows(args.rows, args.columns)
+    print(f"{args.rows} rows x {args.columns} columns, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    results = run(rows, workers, args.repeat, args.chunk_rows)
+    baseline = results[0]["seconds"]
+    for result in results:
+        print(f"{result['workers']:>8} {result['seconds']:>9.3f} {result['rows_per_second']:>12,.0f} "
+              f"{baseline / result['seconds']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("mssql_cache")
+
+
+class DiskCache:
+    """
+    Two-tier cache: a small in-process LRU in front of a SQLite file.
+
+    The SQLite tier runs in WAL mode with a busy timeout, so any number of
+    uvicorn workers and MCP server processes can read and write the same file
+    at once, and a freshly started process finds everything its predecessors
+    cached. The file is kept under max_bytes by evicting the least recently
+    used entries.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, memory_items: int = 256,
+                 evict_every: int = 50):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.evict_every = evict_every
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires REAL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(namespace: str, key: str) -> str:
+        return f"{namespace}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value, or None on a miss or expired entry."""
+        full_key = self.make_key(namespace, key)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(full_key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._memory.move_to_end(full_key)
+                    self.hits["memory"] += 1
+                    return value
+                del self._memory[full_key]
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (full_key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                with self._lock:
+                    self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, full_key))
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed: {str(e)}")
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self.hits["disk"] += 1
+            self._remember(full_key, value, row[1])
+        return value
+
+    def set(self, namespace: str, key: str, value, ttl: float = None):
+        full_key = self.make_key(namespace, key)
+        encoded = json.dumps(value, default=str)
+        now = time.time()
+        expires = now + ttl if ttl else None
+        with self._lock:
+            self._remember(full_key, value, expires)
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (full_key, encoded, len(encoded), expires, now),
+            )
+            if evict or len(encoded) > self.max_bytes // 100:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed: {str(e)}")
+
+    def _remember(self, full_key, value, expires):
+        self._memory[full_key] = (value, expires)
+        self._memory.move_to_end(full_key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then least recently used ones until the file is
+        back under 90% of max_bytes. Returns the number of entries removed.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?",
+                                   (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            target = int(self.max_bytes * 0.9)
+            if total > self.max_bytes:
+                victims = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                    if total <= target:
+                        break
+                    victims.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                removed += len(victims)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def preload(self, limit: int = None) -> int:
+        """Load the most recently used entries into memory so a new process starts warm."""
+        limit = limit or self.memory_items
+        rows = self._conn().execute(
+            "SELECT key, value, expires FROM entries WHERE expires IS NULL OR expires > ? "
+            "ORDER BY accessed DESC LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+        with self._lock:
+            for key, value, expires in reversed(rows):
+                self._remember(key, json.loads(value), expires)
+        return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        self._conn().execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        entries, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_hits": self.hits["memory"],
+                "disk_hits": self.hits["disk"],
+                "misses": self.misses,
+            }
+
+
+def cache_from_env():
+    """
+    Build the shared cache from MSSQL_CACHE_PATH / MSSQL_CACHE_MAX_MB, or
+    return None when caching is not configured.
+    """
+    path = os.getenv("MSSQL_CACHE_PATH")
+    if not path:
+        return None
+    max_bytes = int(float(os.getenv("MSSQL_CACHE_MAX_MB", "256")) * 1024 * 1024)
+    try:
+        return DiskCache(path, max_bytes=max_bytes)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Result cache disabled, cannot open {path}: {str(e)}")
+        return None
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+
+from mcp.types import ResourceUpdatedNotification, ResourceUpdatedNotificationParams, ServerNotification
+
+try:
+    from .preview import quote_identifier, quote_table
+except ImportError:  # run as a script: python src/mssql/server.py
+    from preview import quote_identifier, quote_table
+
+logger = logging.getLogger("mssql_changes")
+
+CHANGE_TRACKING_ENABLED = "SELECT 1 FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID(?)"
+PRIMARY_KEY_COLUMNS = (
+    "SELECT c.name FROM sys.indexes i "
+    "JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id "
+    "JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id "
+    "WHERE i.object_id = OBJECT_ID(?) AND i.is_primary_key = 1 ORDER BY ic.key_ordinal"
+)
+# system_type_id 189 is timestamp/rowversion
+ROWVERSION_COLUMN = "SELECT name FROM sys.columns WHERE object_id = OBJECT_ID(?) AND system_type_id = 189"
+
+OPERATIONS = {"I": "insert", "U": "update", "D": "delete"}
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+class TableFeed:
+    """
+    Reads the rows of one table that changed since a version.
+
+    Uses SQL Server Change Tracking when it is enabled on the table (inserts,
+    updates and deletes, by primary key). Otherwise uses a rowversion column,
+    which only reveals inserted and updated rows. Tables with neither cannot
+    be watched.
+    """
+
+    def __init__(self, connection_factory, table: str, mode: str, keys: list, rowversion: str = None):
+        self.connection_factory = connection_factory
+        self.table = table
+        self.mode = mode
+        self.keys = keys
+        self.rowversion = rowversion
+        self.version = None
+
+    @classmethod
+    def open(cls, connection_factory, table: str) -> "TableFeed":
+        """Detect how the table can be tracked and start from its current version."""
+        with connection_factory() as conn:
+            cursor = conn.cursor()
+            keys = [row[0] for row in cursor.execute(PRIMARY_KEY_COLUMNS, table).fetchall()]
+            if keys and cursor.execute(CHANGE_TRACKING_ENABLED, table).fetchone():
+                feed = cls(connection_factory, table, "change_tracking", keys)
+            else:
+                row = cursor.execute(ROWVERSION_COLUMN, table).fetchone()
+                if not row:
+                    raise ValueError(
+                        f"Table {table} has neither Change Tracking (with a primary key) nor a rowversion column")
+                feed = cls(connection_factory, table, "rowversion", keys, row[0])
+            feed.version = feed._current_version(cursor)
+        return feed
+
+    def _current_version(self, cursor) -> int:
+        if self.mode == "change_tracking":
+            return int(cursor.execute("SELECT CHANGE_TRACKING_CURRENT_VERSION()").fetchone()[0] or 0)
+        # Rows below MIN_ACTIVE_ROWVERSION are committed, so none can appear later below it
+        return int.from_bytes(cursor.execute("SELECT MIN_ACTIVE_ROWVERSION()").fetchone()[0], "big")
+
+    def poll(self, max_rows: int = None):
+        """
+        Fetch the changes since the last poll and advance the version. With
+        max_rows, at most max_rows + 1 rows are read; a larger delta comes
+        back as {"truncated": True} with no changes.
+
+        Returns:
+            dict: from_version, to_version and changes ({"operation", "key",
+            "row"} each), or {"reset": True} if Change Tracking no longer
+            retains the versions since the last poll; None if nothing changed
+        """
+        with self.connection_factory() as conn:
+            cursor = conn.cursor()
+            since, current = self.version, self._current_version(cursor)
+            if current == since:
+                return None
+            if self.mode == "change_tracking":
+                delta = self._change_tracking_delta(cursor, since, current, max_rows)
+            else:
+                delta = self._rowversion_delta(cursor, since, current, max_rows)
+        self.version = current
+        return delta
+
+    @staticmethod
+    def _fetch(cursor, max_rows):
+        """The delta's rows, or None if there are more than max_rows."""
+        if not max_rows:
+            return cursor.fetchall()
+        rows = cursor.fetchmany(max_rows + 1)
+        if len(rows) > max_rows:
+            # Subscribers re-read the resource instead; drop the rest on the server side
+            cancel = getattr(cursor, "cancel", None)
+            if cancel:
+                cancel()
+            return None
+        return rows
+
+    def _change_tracking_delta(self, cursor, since, current, max_rows=None):
+        min_valid = cursor.execute("SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?))", self.table).fetchone()[0]
+        if min_valid is not None and since < min_valid:
+            return {"from_version": since, "to_version": current, "reset": True, "changes": []}
+        keys = [quote_identifier(k) for k in self.keys]
+        join = " AND ".join(f"t.{k} = ct.{k}" for k in keys)
+        cursor.execute(
+            f"SELECT ct.SYS_CHANGE_OPERATION, {', '.join('ct.' + k for k in keys)}, t.* "
+            f"FROM CHANGETABLE(CHANGES {quote_table(self.table)}, ?) AS ct "
+            f"LEFT JOIN {quote_table(self.table)} AS t ON {join} "
+            f"WHERE ct.SYS_CHANGE_VERSION <= ? ORDER BY ct.SYS_CHANGE_VERSION",
+            since, current,
+        )
+        columns = [desc[0] for desc in cursor.description][1 + len(keys):]
+        rows = self._fetch(cursor, max_rows)
+        if rows is None:
+            return {"from_version": since, "to_version": current, "changes": [], "truncated": True}
+        changes = []
+        for row in rows:
+            operation = OPERATIONS.get(row[0], row[0])
+            values = row[1 + len(keys):]
+            changes.append({
+                "operation": operation,
+                "key": {k: _jsonable(v) for k, v in zip(self.keys, row[1:1 + len(keys)])},
+                "row": None if operation == "delete" else {c: _jsonable(v) for c, v in zip(columns, values)},
+            })
+        return {"from_version": since, "to_version": current, "changes": changes}
+
+    def _rowversion_delta(self, cursor, since, current, max_rows=None):
+        column = quote_identifier(self.rowversion)
+        cursor.execute(
+            f"SELECT * FROM {quote_table(self.table)} WHERE {column} >= ? AND {column} < ? ORDER BY {column}",
+            since.to_bytes(8, "big"), current.to_bytes(8, "big"),
+        )
+        columns = [desc[0] for desc in cursor.description]
+        rows = self._fetch(cursor, max_rows)
+        if rows is None:
+            return {"from_version": since, "to_version": current, "changes": [], "truncated": True}
+        changes = []
+        for values in rows:
+            row = {c: _jsonable(v) for c, v in zip(columns, values)}
+            changes.append({"operation": "upsert", "key": {k: row.get(k) for k in self.keys} or None, "row": row})
+        return {"from_version": since, "to_version": current, "changes": changes}
+
+
+class SubscriptionManager:
+    """
+    MCP resource subscriptions on tables. The first subscriber to a table
+    starts a single poller for it; every poll fetches only the rows changed
+    since the previous one and sends them to all of the table's subscribers
+    in the _meta of a notifications/resources/updated message. Deltas over
+    max_rows are sent as {"truncated": True} so clients re-read the resource.
+    The poller stops when the last subscriber leaves.
+    """
+
+    def __init__(self, open_feed, interval: float = 2.0, max_rows: int = 500):
+        self.open_feed = open_feed
+        self.interval = interval
+        self.max_rows = max_rows
+        self._subscribers = {}  # table -> {session: uri}
+        self._pollers = {}
+        self.polls = 0
+        self.deltas = 0
+        self.rows = 0
+        self.errors = 0
+
+    async def subscribe(self, table: str, uri: str, session):
+        if table not in self._pollers:
+            feed = await asyncio.to_thread(self.open_feed, table)
+            if table not in self._pollers:
+                self._pollers[table] = asyncio.create_task(self._poll(table, feed))
+        self._subscribers.setdefault(table, {})[session] = uri
+
+    def unsubscribe(self, table: str, session):
+        subscribers = self._subscribers.get(table, {})
+        subscribers.pop(session, None)
+        if not subscribers:
+            self._subscribers.pop(table, None)
+            poller = self._pollers.pop(table, None)
+            if poller:
+                poller.cancel()
+
+    async def _poll(self, table: str, feed):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                delta = await asyncio.to_thread(feed.poll, self.max_rows)
+                self.polls += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Change poll for {table} failed: {str(e)}")
+                continue
+            if delta is not None:
+                await self.publish(table, {"table": table, "mode": feed.mode, **delta})
+
+    async def publish(self, table: str, delta: dict):
+        """Send a delta to every subscriber of the table, dropping sessions that are gone."""
+        if len(delta["changes"]) > self.max_rows:
+            delta = {**delta, "changes": [], "truncated": True}
+        self.deltas += 1
+        self.rows += len(delta["changes"])
+        for session, uri in list(self._subscribers.get(table, {}).items()):
+            notification = ServerNotification(ResourceUpdatedNotification(
+                params=ResourceUpdatedNotificationParams(uri=uri, _meta={"delta": delta}),
+            ))
+            try:
+                await session.send_notification(notification)
+            except Exception as e:
+                logger.info(f"Dropping subscriber to {table}: {str(e)}")
+                self.unsubscribe(table, session)
+
+    def stats(self) -> dict:
+        return {
+            "tables": len(self._pollers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "polls": self.polls,
+            "deltas": self.deltas,
+            "rows": self.rows,
+            "errors": self.errors,
+        }
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+def encode_rows(rows) -> str:
+    """CSV lines for rows, the way format_rows has always written them."""
+    return "\n".join([",".join(map(str, row)) for row in rows])
+
+
+class RowEncoder:
+    """
+    Converts result rows to CSV text, optionally splitting large results
+    across a persistent process pool.
+
+    str() on decimals and datetimes is CPU-bound Python, so a wide result of
+    hundreds of thousands of rows keeps one core busy for seconds. With
+    workers >= 2, results of at least min_rows rows are cut into chunks of
+    chunk_rows, encoded by the pool and joined back in order. Rows are
+    pickled to the workers, which costs roughly twice the encoding itself,
+    so this only pays off with several idle cores; measure with
+    benchmark_encoder before enabling it. The pool uses the forkserver start
+    method where available (spawn elsewhere), so workers are never forked
+    from this multi-threaded process. workers=1 (the default) encodes inline.
+    """
+
+    def __init__(self, workers: int = 1, min_rows: int = 20000, chunk_rows: int = 5000):
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        self.min_rows = min_rows
+        self.chunk_rows = chunk_rows
+        self.parallel = 0
+        self.inline = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+            return self._pool
+
+    def encode(self, rows) -> str:
+        if self.workers < 2 or len(rows) < self.min_rows:
+            self.inline += 1
+            return encode_rows(rows)
+        self.parallel += 1
+        # Driver row objects may not pickle; plain tuples always do
+        chunks = [[tuple(row) for row in rows[start:start + self.chunk_rows]]
+                  for start in range(0, len(rows), self.chunk_rows)]
+        return "\n".join(self._executor().map(encode_rows, chunks))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "min_rows": self.min_rows,
+                "parallel": self.parallel, "inline": self.inline}
+
+
+def encoder_from_env() -> RowEncoder:
+    return RowEncoder(
+        workers=int(os.getenv("MSSQL_ENCODE_WORKERS", "1")),
+        min_rows=int(os.getenv("MSSQL_ENCODE_MIN_ROWS", "20000")),
+        chunk_rows=int(os.getenv("MSSQL_ENCODE_CHUNK_ROWS", "5000")),
+    )
@@ -0,0 +1,136 @@
+import contextvars
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+
+class FetchedRows(list):
+    """Rows returned by MemoryBudget.fetch; truncated names the budget that cut them short, if any."""
+    truncated = None
+
+
+def row_bytes(row) -> int:
+    """Approximate memory held by a fetched row: the row object plus its values."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+class RequestMeter:
+    """Bytes fetched on behalf of one request, checked against both budgets."""
+
+    def __init__(self, budget: "MemoryBudget"):
+        self.budget = budget
+        self.bytes = 0
+        self.truncated = None
+
+    def reserve(self, size: int) -> bool:
+        """Account for size more bytes; False (and truncated set) if a budget would be exceeded."""
+        budget = self.budget
+        with budget._lock:
+            if budget.request_bytes and self.bytes + size > budget.request_bytes:
+                self.truncated = "request"
+            elif budget.global_bytes and budget.in_use + size > budget.global_bytes:
+                self.truncated = "global"
+            else:
+                self.bytes += size
+                budget.in_use += size
+                budget.peak_in_use = max(budget.peak_in_use, budget.in_use)
+                return True
+        return False
+
+
+class MemoryBudget:
+    """
+    Byte accounting for fetched query results.
+
+    Rows are fetched batch_rows at a time and counted as they arrive, so a
+    result that would exceed the per-request budget (request_bytes) or push
+    the bytes held by all requests past global_bytes stops early instead of
+    being materialized in full. A budget of 0 is unlimited. Every query run
+    inside one request() shares that request's budget.
+    """
+
+    def __init__(self, request_bytes: int = 0, global_bytes: int = 0, batch_rows: int = 1000):
+        self.request_bytes = request_bytes
+        self.global_bytes = global_bytes
+        self.batch_rows = batch_rows
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.requests = 0
+        self.total_bytes = 0
+        self.peak_request_bytes = 0
+        self.truncated_requests = 0
+        self._current = contextvars.ContextVar("memory_request", default=None)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self):
+        """Meter for the current request; nested calls reuse the enclosing one."""
+        meter = self._current.get()
+        if meter is not None:
+            yield meter
+            return
+        meter = RequestMeter(self)
+        token = self._current.set(meter)
+        try:
+            yield meter
+        finally:
+            self._current.reset(token)
+            with self._lock:
+                self.in_use -= meter.bytes
+                self.requests += 1
+                self.total_bytes += meter.bytes
+                self.peak_request_bytes = max(self.peak_request_bytes, meter.bytes)
+                if meter.truncated:
+                    self.truncated_requests += 1
+
+    def fetch(self, cursor) -> FetchedRows:
+        """
+        Fetch the cursor's rows within the current request's budget. If a
+        budget is hit the rest of the result is cancelled and the rows so
+        far are returned with truncated set to "request" or "global".
+        """
+        with self.request() as meter:
+            rows = FetchedRows()
+            while True:
+                batch = cursor.fetchmany(self.batch_rows)
+                if not batch:
+                    return rows
+                for row in batch:
+                    if not meter.reserve(row_bytes(row)):
+                        # Drop the rest of the result on the server side
+                        cancel = getattr(cursor, "cancel", None)
+                        if cancel:
+                            cancel()
+                        rows.truncated = meter.truncated
+                        return rows
+                    rows.append(row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "request_budget_bytes": self.request_bytes,
+                "global_budget_bytes": self.global_bytes,
+                "in_use_bytes": self.in_use,
+                "peak_in_use_bytes": self.peak_in_use,
+                "requests": self.requests,
+                "peak_request_bytes": self.peak_request_bytes,
+                "avg_request_bytes": round(self.total_bytes / self.requests) if self.requests else 0,
+                "truncated_requests": self.truncated_requests,
+            }
+
+
+# Start of the line appended to CSV results cut short by a budget
+TRUNCATION_PREFIX = "-- TRUNCATED"
+
+
+def truncation_marker(rows: int, truncated: str) -> str:
+    return f"{TRUNCATION_PREFIX} after {rows} rows: result exceeded the {truncated} memory budget"
+
+
+def memory_budget_from_env() -> MemoryBudget:
+    return MemoryBudget(
+        request_bytes=int(os.getenv("MSSQL_REQUEST_MAX_BYTES", str(256 * 1024 * 1024))),
+        global_bytes=int(os.getenv("MSSQL_GLOBAL_MAX_BYTES", str(1024 * 1024 * 1024))),
+        batch_rows=int(os.getenv("MSSQL_FETCH_BATCH_ROWS", "1000")),
+    )
@@ -0,0 +1,191 @@
+import datetime
+import decimal
+import logging
+import random
+import time
+
+logger = logging.getLogger("mssql_preview")
+
+# Oversampling factor for TABLESAMPLE, which picks whole pages and so tends to
+# return fewer rows than the percentage suggests
+TABLESAMPLE_OVERSAMPLE = 4
+
+# Number of random clustered-key seeks used by the key-range sample
+KEY_RANGE_SEEKS = 10
+
+
+def quote_identifier(name: str) -> str:
+    """Bracket-quote a single identifier, escaping any closing brackets."""
+    name = name.strip()
+    if name.startswith("[") and name.endswith("]"):
+        name = name[1:-1].replace("]]", "]")
+    if not name:
+        raise ValueError("Empty identifier")
+    return "[" + name.replace("]", "]]") + "]"
+
+
+def quote_table(table: str) -> str:
+    """Quote a possibly schema-qualified table name: dbo.Sales -> [dbo].[Sales]."""
+    parts = table.split(".")
+    if len(parts) > 2:
+        raise ValueError(f"Invalid table name: {table}")
+    return ".".join(quote_identifier(part) for part in parts)
+
+
+def approx_row_count(conn, table: str) -> int:
+    """
+    Row count from partition metadata instead of COUNT(*): reads
+    sys.dm_db_partition_stats for the heap or clustered index only.
+    """
+    row = conn.cursor().execute(
+        "SELECT COALESCE(SUM(row_count), 0) FROM sys.dm_db_partition_stats "
+        "WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)",
+        table,
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def run_within_budget(conn, sql, params, deadline):
+    """Execute with the connection's query timeout set to the remaining budget."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Preview time budget exhausted")
+    previous = getattr(conn, "timeout", 0)
+    conn.timeout = max(1, int(remaining))
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, *params)
+        columns = [desc[0] for desc in cursor.description]
+        return columns, cursor.fetchall()
+    finally:
+        conn.timeout = previous
+
+
+def _clustered_key(conn, table: str):
+    row = conn.cursor().execute(
+        "SELECT c.name FROM sys.indexes i "
+        "JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id "
+        "JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id "
+        "WHERE i.object_id = OBJECT_ID(?) AND i.index_id = 1 AND ic.key_ordinal = 1",
+        table,
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _random_between(low, high, rng):
+    if isinstance(low, bool):
+        return None
+    if isinstance(low, int):
+        return rng.randint(low, high)
+    if isinstance(low, (float, decimal.Decimal)):
+        return type(low)(str(rng.uniform(float(low), float(high))))
+    if isinstance(low, (datetime.datetime, datetime.date)):
+        return low + (high - low) * rng.random()
+    return None
+
+
+def key_range_sample(conn, table, select_list, rows, deadline, rng):
+    """
+    Seek to random points along the leading clustered-key column and read a
+    few rows after each. Only index seeks are issued, so cost stays bounded
+    even on very large tables. Returns None if the key is not usable.
+    """
+    key = _clustered_key(conn, table)
+    if key is None:
+        return None
+    quoted_key = quote_identifier(key)
+    _, bounds = run_within_budget(
+        conn, f"SELECT MIN({quoted_key}), MAX({quoted_key}) FROM {quote_table(table)}", (), deadline)
+    low, high = bounds[0] if bounds else (None, None)
+    if low is None or high is None or _random_between(low, high, rng) is None:
+        return None
+    per_seek = max(1, -(-rows // KEY_RANGE_SEEKS))
+    points = sorted(_random_between(low, high, rng) for _ in range(KEY_RANGE_SEEKS))
+    columns, sample = None, []
+    for point in points:
+        if len(sample) >= rows or time.monotonic() >= deadline:
+            break
+        columns, found = run_within_budget(
+            conn,
+            f"SELECT TOP ({per_seek}) {select_list} FROM {quote_table(table)} "
+            f"WHERE {quoted_key} >= ? ORDER BY {quoted_key}",
+            (point,),
+            deadline,
+        )
+        sample.extend(found)
+    return columns, sample[:rows]
+
+
+def sample_table(conn, table: str, columns=None, rows: int = 100, budget: float = 5.0, seed=None) -> dict:
+    """
+    Return a representative sample of a table within a time budget.
+
+    Small tables are read directly. Larger ones use TABLESAMPLE, then a
+    clustered-key range sample if TABLESAMPLE fails or comes back short, and
+    finally TOP as a last resort; a short TABLESAMPLE result is returned if
+    the budget runs out first or TOP fails. Identifiers are bracket-quoted and values
+    passed as parameters, so user-supplied names cannot inject SQL.
+
+    Args:
+        conn: Open database connection
+        table: Table name, optionally schema-qualified
+        columns: Column names to return (default: all)
+        rows: Maximum number of rows in the sample
+        budget: Seconds allowed for the sampling queries
+        seed: Seed for the key-range sample, for repeatable previews
+
+    Returns:
+        dict: table, approx_row_count, method, columns and rows
+    """
+    deadline = time.monotonic() + budget
+    rng = random.Random(seed)
+    quoted = quote_table(table)
+    select_list = ", ".join(quote_identifier(c) for c in columns) if columns else "*"
+    total = approx_row_count(conn, table)
+    result = None
+    short = None  # a TABLESAMPLE result with too few rows, kept as the fallback
+    method = "full"
+
+    if total > rows:
+        percent = min(100.0, 100.0 * rows * TABLESAMPLE_OVERSAMPLE / total)
+        try:
+            result = run_within_budget(
+                conn,
+                f"SELECT TOP ({rows}) {select_list} FROM {quoted} TABLESAMPLE SYSTEM ({percent:.6f} PERCENT)",
+                (),
+                deadline,
+            )
+            method = "tablesample"
+            if len(result[1]) < rows // 2:
+                short, result = result, None
+        except Exception as e:
+            logger.info(f"TABLESAMPLE preview of {table} failed, trying key range: {str(e)}")
+            result = None
+        if result is None:
+            try:
+                result = key_range_sample(conn, table, select_list, rows, deadline, rng)
+                method = "key_range"
+            except Exception as e:
+                logger.info(f"Key-range preview of {table} failed: {str(e)}")
+                result = None
+
+    if result is None and short is not None and time.monotonic() >= deadline:
+        result, method = short, "tablesample"
+    if result is None:
+        method = "full" if total <= rows else "top"
+        try:
+            result = run_within_budget(conn, f"SELECT TOP ({rows}) {select_list} FROM {quoted}", (), deadline)
+        except Exception:
+            if short is None:
+                raise
+            logger.info(f"TOP preview of {table} failed, using the short TABLESAMPLE result")
+            result, method = short, "tablesample"
+
+    result_columns, result_rows = result
+    return {
+        "table": table,
+        "approx_row_count": total,
+        "method": method,
+        "columns": result_columns,
+        "rows": [list(row) for row in result_rows],
+    }
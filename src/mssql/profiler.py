@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+
+try:
+    from .preview import quote_identifier, quote_table, run_within_budget
+except ImportError:  # run as a script: python src/mssql/server.py
+    from preview import quote_identifier, quote_table, run_within_budget
+
+logger = logging.getLogger("mssql_profiler")
+
+# Types MIN/MAX/APPROX_COUNT_DISTINCT cannot be applied to
+UNPROFILED_TYPES = {
+    "text", "ntext", "image", "xml", "geography", "geometry", "hierarchyid",
+    "sql_variant", "varbinary", "binary", "timestamp",
+}
+
+# Top values are only worth a GROUP BY for low-cardinality columns
+TOP_VALUES_MAX_DISTINCT = 1000
+
+
+def _expr(column: str, type_name: str) -> str:
+    quoted = quote_identifier(column)
+    return f"CAST({quoted} AS tinyint)" if type_name == "bit" else quoted
+
+
+def table_row_counts(conn) -> dict:
+    """Row count of every user table from partition metadata, keyed by schema.table."""
+    rows = conn.cursor().execute(
+        "SELECT OBJECT_SCHEMA_NAME(object_id) + '.' + OBJECT_NAME(object_id), SUM(row_count) "
+        "FROM sys.dm_db_partition_stats "
+        "WHERE index_id IN (0, 1) AND OBJECTPROPERTY(object_id, 'IsUserTable') = 1 "
+        "GROUP BY object_id"
+    ).fetchall()
+    return {name: int(count) for name, count in rows}
+
+
+def qualified_name(conn, table: str) -> str:
+    """schema.table for a table name given with or without its schema."""
+    row = conn.cursor().execute(
+        "SELECT OBJECT_SCHEMA_NAME(OBJECT_ID(?)), OBJECT_NAME(OBJECT_ID(?))", table, table).fetchone()
+    if not row or row[0] is None:
+        raise ValueError(f"Table not found: {table}")
+    return f"{row[0]}.{row[1]}"
+
+
+def profile_table(conn, table: str, top_n: int = 5, row_count: int = None, budget: float = 60.0) -> dict:
+    """
+    Profile every column of a table with one aggregate scan plus a GROUP BY
+    for each low-cardinality column, within a time budget. The scan must
+    finish in time; top values are only collected while budget remains.
+
+    Args:
+        conn: Open database connection
+        table: Table name, optionally schema-qualified
+        top_n: Number of most frequent values to keep per column
+        row_count: Partition-stats row count the profile corresponds to
+        budget: Seconds allowed for the profiling queries
+
+    Returns:
+        dict: table, row_count, profiled_at and per-column approx_distinct,
+        min, max, null_fraction and top_values
+    """
+    columns = conn.cursor().execute(
+        "SELECT c.name, t.name FROM sys.columns c "
+        "JOIN sys.types t ON t.user_type_id = c.user_type_id "
+        "WHERE c.object_id = OBJECT_ID(?) ORDER BY c.column_id",
+        table,
+    ).fetchall()
+    if not columns:
+        raise ValueError(f"Table not found: {table}")
+    deadline = time.monotonic() + budget
+
+    quoted_table = quote_table(table)
+    profiled = [(name, type_name) for name, type_name in columns if type_name not in UNPROFILED_TYPES]
+    select = ["COUNT_BIG(*)"]
+    for name, type_name in profiled:
+        expr = _expr(name, type_name)
+        select += [
+            f"APPROX_COUNT_DISTINCT({expr})",
+            f"MIN({expr})",
+            f"MAX({expr})",
+            f"SUM(CASE WHEN {quote_identifier(name)} IS NULL THEN 1 ELSE 0 END)",
+        ]
+    stats = run_within_budget(conn, f"SELECT {', '.join(select)} FROM {quoted_table}", (), deadline)[1][0]
+    total = int(stats[0])
+
+    result = {}
+    for i, (name, type_name) in enumerate(profiled):
+        distinct, low, high, nulls = stats[1 + 4 * i: 5 + 4 * i]
+        result[name] = {
+            "type": type_name,
+            "approx_distinct": int(distinct or 0),
+            "min": low,
+            "max": high,
+            "null_fraction": round(nulls / total, 4) if total else 0.0,
+            "top_values": [],
+        }
+        if total and distinct and distinct <= TOP_VALUES_MAX_DISTINCT and time.monotonic() < deadline:
+            quoted = quote_identifier(name)
+            try:
+                _, top = run_within_budget(
+                    conn,
+                    f"SELECT TOP ({top_n}) {quoted}, COUNT_BIG(*) FROM {quoted_table} "
+                    f"WHERE {quoted} IS NOT NULL GROUP BY {quoted} ORDER BY COUNT_BIG(*) DESC",
+                    (),
+                    deadline,
+                )
+            except Exception as e:
+                logger.info(f"Top values of {table}.{name} skipped: {str(e)}")
+                continue
+            result[name]["top_values"] = [[value, int(count)] for value, count in top]
+    for name, type_name in columns:
+        if type_name in UNPROFILED_TYPES:
+            result[name] = {"type": type_name}
+
+    return {
+        "table": table,
+        "row_count": row_count if row_count is not None else total,
+        "profiled_at": time.time(),
+        "columns": result,
+    }
+
+
+def format_profile(profile: dict) -> str:
+    """Compact text form of a profile for LLM prompts."""
+    lines = [f"Table {profile['table']} (~{profile['row_count']} rows):"]
+    for name, col in profile["columns"].items():
+        if "approx_distinct" not in col:
+            lines.append(f"  {name} {col['type']}")
+            continue
+        line = (f"  {name} {col['type']}: ~{col['approx_distinct']} distinct, "
+                f"range {col['min']}..{col['max']}, {col['null_fraction']:.0%} null")
+        if col["top_values"]:
+            line += "; top: " + ", ".join(f"{v} ({n})" for v, n in col["top_values"])
+        lines.append(line)
+    return "\n".join(lines)
+
+
+# Cache entry listing the profiled table names
+TABLES_KEY = "_tables"
+
+
+class ProfileStore:
+    """
+    Cached table profiles, optionally persisted in the shared DiskCache so
+    other processes (and restarts) reuse them. refresh_changed() re-profiles
+    only tables whose partition-stats row count moved by more than
+    change_ratio of the profiled count (0 re-profiles on any change).
+    """
+
+    def __init__(self, cache=None, change_ratio: float = 0.1, max_per_cycle: int = 10, budget: float = 60.0):
+        self.cache = cache
+        self.change_ratio = change_ratio
+        self.max_per_cycle = max_per_cycle
+        self.budget = budget
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str):
+        with self._lock:
+            profile = self._profiles.get(table)
+        if profile is None and self.cache:
+            profile = self.cache.get("profile", table)
+            if profile is not None:
+                with self._lock:
+                    self._profiles[table] = profile
+        return profile
+
+    def put(self, profile: dict):
+        with self._lock:
+            self._profiles[profile["table"]] = profile
+        if self.cache:
+            self.cache.set("profile", profile["table"], profile)
+            # Cache keys are hashed, so keep the names for find()
+            tables = set(self.cache.get("profile", TABLES_KEY) or [])
+            if profile["table"] not in tables:
+                self.cache.set("profile", TABLES_KEY, sorted(tables | {profile["table"]}))
+
+    def find(self, table: str):
+        """
+        Profile of a table given with or without its schema; an unqualified
+        name matches only if exactly one cached table has it.
+        """
+        profile = self.get(table)
+        if profile is not None or "." in table:
+            return profile
+        matches = [name for name in self.tables() if name.split(".")[-1] == table]
+        return self.get(matches[0]) if len(matches) == 1 else None
+
+    def tables(self) -> list:
+        """Names of the profiled tables, in this process or in the shared cache."""
+        with self._lock:
+            names = set(self._profiles)
+        if self.cache:
+            names.update(self.cache.get("profile", TABLES_KEY) or [])
+        return sorted(names)
+
+    def all(self) -> dict:
+        profiles = {name: self.get(name) for name in self.tables()}
+        return {name: profile for name, profile in profiles.items() if profile is not None}
+
+    def is_stale(self, table: str, row_count: int) -> bool:
+        profile = self.get(table)
+        if profile is None:
+            return True
+        previous = profile["row_count"]
+        if previous == row_count:
+            return False
+        return abs(row_count - previous) > self.change_ratio * max(previous, 1)
+
+    def refresh_changed(self, connection_factory) -> list:
+        """
+        Re-profile tables whose row counts changed, at most max_per_cycle per
+        call. Returns the tables that were profiled.
+        """
+        with connection_factory() as conn:
+            counts = table_row_counts(conn)
+        stale = [table for table, count in counts.items() if self.is_stale(table, count)]
+        refreshed = []
+        for table in stale[:self.max_per_cycle]:
+            try:
+                with connection_factory() as conn:
+                    self.put(profile_table(conn, table, row_count=counts[table], budget=self.budget))
+                refreshed.append(table)
+            except Exception as e:
+                logger.warning(f"Profiling {table} failed: {str(e)}")
+        return refreshed
@@ -1,15 +1,53 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import json
 import sys
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import asyncio
 import logging
-import pyodbc
 from mcp.server import Server
-from mcp.types import Resource, Tool, TextContent
-from pydantic import AnyUrl
+from mcp.types import Resource, ResourceTemplate, Tool, TextContent
 import re
+from urllib.parse import urlsplit, parse_qs
+from typing import TYPE_CHECKING
+
+if __name__ == "__main__":
+    # Run as the package's __main__ module rather than as a script. Encoder
+    # pool workers (forkserver or spawn) re-execute a main script, with all
+    # of the setup below, to unpickle objects from it, but they never re-run
+    # a package's __main__.
+    import runpy
+    sys.path[0] = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    runpy.run_module("src.mssql", run_name="__main__", alter_sys=True)
+    sys.exit()
+
+try:
+    from .approx import format_estimate, parse_aggregate_query
+    from .cache import cache_from_env
+    from .changes import SubscriptionManager, TableFeed
+    from .encoder import encoder_from_env
+    from .memory import memory_budget_from_env, truncation_marker
+    from .preview import approx_row_count, sample_table
+    from .profiler import ProfileStore, format_profile, profile_table, qualified_name
+    from .slowlog import SORT_KEYS, capture_statistics, slow_log_from_env
+except ImportError:  # run as a script: python src/mssql/server.py
+    from approx import format_estimate, parse_aggregate_query
+    from cache import cache_from_env
+    from changes import SubscriptionManager, TableFeed
+    from encoder import encoder_from_env
+    from memory import memory_budget_from_env, truncation_marker
+    from preview import approx_row_count, sample_table
+    from profiler import ProfileStore, format_profile, profile_table, qualified_name
+    from slowlog import SORT_KEYS, capture_statistics, slow_log_from_env
+
+if TYPE_CHECKING:
+    from pydantic import AnyUrl
 
 # Load environment variables
 load_dotenv()
@@ -20,32 +58,285 @@ logger = logging.getLogger("mssql_mcp_server")
 app = Server("mssql_mcp_server")
 
 class DBConfig:
-    def __init__(self):
-        self.config = {
+    def __init__(self, config=None, pool_size=None):
+        self.config = config or {
             "server": os.getenv("MSSQL_SERVER"),
             "database": os.getenv("MSSQL_DATABASE"), 
             "user": os.getenv("MSSQL_USER"),
             "password": os.getenv("MSSQL_PASSWORD"),
             "driver": os.getenv("MSSQL_DRIVER")
         }
-        self.connection = None
+        self.pool_size = pool_size or int(os.getenv("MSSQL_POOL_SIZE", "5"))
+        self.router = None
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connection_string(self):
+        conn_str = (
+            f"DRIVER={self.config['driver']};"
+            f"SERVER={self.config['server']};"
+            f"DATABASE={self.config['database']};"
+            f"UID={self.config['user']};"
+            f"PWD={self.config['password']};"
+            "TrustServerCertificate=yes"
+        )
+        if self.config.get("application_intent"):
+            conn_str += f";ApplicationIntent={self.config['application_intent']}"
+        return conn_str
+
+    def add_replicas(self, servers):
+        """Route reads to these readable secondaries, falling back to this server."""
+        replicas = [
+            Replica(DBConfig({**self.config, "server": server, "application_intent": "ReadOnly"},
+                             pool_size=self.pool_size))
+            for server in servers
+        ]
+        self.router = ReplicaRouter(replicas) if replicas else None
+
+    def connect(self):
+        # pyodbc loads the ODBC driver manager, so it is imported on first use
+        # rather than when the server module is imported.
+        import pyodbc
+        return pyodbc.connect(self.connection_string(), readonly=True)  # readonly=True
 
     def get_connection(self):
+        """Take an idle connection from the pool, or open a new one."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.connect()
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool; broken, closed or surplus connections are dropped."""
+        with self._lock:
+            if not broken and not getattr(conn, "closed", False) and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def pooled_connection(self):
+        conn = self.get_connection()
         try:
-            if not self.connection:
-                conn_str = (
-                    f"DRIVER={self.config['driver']};"
-                    f"SERVER={self.config['server']};"
-                    f"DATABASE={self.config['database']};"
-                    f"UID={self.config['user']};"
-                    f"PWD={self.config['password']};"
-                    "TrustServerCertificate=yes"
-                )
-                self.connection = pyodbc.connect(conn_str, readonly=True)  # readonly=True
-            return self.connection
-        except:
-            self.connection = None
+            yield conn
+        except Exception as e:
+            self.release(conn, broken=_is_connection_error(e))
             raise
+        else:
+            self.release(conn)
+
+    @contextmanager
+    def connection(self):
+        """Pooled connection, on the best read replica when replicas are configured."""
+        replica = self.router.choose() if self.router else None
+        conn = None
+        if replica is not None:
+            try:
+                conn = replica.db.get_connection()
+            except Exception as e:
+                replica.mark_failed(e)
+                logger.warning(f"Replica {replica.name} unavailable, using primary: {str(e)}")
+        if conn is None:
+            if self.router:
+                self.router.count_primary()
+            with self.pooled_connection() as conn:
+                yield conn
+            return
+        replica.begin()
+        try:
+            yield conn
+        except Exception as e:
+            broken = _is_connection_error(e)
+            if broken:
+                replica.mark_failed(e)
+            replica.db.release(conn, broken=broken)
+            raise
+        else:
+            replica.db.release(conn)
+        finally:
+            replica.end()
+
+    def warm_up(self, count=None):
+        """Open connections until `count` (default: pool size) are idle. Returns how many were opened."""
+        target = self.pool_size if count is None else min(count, self.pool_size)
+        opened = 0
+        while True:
+            with self._lock:
+                if len(self._idle) >= target:
+                    return opened
+            conn = self.connect()
+            opened += 1
+            self.release(conn)
+
+# Estimated seconds for a secondary to redo its queued log; overridable for
+# other replication setups (log shipping, etc.)
+REPLICA_LAG_QUERY = os.getenv("MSSQL_REPLICA_LAG_QUERY") or (
+    "SELECT ISNULL(MAX(CASE WHEN redo_rate > 0 THEN redo_queue_size * 1.0 / redo_rate ELSE 0 END), 0) "
+    "FROM sys.dm_hadr_database_replica_states WHERE database_id = DB_ID() AND is_local = 1"
+)
+
+class Replica:
+    """A readable secondary with its own pool, probe results and usage counters."""
+
+    def __init__(self, db: DBConfig):
+        self.db = db
+        self.name = db.config["server"]
+        self.healthy = False  # unknown until the first probe
+        self.latency_ms = None
+        self.lag_seconds = None
+        self.in_flight = 0
+        self.queries = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_probe = None
+        self._lock = threading.Lock()
+
+    def probe(self, lag_query: str = REPLICA_LAG_QUERY):
+        """Measure round-trip latency and replication lag with one cheap query."""
+        start = time.perf_counter()
+        try:
+            with self.db.pooled_connection() as conn:
+                row = conn.cursor().execute(lag_query).fetchone()
+        except Exception as e:
+            self.mark_failed(e)
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            # Smooth probe latency so one slow probe does not flip routing
+            self.latency_ms = elapsed_ms if self.latency_ms is None else 0.7 * self.latency_ms + 0.3 * elapsed_ms
+            self.lag_seconds = float(row[0] or 0) if row else 0.0
+            self.healthy = True
+            self.last_error = None
+            self.last_probe = time.time()
+
+    def mark_failed(self, error):
+        with self._lock:
+            self.healthy = False
+            self.failures += 1
+            self.last_error = str(error)
+            self.last_probe = time.time()
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.queries += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def score(self):
+        # Latency weighted by current load spreads bursts across replicas
+        return self.latency_ms * (1 + self.in_flight)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "server": self.name,
+                "healthy": self.healthy,
+                "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+                "lag_seconds": self.lag_seconds,
+                "in_flight": self.in_flight,
+                "queries": self.queries,
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "last_probe": self.last_probe,
+            }
+
+class ReplicaRouter:
+    """Picks the healthy, sufficiently fresh replica with the lowest load-weighted latency."""
+
+    def __init__(self, replicas: list, max_lag: float = None):
+        self.replicas = replicas
+        self.max_lag = max_lag if max_lag is not None else float(os.getenv("MSSQL_REPLICA_MAX_LAG", "30"))
+        self.primary_queries = 0
+        self._lock = threading.Lock()
+
+    def count_primary(self):
+        """Record a query that fell back to the primary; called from pool threads."""
+        with self._lock:
+            self.primary_queries += 1
+
+    def choose(self):
+        candidates = [
+            r for r in self.replicas
+            if r.healthy and r.lag_seconds is not None and r.lag_seconds <= self.max_lag
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: r.score())
+
+    def probe_all(self):
+        for replica in self.replicas:
+            replica.probe()
+        return sum(1 for r in self.replicas if r.healthy)
+
+    def stats(self) -> dict:
+        with self._lock:
+            primary_queries = self.primary_queries
+        return {
+            "max_lag_seconds": self.max_lag,
+            "primary_queries": primary_queries,
+            "replicas": [r.stats() for r in self.replicas],
+        }
+
+class TargetRegistry:
+    """
+    Named database targets, each with its own connection pool.
+
+    "default" comes from the MSSQL_* variables. MSSQL_TARGETS adds more as a
+    JSON object of name -> overrides, e.g.
+    {"tenant_a": {"database": "TenantA"}, "tenant_b": {"server": "sql2", "database": "TenantB"}};
+    keys that are not overridden are inherited from the default target.
+    Readable secondaries come from MSSQL_READ_REPLICAS (comma-separated
+    servers) for the default target, or a "replicas" list in an override.
+    """
+
+    def __init__(self, targets: dict):
+        self.targets = targets
+
+    @classmethod
+    def from_env(cls):
+        default = DBConfig()
+        targets = {"default": default}
+        raw = os.getenv("MSSQL_TARGETS")
+        if raw:
+            for name, overrides in json.loads(raw).items():
+                overrides = dict(overrides)
+                pool_size = overrides.pop("pool_size", None)
+                replicas = overrides.pop("replicas", [])
+                targets[name] = DBConfig({**default.config, **overrides}, pool_size=pool_size)
+                targets[name].add_replicas(replicas)
+        default.add_replicas([s.strip() for s in os.getenv("MSSQL_READ_REPLICAS", "").split(",") if s.strip()])
+        return cls(targets)
+
+    def routers(self) -> dict:
+        return {name: t.router for name, t in self.targets.items() if t.router}
+
+    def get(self, name: str) -> DBConfig:
+        if name not in self.targets:
+            raise ValueError(f"Unknown database target: {name}")
+        return self.targets[name]
+
+    def resolve(self, names) -> list[str]:
+        """Expand a list of target names; "*" means every target from MSSQL_TARGETS."""
+        resolved = []
+        for name in names:
+            if name == "*":
+                expanded = [n for n in self.targets if n != "default"] or ["default"]
+            else:
+                self.get(name)
+                expanded = [name]
+            resolved.extend(n for n in expanded if n not in resolved)
+        return resolved
+
+def _is_connection_error(error):
+    # OperationalError/InterfaceError mean the link itself is unusable; errors
+    # in the SQL text leave the connection fine to reuse.
+    return type(error).__name__ in ("OperationalError", "InterfaceError")
 
 class SQLValidator:
     @staticmethod
@@ -82,24 +373,439 @@ class SQLValidator:
             
         return True
 
-db = DBConfig()
+class SchemaCatalog:
+    """Cached list of base tables, reloaded after `ttl` seconds."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._tables = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def tables(self, refresh: bool = False) -> list[str]:
+        with self._lock:
+            fresh = self._tables is not None and time.monotonic() - self._loaded_at < self.ttl
+            if fresh and not refresh:
+                return self._tables
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            rows = cursor.execute(
+                "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'"
+            ).fetchall()
+        tables = [row[0] for row in rows]
+        with self._lock:
+            self._tables = tables
+            self._loaded_at = time.monotonic()
+        return tables
+
+registry = TargetRegistry.from_env()
+db = registry.get("default")
 sql_validator = SQLValidator()
+catalog = SchemaCatalog(ttl=float(os.getenv("MSSQL_CATALOG_TTL", "300")))
+
+_background_tasks = set()
+
+def start_background(coro) -> asyncio.Task:
+    """Run coro as a task, referenced until it finishes so it is not garbage collected."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+BATCH_MAX_QUERIES = int(os.getenv("MSSQL_BATCH_MAX_QUERIES", "100"))
+
+# Sampled previews: default/maximum rows and the time budget per preview
+PREVIEW_ROWS = int(os.getenv("MSSQL_PREVIEW_ROWS", "100"))
+PREVIEW_MAX_ROWS = int(os.getenv("MSSQL_PREVIEW_MAX_ROWS", "10000"))
+PREVIEW_BUDGET = float(os.getenv("MSSQL_PREVIEW_BUDGET", "5"))
+
+# Shared on-disk result cache (None unless MSSQL_CACHE_PATH is set)
+result_cache = cache_from_env()
+RESULT_CACHE_TTL = float(os.getenv("MSSQL_RESULT_CACHE_TTL", "300"))
+
+# Column profiles, kept fresh by an optional background profiler
+profiles = ProfileStore(
+    cache=result_cache,
+    change_ratio=float(os.getenv("MSSQL_PROFILE_CHANGE_RATIO", "0.1")),
+    max_per_cycle=int(os.getenv("MSSQL_PROFILE_MAX_PER_CYCLE", "10")),
+    budget=float(os.getenv("MSSQL_PROFILE_BUDGET", "60")),
+)
+
+# Slow query log (None unless MSSQL_SLOW_LOG_PATH is set). With
+# MSSQL_CAPTURE_STATS every query runs under SET STATISTICS IO, TIME so slow
+# entries carry CPU time and logical reads, not just wall-clock time.
+slow_log = slow_log_from_env()
+CAPTURE_STATS = os.getenv("MSSQL_CAPTURE_STATS", "false").lower() == "true"
+
+# Byte budgets for fetched rows, per tool call / resource read and across all of them
+memory = memory_budget_from_env()
+
+# CSV encoding of large results, spread over forked worker processes
+encoder = encoder_from_env()
+
+# Resource subscriptions: one Change Tracking / rowversion poller per watched table
+subscriptions = SubscriptionManager(
+    lambda table: TableFeed.open(db.connection, table),
+    interval=float(os.getenv("MSSQL_SUBSCRIPTION_INTERVAL", "2")),
+    max_rows=int(os.getenv("MSSQL_SUBSCRIPTION_MAX_ROWS", "500")),
+)
+
+def execute_query(query: str, target: DBConfig = None, capture: bool = False):
+    """
+    Run a query on a pooled connection, timing it and recording it in the
+    slow query log if it crossed the threshold.
+
+    Rows are fetched within the memory budget; a result cut short has
+    stats["truncated"] set to the budget that was hit.
+
+    Returns:
+        tuple: (columns, rows, stats); stats always has elapsed_ms and rows,
+        plus the SET STATISTICS IO, TIME figures when capture is set
+    """
+    target = target or db
+    with target.connection() as conn:
+        start = time.perf_counter()
+        if capture:
+            columns, rows, stats = capture_statistics(conn, query, fetch=memory.fetch)
+        else:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            columns = [desc[0] for desc in cursor.description]
+            rows = memory.fetch(cursor)
+            stats = {}
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    stats["rows"] = len(rows)
+    if getattr(rows, "truncated", None):
+        stats["truncated"] = rows.truncated
+    if slow_log:
+        slow_log.record(query, stats, target=target.config.get("database"))
+    return columns, rows, stats
+
+def run_query(query: str, target: DBConfig = None):
+    """Run a query on a pooled connection and return (columns, rows)."""
+    columns, rows, stats = execute_query(query, target, capture=CAPTURE_STATS)
+    if stats.get("truncated"):
+        logger.warning(f"Result truncated at {len(rows)} rows by the {stats['truncated']} memory budget")
+    return columns, rows
+
+def format_rows(columns, rows) -> str:
+    header = ",".join(columns)
+    if not rows:
+        return header
+    return header + "\n" + encoder.encode(rows)
+
+def result_text(columns, rows, stats: dict) -> str:
+    """CSV text of a result, ending in a truncation marker if the memory budget cut it short."""
+    text = format_rows(columns, rows)
+    if stats.get("truncated"):
+        text += "\n" + truncation_marker(len(rows), stats["truncated"])
+    return text
+
+def result_cache_key(query: str, target: DBConfig = None) -> str:
+    """Cache key for a query's result; the cache file may be shared by servers on other databases."""
+    config = (target or db).config
+    return f"{config.get('server')}/{config.get('database')}\n{query}"
+
+def query_text(query: str, use_cache: bool = True) -> str:
+    """
+    Run a query on the default target as CSV text, using the shared result
+    cache when enabled. With use_cache=False the cached entry is not read
+    (a fresh result still replaces it).
+    """
+    if result_cache and use_cache:
+        cached = result_cache.get("mcp_result", result_cache_key(query))
+        if cached is not None:
+            return cached
+    columns, rows, stats = execute_query(query, capture=CAPTURE_STATS)
+    text = result_text(columns, rows, stats)
+    # Budgets depend on concurrent load, so truncated results are not cached
+    if result_cache and not stats.get("truncated"):
+        result_cache.set("mcp_result", result_cache_key(query), text, ttl=RESULT_CACHE_TTL)
+    return text
+
+# How partial aggregates from each target are combined; per-target counts add up
+AGGREGATES = {
+    "sum": sum,
+    "count": sum,
+    "min": min,
+    "max": max,
+}
+
+def combine_aggregates(columns, rows, aggregate: dict):
+    """
+    Merge partial aggregates computed on several targets. Columns named in
+    `aggregate` are combined with the given function; every other column is
+    treated as a group-by key. AVG cannot be combined this way, so ask for
+    SUM and COUNT instead and divide.
+    """
+    for column, func in aggregate.items():
+        if column not in columns:
+            raise ValueError(f"Aggregate column {column} is not in the result")
+        if func not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate {func}; use one of {', '.join(AGGREGATES)}")
+    agg_idx = [columns.index(c) for c in aggregate]
+    key_idx = [i for i in range(len(columns)) if i not in agg_idx]
+    groups = {}
+    for row in rows:
+        key = tuple(row[i] for i in key_idx)
+        groups.setdefault(key, []).append(row)
+    combined = []
+    for key, group in groups.items():
+        out = [None] * len(columns)
+        for i, value in zip(key_idx, key):
+            out[i] = value
+        for i, column in zip(agg_idx, aggregate):
+            values = [row[i] for row in group if row[i] is not None]
+            out[i] = AGGREGATES[aggregate[column]](values) if values else None
+        combined.append(out)
+    return combined
+
+async def fan_out(query: str, names: list[str], aggregate: dict = None) -> list[TextContent]:
+    """
+    Run one query on several targets in parallel and merge the results,
+    tagging every row with a _source column (or combining aggregates).
+    """
+    results = await asyncio.gather(
+        *(asyncio.to_thread(run_query, query, registry.get(name)) for name in names),
+        return_exceptions=True,
+    )
+    columns = None
+    merged = []
+    errors = []
+    notes = []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            errors.append(f"{name}: {str(result)}")
+            continue
+        target_columns, rows = result
+        truncated = getattr(rows, "truncated", None)
+        if truncated and aggregate:
+            # Combining a partial result would silently understate the totals
+            errors.append(f"{name}: result exceeded the {truncated} memory budget, not aggregated")
+            continue
+        if truncated:
+            notes.append(f"{truncation_marker(len(rows), truncated)} on {name}")
+        if columns is None:
+            columns = target_columns
+        elif target_columns != columns:
+            errors.append(f"{name}: columns {target_columns} do not match {columns}")
+            continue
+        if aggregate:
+            merged.extend(rows)
+        else:
+            merged.extend([name, *row] for row in rows)
+
+    content = []
+    if columns is not None:
+        if aggregate:
+            text = await asyncio.to_thread(format_rows, columns, combine_aggregates(columns, merged, aggregate))
+        else:
+            text = await asyncio.to_thread(format_rows, ["_source"] + columns, merged)
+        if notes:
+            text += "\n" + "\n".join(notes)
+        content.append(TextContent(type="text", text=text))
+    if errors:
+        content.append(TextContent(type="text", text="Error: " + "\n".join(errors)))
+    return content
+
+# Approximate mode: TABLESAMPLE percentages tried in turn, the error at which
+# an estimate is good enough, and the table size below which sampling is
+# not worth it
+APPROX_STEPS = [float(p) for p in os.getenv("MSSQL_APPROX_STEPS", "0.1,1,10").split(",") if p.strip()]
+APPROX_TARGET_ERROR = float(os.getenv("MSSQL_APPROX_TARGET_ERROR", "0.01"))
+APPROX_MIN_ROWS = int(os.getenv("MSSQL_APPROX_MIN_ROWS", "1000000"))
+
+def table_row_count(table: str) -> int:
+    with db.connection() as conn:
+        return approx_row_count(conn, table)
+
+async def approximate_query(query: str, target_error: float = None, exact: bool = True, report=None) -> dict:
+    """
+    Answer an aggregate query progressively: run it on growing TABLESAMPLE
+    subsets, scale each result up with 95% error bounds, and stop once every
+    estimate is within target_error, or finish with the exact query.
+
+    Args:
+        query: Aggregate SELECT; ineligible queries simply run exactly
+        target_error: Relative error (e.g. 0.01) at which to stop early
+        exact: Run the exact query if no sample met the target
+        report: Optional async callback receiving each stage as it completes
+
+    Returns:
+        dict: text of the final result and the list of stages
+    """
+    target_error = APPROX_TARGET_ERROR if target_error is None else target_error
+    plan = parse_aggregate_query(query)
+    stages = []
+    if plan is not None:
+        total = await asyncio.to_thread(table_row_count, plan.table)
+        if total >= APPROX_MIN_ROWS:
+            for seed, percent in enumerate(APPROX_STEPS, start=1):
+                start = time.perf_counter()
+                columns, rows = await asyncio.to_thread(run_query, plan.sample_query(percent, seed))
+                if getattr(rows, "truncated", None):
+                    # Estimates from part of a sample are biased; larger samples would be cut too
+                    break
+                if not rows:
+                    continue
+                estimate = plan.estimate(columns, rows, percent / 100.0)
+                stage = {
+                    "stage": "estimate",
+                    "sample_percent": percent,
+                    "max_relative_error": round(estimate["max_relative_error"], 6),
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "text": format_estimate(estimate),
+                }
+                stages.append(stage)
+                if report:
+                    await report(stage, len(APPROX_STEPS) + 1)
+                if estimate["max_relative_error"] <= target_error:
+                    return {"text": stage["text"], "exact": False, "stages": stages}
+    if not exact and stages:
+        return {"text": stages[-1]["text"], "exact": False, "stages": stages}
+    start = time.perf_counter()
+    text = await asyncio.to_thread(query_text, query)
+    stage = {"stage": "exact", "elapsed_ms": round((time.perf_counter() - start) * 1000, 1), "text": text}
+    stages.append(stage)
+    if report:
+        await report(stage, len(APPROX_STEPS) + 1)
+    return {"text": text, "exact": True, "stages": stages}
+
+def progress_reporter():
+    """
+    Callback sending each approximate stage as an MCP progress notification,
+    or None when the client did not ask for progress.
+    """
+    try:
+        ctx = app.request_context
+    except LookupError:
+        return None
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+    sent = 0
+
+    async def report(stage, total):
+        nonlocal sent
+        sent += 1
+        label = (f"Estimate from {stage['sample_percent']:g}% sample "
+                 f"(±{stage['max_relative_error']:.2%})" if stage["stage"] == "estimate" else "Exact result")
+        await ctx.session.send_progress_notification(
+            token, sent, total=total, message=f"{label}:\n{stage['text']}", related_request_id=ctx.request_id)
+
+    return report
+
+IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+
+def _import_pyodbc():
+    import pyodbc  # noqa: F401
+
+def probe_replicas():
+    """Probe every read replica once; returns how many are healthy."""
+    return sum(router.probe_all() for router in registry.routers().values())
+
+async def monitor_replicas(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(probe_replicas)
+
+async def run_profiler(interval: float):
+    """Re-profile tables whose row counts changed, every `interval` seconds."""
+    while True:
+        try:
+            refreshed = await asyncio.to_thread(profiles.refresh_changed, db.connection)
+            if refreshed:
+                logger.info(f"Profiled tables: {', '.join(refreshed)}")
+        except Exception as e:
+            logger.warning(f"Background profiler failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+def get_profile(table: str, refresh: bool = False) -> dict:
+    """Cached profile of a table, computing it now if missing or refresh is requested."""
+    profile = profiles.find(table)
+    if profile is None or refresh:
+        with db.connection() as conn:
+            # Stored under schema.table, however the table was named
+            name = profile["table"] if profile else qualified_name(conn, table)
+            profile = profile_table(conn, name, row_count=approx_row_count(conn, name), budget=profiles.budget)
+        profiles.put(profile)
+    return profile
+
+def server_stats() -> dict:
+    return {
+        "replicas": {name: router.stats() for name, router in registry.routers().items()},
+        "cache": result_cache.stats() if result_cache else None,
+        "profiled_tables": len(profiles.tables()),
+        "slow_log": slow_log.stats() if slow_log else None,
+        "subscriptions": subscriptions.stats(),
+        "memory": memory.stats(),
+        "encoder": encoder.stats(),
+    }
+
+async def run_batch(queries: list[str]) -> list[dict]:
+    """
+    Validate and run several read-only queries at once, each on its own pooled
+    connection, with at most pool_size in flight. One failure does not affect
+    the others.
+    """
+    slots = asyncio.Semaphore(db.pool_size)
+
+    async def run_one(query):
+        if not isinstance(query, str) or not query.strip():
+            return {"query": query, "result": None, "error": "Query is required"}
+        if not sql_validator.is_read_only_query(query):
+            return {"query": query, "result": None, "error": "Only SELECT queries are allowed"}
+        async with slots:
+            try:
+                text = await asyncio.to_thread(query_text, query)
+            except Exception as e:
+                return {"query": query, "result": None, "error": str(e)}
+        return {"query": query, "result": text, "error": None}
+
+    return await asyncio.gather(*(run_one(query) for query in queries))
+
+def warm_up() -> dict:
+    """
+    Pay the cold-start costs before the first request: import pyodbc, fill
+    the connection pool, probe read replicas, preload the result cache and
+    load the table catalog.
+
+    Returns:
+        dict: Timings in milliseconds (and counts) for each step
+    """
+    timings = {"import_ms": round(IMPORT_MS, 1)}
+    steps = [
+        ("pyodbc_import", _import_pyodbc),
+        ("pool", db.warm_up),
+        ("replicas", probe_replicas),
+        ("cache", lambda: result_cache.preload() if result_cache else None),
+        ("catalog", lambda: len(catalog.tables(refresh=True))),
+    ]
+    for step, func in steps:
+        start = time.perf_counter()
+        try:
+            value = func()
+        except Exception as e:
+            logger.warning(f"Warm-up step {step} failed: {str(e)}")
+            timings[f"{step}_error"] = str(e)
+            break
+        timings[f"{step}_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        if value is not None:
+            timings[f"{step}_count"] = value
+    logger.info(f"Warm-up finished: {timings}")
+    return timings
 
 @app.list_resources()
 async def list_resources() -> list[Resource]:
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        tables = cursor.execute(
-            "SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'"
-        ).fetchall()
+        tables = catalog.tables()
         
         return [
             Resource(
-                uri=f"mssql://{table[0]}/data",
-                name=f"Table: {table[0]}",
+                uri=f"mssql://{table}/data",
+                name=f"Table: {table}",
                 mimeType="application/json",
-                description=f"Data in table {table[0]}"
+                description=f"Data in table {table}"
             )
             for table in tables
         ]
@@ -107,30 +813,80 @@ async def list_resources() -> list[Resource]:
         logger.error(f"Failed to list resources: {str(e)}")
         return []
 
+@app.list_resource_templates()
+async def list_resource_templates() -> list[ResourceTemplate]:
+    return [
+        ResourceTemplate(
+            uriTemplate="mssql://{table}/preview{?columns,rows}",
+            name="Table preview",
+            mimeType="application/json",
+            description="Representative sample of a table (TABLESAMPLE or clustered-key ranges) "
+                        "with an approximate row count from partition stats"
+        )
+    ]
+
+def read_preview(table: str, params: dict) -> str:
+    columns = [c for c in params.get("columns", [""])[0].split(",") if c.strip()]
+    try:
+        rows = int(params.get("rows", [PREVIEW_ROWS])[0])
+    except ValueError:
+        raise ValueError("rows must be an integer")
+    rows = max(1, min(rows, PREVIEW_MAX_ROWS))
+    with db.connection() as conn:
+        preview = sample_table(conn, table, columns or None, rows=rows, budget=PREVIEW_BUDGET)
+    return json.dumps(preview, default=str)
+
 @app.read_resource()
 async def read_resource(uri: AnyUrl) -> str:
+    with memory.request():
+        return await _read_resource(uri)
+
+async def _read_resource(uri: AnyUrl) -> str:
     uri_str = str(uri)
     if not uri_str.startswith("mssql://"):
         raise ValueError(f"Invalid URI scheme: {uri_str}")
         
     table = uri_str[8:].split('/')[0]
+    parts = urlsplit(uri_str)
+    if parts.path == "/preview":
+        try:
+            return await asyncio.to_thread(read_preview, table, parse_qs(parts.query))
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error previewing table {table}: {str(e)}")
+            raise RuntimeError(f"Database error: {str(e)}")
+
     query = f"SELECT TOP 100 * FROM {table}"
     
     if not sql_validator.is_read_only_query(query):
         raise ValueError("Only SELECT queries are allowed")
         
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        result = [",".join(map(str, row)) for row in rows]
-        return "\n".join([",".join(columns)] + result)
+        columns, rows, stats = await asyncio.to_thread(execute_query, query, capture=CAPTURE_STATS)
+        return await asyncio.to_thread(result_text, columns, rows, stats)
     except Exception as e:
         logger.error(f"Error reading table {table}: {str(e)}")
         raise RuntimeError(f"Database error: {str(e)}")
 
+def subscribed_table(uri) -> str:
+    """Table of a subscribable mssql://{table}/data URI."""
+    parts = urlsplit(str(uri))
+    if parts.scheme != "mssql" or parts.path not in ("", "/data"):
+        raise ValueError(f"Only mssql://{{table}}/data resources can be subscribed to: {uri}")
+    if parts.netloc not in catalog.tables():
+        raise ValueError(f"Unknown table: {parts.netloc}")
+    return parts.netloc
+
+@app.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl) -> None:
+    table = await asyncio.to_thread(subscribed_table, uri)
+    await subscriptions.subscribe(table, str(uri), app.request_context.session)
+
+@app.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl) -> None:
+    subscriptions.unsubscribe(urlsplit(str(uri)).netloc, app.request_context.session)
+
 @app.list_tools()
 async def list_tools() -> list[Tool]:
     return [
@@ -140,15 +896,127 @@ async def list_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "query": {"type": "string", "description": "SQL SELECT query to execute"}
+                    "query": {"type": "string", "description": "SQL SELECT query to execute"},
+                    "targets": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Named database targets to run the query on in parallel (\"*\" for all); rows gain a _source column"
+                    },
+                    "aggregate": {
+                        "type": "object",
+                        "additionalProperties": {"type": "string", "enum": list(AGGREGATES)},
+                        "description": "With targets: combine these columns across targets (sum/count/min/max); other columns are group-by keys"
+                    },
+                    "approximate": {
+                        "type": "boolean",
+                        "description": "For COUNT/SUM/AVG aggregates over one large table: return TABLESAMPLE estimates with 95% error bounds, refined with larger samples (sent as progress notifications) until accurate enough or exact"
+                    },
+                    "max_relative_error": {
+                        "type": "number",
+                        "description": "With approximate: stop once every estimate is within this relative error (default 0.01)"
+                    },
+                    "exact": {
+                        "type": "boolean",
+                        "description": "With approximate: finish with the exact query if no estimate was accurate enough (default true)"
+                    },
+                    "statistics": {
+                        "type": "boolean",
+                        "description": "Run under SET STATISTICS IO, TIME (bypassing the result cache) and return elapsed, CPU and logical-read figures after the result"
+                    },
+                    "cache": {
+                        "type": "boolean",
+                        "description": "Serve from the shared result cache if possible (default true); false always queries the database"
+                    }
                 },
                 "required": ["query"]
             }
+        ),
+        Tool(
+            name="execute_sql_batch",
+            description="Execute several READ-ONLY SQL queries in parallel and return each result or error as JSON",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "SQL SELECT queries to execute"
+                    }
+                },
+                "required": ["queries"]
+            }
+        ),
+        Tool(
+            name="profile_table",
+            description="Column profiles (approximate distinct count, min/max, null fraction, top values) "
+                        "from the profile cache; omit table to get every cached profile",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "table": {"type": "string", "description": "Table name, optionally schema-qualified"},
+                    "refresh": {"type": "boolean", "description": "Re-profile now instead of using the cache"},
+                    "format": {"type": "string", "enum": ["json", "text"], "description": "text is compact, for prompts"}
+                }
+            }
+        ),
+        Tool(
+            name="slow_queries",
+            description="Top query fingerprints from the slow query log, ranked by total time (or another measure)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "limit": {"type": "integer", "description": "Number of fingerprints to return (default 10)"},
+                    "sort": {"type": "string", "enum": list(SORT_KEYS), "description": "Ranking measure (default total_ms)"}
+                }
+            }
+        ),
+        Tool(
+            name="server_stats",
+            description="Report server health as JSON: read replica latency, lag and routing counts, result "
+                        "cache hits, profiled tables, slow query log, resource subscriptions, memory budget "
+                        "use and result encoder counters",
+            inputSchema={"type": "object", "properties": {}}
         )
     ]
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    # Every query run for one tool call shares a single memory budget
+    with memory.request():
+        return await _call_tool(name, arguments)
+
+async def _call_tool(name: str, arguments: dict) -> list[TextContent]:
+    if name == "server_stats":
+        return [TextContent(type="text", text=json.dumps(server_stats(), indent=2))]
+    if name == "profile_table":
+        table = arguments.get("table")
+        try:
+            if table:
+                found = [await asyncio.to_thread(get_profile, table, bool(arguments.get("refresh")))]
+            else:
+                found = list(profiles.all().values())
+        except Exception as e:
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+        if arguments.get("format") == "text":
+            return [TextContent(type="text", text="\n\n".join(format_profile(p) for p in found))]
+        return [TextContent(type="text", text=json.dumps(found if not table else found[0], default=str))]
+    if name == "slow_queries":
+        if not slow_log:
+            return [TextContent(type="text", text="Error: Slow query log is not enabled (set MSSQL_SLOW_LOG_PATH)")]
+        try:
+            top = await asyncio.to_thread(
+                slow_log.top, int(arguments.get("limit", 10)), arguments.get("sort", "total_ms"))
+        except ValueError as e:
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+        return [TextContent(type="text", text=json.dumps(top, indent=2, default=str))]
+    if name == "execute_sql_batch":
+        queries = arguments.get("queries")
+        if not queries:
+            raise ValueError("Queries are required")
+        if len(queries) > BATCH_MAX_QUERIES:
+            return [TextContent(type="text", text=f"Error: At most {BATCH_MAX_QUERIES} queries per batch")]
+        results = await run_batch(queries)
+        return [TextContent(type="text", text=json.dumps(results, default=str))]
     if name != "execute_sql":
         raise ValueError(f"Unknown tool: {name}")
 
@@ -160,23 +1028,57 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     if not sql_validator.is_read_only_query(query):
         return [TextContent(type="text", text="Error: Only SELECT queries are allowed")]
 
+    targets = arguments.get("targets")
+    if targets:
+        try:
+            names = registry.resolve(targets)
+            return await fan_out(query, names, arguments.get("aggregate"))
+        except ValueError as e:
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+
+    if arguments.get("approximate"):
+        try:
+            result = await approximate_query(
+                query, arguments.get("max_relative_error"), arguments.get("exact", True), progress_reporter())
+        except Exception as e:
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+        summary = [{k: v for k, v in stage.items() if k != "text"} for stage in result["stages"]]
+        return [
+            TextContent(type="text", text=result["text"]),
+            TextContent(type="text", text=json.dumps({"exact": result["exact"], "stages": summary})),
+        ]
+
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        result = [",".join(map(str, row)) for row in rows]
-        return [TextContent(type="text", text="\n".join([",".join(columns)] + result))]
+        if arguments.get("statistics"):
+            columns, rows, stats = await asyncio.to_thread(execute_query, query, capture=True)
+            return [
+                TextContent(type="text", text=await asyncio.to_thread(result_text, columns, rows, stats)),
+                TextContent(type="text", text=json.dumps({"statistics": stats})),
+            ]
+        # Off the event loop: fetching and encoding a large result takes a while
+        return [TextContent(type="text", text=await asyncio.to_thread(
+            query_text, query, arguments.get("cache", True)))]
     except Exception as e:
         return [TextContent(type="text", text=f"Error: {str(e)}")]
 
 async def main():
     from mcp.server.stdio import stdio_server
+    if os.getenv("MSSQL_WARM_UP", "true").lower() == "true":
+        # Warm up alongside the MCP handshake; requests that arrive first
+        # simply open their own connection.
+        start_background(asyncio.to_thread(warm_up))
+    if os.getenv("MSSQL_PROFILER", "false").lower() == "true":
+        interval = float(os.getenv("MSSQL_PROFILE_INTERVAL", "600"))
+        start_background(run_profiler(interval))
+    if registry.routers():
+        interval = float(os.getenv("MSSQL_REPLICA_PROBE_INTERVAL", "15"))
+        start_background(monitor_replicas(interval))
     print("MCP server started, waiting for requests on stdin...", file=sys.stderr)  # Added for troubleshooting
     async with stdio_server() as (read_stream, write_stream):
-        await app.run(read_stream, write_stream, app.create_initialization_options())
+        options = app.create_initialization_options()
+        # The SDK always advertises subscribe=False; this server supports it
+        options.capabilities.resources.subscribe = True
+        await app.run(read_stream, write_stream, options)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import time
+
+logger = logging.getLogger("mssql_slowlog")
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w\]])[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", re.I)
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_TIMES = re.compile(
+    r"(parse and compile time|Execution Times):\s*CPU time = (\d+) ms,\s*elapsed time = (\d+) ms", re.I)
+_IO = re.compile(
+    r"Table '([^']+)'\. Scan count (\d+), logical reads (\d+)(?:, physical reads (\d+))?", re.I)
+
+# Ways slow_queries can rank fingerprints
+SORT_KEYS = ("total_ms", "count", "avg_ms", "max_ms", "cpu_ms", "logical_reads")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Reduce a query to its shape: comments dropped, literals replaced by ?,
+    IN lists collapsed and whitespace/case folded, so queries that differ
+    only in their constants share a fingerprint.
+    """
+    text = _COMMENTS.sub(" ", query)
+    text = _STRINGS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _IN_LISTS.sub("(?)", text)
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def fingerprint(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()[:16]
+
+
+def parse_statistics(messages) -> dict:
+    """
+    Sum the SET STATISTICS IO, TIME output of a batch.
+
+    Args:
+        messages: Informational messages from the driver, either strings or
+            pyodbc's (sqlstate, text) tuples
+
+    Returns:
+        dict: cpu_ms, server_elapsed_ms, compile_ms, logical_reads,
+        physical_reads and per-table logical reads
+    """
+    text = "\n".join(m[-1] if isinstance(m, (tuple, list)) else str(m) for m in messages)
+    stats = {"cpu_ms": 0, "server_elapsed_ms": 0, "compile_ms": 0,
+             "logical_reads": 0, "physical_reads": 0, "tables": {}}
+    for phase, cpu, elapsed in _TIMES.findall(text):
+        if phase.lower().startswith("parse"):
+            stats["compile_ms"] += int(elapsed)
+        else:
+            stats["cpu_ms"] += int(cpu)
+            stats["server_elapsed_ms"] += int(elapsed)
+    for table, _, logical, physical in _IO.findall(text):
+        stats["logical_reads"] += int(logical)
+        stats["physical_reads"] += int(physical or 0)
+        stats["tables"][table] = stats["tables"].get(table, 0) + int(logical)
+    return stats
+
+
+class _MessageCollector:
+    """
+    Accumulates cursor.messages, which pyodbc replaces after every execute()
+    and nextset() call; a list already seen is not counted twice.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.messages = []
+        self._last = None
+
+    def collect(self):
+        current = getattr(self.cursor, "messages", None)
+        if current and current is not self._last:
+            self.messages.extend(current)
+        self._last = current
+
+
+def capture_statistics(conn, query: str, fetch=None):
+    """
+    Run a query with SET STATISTICS IO, TIME on and collect the messages.
+    Statistics are switched off again afterwards, since the connection goes
+    back to the pool; if that fails the connection is closed so the pool
+    drops it. fetch(cursor) reads the rows (default: fetchall).
+
+    Returns:
+        tuple: (columns, rows, stats) with stats as from parse_statistics
+    """
+    cursor = conn.cursor()
+    cursor.execute("SET STATISTICS IO, TIME ON")
+    try:
+        cursor.execute(query)
+        collector = _MessageCollector(cursor)
+        collector.collect()
+        columns = [desc[0] for desc in cursor.description]
+        rows = fetch(cursor) if fetch else cursor.fetchall()
+        # Execution times are reported after the last result set. A fetch cut
+        # short by a memory budget has cancelled the statement, and nextset()
+        # on it would fail, so its statistics stay partial.
+        if not getattr(rows, "truncated", None):
+            nextset = getattr(cursor, "nextset", None)
+            while nextset is not None and nextset():
+                collector.collect()
+            collector.collect()
+    finally:
+        try:
+            cursor.execute("SET STATISTICS IO, TIME OFF")
+        except Exception as e:
+            # Keep the query's own error, if any, as the one raised
+            logger.warning(f"Could not switch statistics off, closing the connection: {str(e)}")
+            try:
+                conn.close()
+            except Exception:
+                pass
+    return columns, rows, parse_statistics(collector.messages)
+
+
+class SlowQueryLog:
+    """
+    Rotating JSON-lines log of queries slower than threshold_ms.
+
+    Each line holds the query, its fingerprint, wall-clock elapsed time and,
+    when statistics were captured, CPU time, server elapsed time and logical
+    reads. top() aggregates the current file and its rotated backups, so
+    the ranking survives restarts.
+    """
+
+    def __init__(self, path: str, threshold_ms: float = 1000.0, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 3):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.backup_count = backup_count
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._logger = logging.getLogger(f"mssql_slowlog.{os.path.abspath(path)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if not self._logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def record(self, query: str, stats: dict, target: str = None) -> bool:
+        """Append the query if it was slow; returns whether it was logged."""
+        if stats.get("elapsed_ms", 0) < self.threshold_ms:
+            return False
+        entry = {"ts": round(time.time(), 3), "fingerprint": fingerprint(query), "target": target,
+                 "query": query, **stats}
+        self._logger.info(json.dumps(entry, default=str))
+        return True
+
+    def entries(self):
+        """Logged entries, oldest first, across rotated files."""
+        paths = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)] + [self.path]
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def top(self, limit: int = 10, sort_by: str = "total_ms") -> list:
+        """
+        Aggregate entries by fingerprint and return the top `limit` groups.
+
+        Returns:
+            list: Dicts with fingerprint, normalized query, a sample query,
+            count, total/avg/max elapsed ms, CPU ms and logical reads
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort_by}; use one of {', '.join(SORT_KEYS)}")
+        groups = {}
+        for entry in self.entries():
+            group = groups.get(entry["fingerprint"])
+            if group is None:
+                group = groups[entry["fingerprint"]] = {
+                    "fingerprint": entry["fingerprint"],
+                    "normalized": normalize_query(entry["query"]),
+                    "sample": entry["query"],
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0, "cpu_ms": 0, "logical_reads": 0,
+                    "last_seen": entry["ts"],
+                }
+            elapsed = entry.get("elapsed_ms", 0)
+            group["count"] += 1
+            group["total_ms"] += elapsed
+            group["max_ms"] = max(group["max_ms"], elapsed)
+            group["cpu_ms"] += entry.get("cpu_ms", 0)
+            group["logical_reads"] += entry.get("logical_reads", 0)
+            group["last_seen"] = entry["ts"]
+        for group in groups.values():
+            group["total_ms"] = round(group["total_ms"], 1)
+            group["avg_ms"] = round(group["total_ms"] / group["count"], 1)
+        return sorted(groups.values(), key=lambda g: g[sort_by], reverse=True)[:limit]
+
+    def stats(self) -> dict:
+        return {"path": self.path, "threshold_ms": self.threshold_ms}
+
+
+def slow_log_from_env():
+    """
+    Build the slow query log from MSSQL_SLOW_LOG_PATH and friends, or return
+    None when it is not configured.
+    """
+    path = os.getenv("MSSQL_SLOW_LOG_PATH")
+    if not path:
+        return None
+    try:
+        return SlowQueryLog(
+            path,
+            threshold_ms=float(os.getenv("MSSQL_SLOW_QUERY_MS", "1000")),
+            max_bytes=int(float(os.getenv("MSSQL_SLOW_LOG_MAX_MB", "10")) * 1024 * 1024),
+            backup_count=int(os.getenv("MSSQL_SLOW_LOG_BACKUPS", "3")),
+        )
+    except OSError as e:
+        logger.warning(f"Slow query log disabled, cannot open {path}: {str(e)}")
+        return None
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.app.admission import AdmissionController, PrioritySlots, QueueFull, current_priority
+
+
+def test_admits_immediately_below_limit():
+    """
+    Test that requests under the concurrency limit do not wait.
+    """
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, max_queue=2)
+        waited = [await controller.acquire(), await controller.acquire()]
+        return controller, waited
+
+    controller, waited = asyncio.run(scenario())
+
+    assert waited == [0.0, 0.0]
+    assert controller.stats()["in_flight"] == 2
+
+
+def test_interactive_requests_jump_ahead_of_batch():
+    """
+    Test that a queued interactive request is admitted before earlier batch requests.
+    """
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=10)
+        order = []
+        await controller.acquire()
+
+        async def waiter(name, priority):
+            await controller.acquire(priority)
+            order.append(name)
+            controller.release()
+
+        tasks = [asyncio.create_task(waiter("batch-1", "batch")),
+                 asyncio.create_task(waiter("batch-2", "batch"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(waiter("interactive", "interactive")))
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == {"interactive": 1, "batch": 2}
+        controller.release()
+        await asyncio.gather(*tasks)
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+
+    assert order == ["interactive", "batch-1", "batch-2"]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_full_queue_rejects_with_retry_after():
+    """
+    Test that a request arriving at a full queue fails fast with a retry hint.
+    """
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        await controller.acquire()
+        queued = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull) as excinfo:
+            await controller.acquire()
+        # Unbounded (batch) callers still queue
+        unbounded = asyncio.create_task(controller.acquire("batch", bounded=False))
+        await asyncio.sleep(0)
+        depth = controller.queue_depth()
+        queued.cancel()
+        unbounded.cancel()
+        return controller, excinfo.value, depth
+
+    controller, error, depth = asyncio.run(scenario())
+
+    assert error.retry_after >= 1
+    assert controller.stats()["rejected"] == 1
+    assert depth == {"interactive": 1, "batch": 1}
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    """
+    Test that a waiter cancelled while queued does not consume a slot.
+    """
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=5)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        controller.release()
+        return controller
+
+    controller = asyncio.run(scenario())
+
+    assert controller.stats()["in_flight"] == 0
+    assert controller.queue_depth() == {"interactive": 0, "batch": 0}
+
+
+def test_priority_slots_prefer_interactive_threads():
+    """
+    Test that a freed LLM/DB slot goes to an interactive waiter before a batch waiter.
+    """
+    slots = PrioritySlots(1)
+    order = []
+    slots.acquire()
+
+    def worker(name, priority):
+        current_priority.set(priority)
+        with slots:
+            order.append(name)
+
+    batch = threading.Thread(target=worker, args=("batch", "batch"))
+    batch.start()
+    while slots.stats()["waiting"] < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=worker, args=("interactive", "interactive"))
+    interactive.start()
+    while slots.stats()["waiting"] < 2:
+        time.sleep(0.001)
+
+    slots.release()
+    batch.join()
+    interactive.join()
+
+    assert order == ["interactive", "batch"]
+    assert slots.stats()["in_use"] == 0
@@ -6,6 +6,7 @@ import os
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  
 
+import backend.app.answer as answer_module
 from backend.app.answer import (
     get_sql_documentation,
     execute_sql_query,
@@ -83,3 +84,166 @@ def test_answer_question(mock_anthropic, mock_execute_sql):
     assert isinstance(result, dict)
     assert "answer" in result
     assert "sql" in result
+
+
+def test_anthropic_client_is_built_lazily(monkeypatch):
+    """
+    Test that the Anthropic client is only created on first use.
+    """
+    # Arrange
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    with patch('backend.app.answer.anthropic_client', answer_module._UNSET):
+        # Act
+        client = answer_module.get_anthropic_client()
+
+        # Assert
+        assert client is None
+        assert answer_module.anthropic_client is None
+
+
+def test_generate_sql_uses_shared_cache(mock_anthropic, tmp_path):
+    """
+    Test that a cached NL->SQL translation skips the Anthropic call.
+    """
+    # Arrange
+    from src.mssql.cache import DiskCache
+    with patch('backend.app.answer.cache', DiskCache(str(tmp_path / "cache.sqlite"))):
+        # Act
+        first = generate_sql_from_question("How many users are there?")
+        second = generate_sql_from_question("how many users   are there?")
+
+    # Assert
+    assert first == second == "SELECT COUNT(*) FROM users"
+    mock_anthropic.messages.create.assert_called_once()
+
+
+def test_generate_sql_cache_is_scoped_to_the_database(mock_anthropic, tmp_path, monkeypatch):
+    """
+    Test that a translation cached for one database is not served to another.
+    """
+    # Arrange
+    from src.mssql.cache import DiskCache
+    with patch('backend.app.answer.cache', DiskCache(str(tmp_path / "cache.sqlite"))):
+        monkeypatch.setenv("MSSQL_DATABASE", "sales")
+        generate_sql_from_question("How many users are there?")
+
+        # Act
+        monkeypatch.setenv("MSSQL_DATABASE", "hr")
+        generate_sql_from_question("How many users are there?")
+
+    # Assert
+    assert mock_anthropic.messages.create.call_count == 2
+
+
+def test_answer_question_does_not_execute_sql_when_ai_fails(mock_anthropic, mock_execute_sql):
+    """
+    Test that an AI failure is reported without executing a placeholder query.
+    """
+    # Arrange
+    mock_anthropic.messages.create.side_effect = ValueError("invalid request")
+
+    # Act
+    result = answer_question("How many users are there?")
+
+    # Assert
+    assert result["sql"] is None
+    assert "unavailable" in result["answer"]
+    mock_execute_sql.assert_not_called()
+
+
+def test_follow_up_is_answered_from_session_results(mock_anthropic, mock_execute_sql):
+    """
+    Test that a follow-up refining an earlier result skips SQL Server.
+    """
+    # Arrange
+    mock_execute_sql.return_value = {"data": "name,price\nWidget,9.99\nGadget,19.5"}
+    answer_question("List products", session_id="s1")
+    mock_anthropic.messages.create.return_value = MagicMock(
+        content=[MagicMock(text="-- session\nSELECT name FROM result_1 ORDER BY price DESC")]
+    )
+
+    # Act
+    result = answer_question("now sort that by price", session_id="s1")
+
+    # Assert
+    mock_execute_sql.assert_called_once()
+    assert result["sql"].startswith("-- session")
+    prompt = mock_anthropic.messages.create.call_args_list[-2].kwargs["messages"][0]["content"]
+    assert "result_1 (2 rows; columns: name, price)" in prompt
+
+
+def test_warmed_answers_are_served_without_llm_or_database(mock_anthropic, mock_execute_sql, tmp_path):
+    """
+    Test that an answer stored by warm_answer short-circuits the pipeline.
+    """
+    # Arrange
+    from src.mssql.cache import DiskCache
+    with patch('backend.app.answer.cache', DiskCache(str(tmp_path / "cache.sqlite"))):
+        answer_module.warm_answer("How many users?", ttl=60)
+        calls = mock_anthropic.messages.create.call_count
+
+        # Act
+        result = answer_question("how many users?")
+
+    # Assert
+    assert mock_anthropic.messages.create.call_count == calls
+    mock_execute_sql.assert_called_once_with("SELECT COUNT(*) FROM users", refresh=True)
+    assert result["sql"] == "SELECT COUNT(*) FROM users"
+
+
+def test_warmed_answers_keep_their_result_grid(mock_anthropic, mock_execute_sql, tmp_path):
+    """
+    Test that a warmed answer still gets a result handle once the result cache entry is gone.
+    """
+    # Arrange
+    from src.mssql.cache import DiskCache
+    mock_execute_sql.return_value = {"data": "id,name\n1,Ann\n2,Bob"}
+    with patch('backend.app.answer.cache', DiskCache(str(tmp_path / "cache.sqlite"))):
+        answer_module.warm_answer("List users", ttl=60)
+
+        # Act
+        result = answer_question("list users")
+
+    # Assert
+    assert result["columns"] == ["id", "name"] and result["row_count"] == 2
+    assert "result" not in result
+
+
+def test_warmed_answers_are_scoped_to_the_database(mock_anthropic, mock_execute_sql, tmp_path, monkeypatch):
+    """
+    Test that an answer warmed on one database is not served to a backend on another.
+    """
+    # Arrange
+    from src.mssql.cache import DiskCache
+    with patch('backend.app.answer.cache', DiskCache(str(tmp_path / "cache.sqlite"))):
+        monkeypatch.setenv("MSSQL_DATABASE", "sales")
+        answer_module.warm_answer("How many users?", ttl=60)
+
+        # Act
+        monkeypatch.setenv("MSSQL_DATABASE", "hr")
+        answer_question("how many users?")
+
+    # Assert
+    assert mock_execute_sql.call_count == 2
+
+
+def test_truncated_results_are_flagged_and_not_cached(mock_anthropic, tmp_path):
+    """
+    Test that a result cut short by the memory budget is neither cached nor reported as complete.
+    """
+    # Arrange
+    import types
+    from src.mssql.cache import DiskCache
+    truncated = "id\n1\n-- TRUNCATED after 1 rows: result exceeded the request memory budget"
+    function = types.ModuleType("mcp.function")
+    function.execute_sql = MagicMock(return_value=truncated)
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    with patch.dict(sys.modules, {"mcp.function": function}), patch('backend.app.answer.IN_MCP', True), \
+            patch('backend.app.answer.cache', cache):
+        # Act
+        result = answer_question("list ids")
+        answer_module.execute_sql_query(result["sql"])
+
+    # Assert
+    assert function.execute_sql.call_count == 2
+    assert result["row_count"] == 1 and result["truncated"] is True
@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
@@ -45,7 +46,7 @@ def test_query_endpoint_with_valid_question(mock_answer_question):
     assert response.status_code == 200
     assert response.json()["answer"] == "There are 5 users in the database."
     assert response.json()["sql"] == "SELECT COUNT(*) FROM users"
-    mock_answer_question.assert_called_once_with(test_question)
+    mock_answer_question.assert_called_once_with(test_question, session_id=None)
 
 
 def test_query_endpoint_with_empty_question():
@@ -96,4 +97,179 @@ def test_query_endpoint_string_response(mock_answer_question):
     # Assert
     assert response.status_code == 200
     assert response.json()["answer"] == "Simple string answer"
-    assert response.json()["sql"] is None
\ No newline at end of file
+    assert response.json()["sql"] is None
+
+def test_health_reports_startup_timings():
+    """
+    Test that the startup warm-up runs in the lifespan and its timings are exposed.
+    """
+    with patch("backend.app.api.warm_up", return_value={"anthropic_client_ms": 1.0}) as mock_warm_up:
+        with TestClient(app) as started_client:
+            response = started_client.get("/health")
+
+    assert response.status_code == 200
+    mock_warm_up.assert_called_once()
+    assert response.json()["startup"]["anthropic_client_ms"] == 1.0
+    assert "import_ms" in response.json()["startup"]
+
+
+def test_batch_endpoint_streams_one_result_per_question(mock_answer_question):
+    """
+    Test that /query/batch answers duplicates once and streams a line for every question.
+    """
+    # Arrange
+    mock_answer_question.side_effect = lambda q: {"answer": f"answer to {q}", "sql": "SELECT 1"}
+    questions = ["How many users?", "How many orders?", "  how many  USERS? "]
+
+    # Act
+    response = client.post("/query/batch", json={"questions": questions})
+
+    # Assert
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda i: i["index"])
+    assert [item["index"] for item in items] == [0, 1, 2]
+    assert items[2]["answer"] == items[0]["answer"]
+    assert items[2]["question"] == questions[2]
+    assert mock_answer_question.call_count == 2
+
+
+def test_batch_endpoint_reports_errors_per_item(mock_answer_question):
+    """
+    Test that a failing pipeline produces an error item without failing the batch.
+    """
+    # Arrange
+    def answer(question, session_id=None):
+        if "bad" in question:
+            raise Exception("Test error")
+        return {"answer": "ok", "sql": None}
+    mock_answer_question.side_effect = answer
+
+    # Act
+    response = client.post("/query/batch", json={"questions": ["good", "bad"]})
+
+    # Assert
+    items = {item["question"]: item for item in map(json.loads, response.text.splitlines())}
+    assert items["good"]["error"] is None
+    assert items["bad"]["error"] == "Test error"
+
+
+def test_batch_endpoint_rejects_oversized_batches():
+    """
+    Test that a batch larger than BATCH_MAX_QUESTIONS is rejected up front.
+    """
+    with patch("backend.app.api.BATCH_MAX_QUESTIONS", 2):
+        response = client.post("/query/batch", json={"questions": ["a", "b", "c"]})
+
+    assert response.status_code == 413
+
+
+def test_query_returns_429_when_admission_queue_is_full():
+    """
+    Test that /query fails fast with Retry-After when no slot or queue space is left.
+    """
+    # Arrange
+    from backend.app.admission import QueueFull
+    with patch("backend.app.api.admission.acquire", side_effect=QueueFull(3)):
+        # Act
+        response = client.post("/query", json={"question": "How many users?"})
+
+    # Assert
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+
+def test_query_rejects_unknown_priority():
+    """
+    Test that an unknown X-Priority header is a client error.
+    """
+    response = client.post("/query", json={"question": "How many users?"}, headers={"X-Priority": "urgent"})
+
+    assert response.status_code == 400
+
+
+def test_stats_exposes_queue_depth_and_wait_times(mock_answer_question):
+    """
+    Test that /stats reports admission queue depth and wait times.
+    """
+    client.post("/query", json={"question": "How many users?"}, headers={"X-Priority": "batch"})
+
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    admission = response.json()["admission"]
+    assert admission["queue_depth"] == {"interactive": 0, "batch": 0}
+    assert admission["admitted"] >= 1
+    assert "p95_wait_ms" in admission
+    assert "in_use" in response.json()["llm_slots"]
+
+
+def test_query_returns_result_handle_and_pages(mock_answer_question):
+    """
+    Test that /query exposes the result handle and /results pages through it.
+    """
+    from backend.app import answer as answer_module
+    result_id = answer_module.results.put(["id"], [[i] for i in range(250)])
+    mock_answer_question.return_value = {
+        "answer": "250 rows", "sql": "SELECT id FROM t",
+        "result_id": result_id, "columns": ["id"], "row_count": 250,
+    }
+
+    data = client.post("/query", json={"question": "List ids"}).json()
+    page = client.get(f"/results/{data['result_id']}", params={"offset": 200, "limit": 100}).json()
+
+    assert data["row_count"] == 250
+    assert page["total"] == 250
+    assert page["rows"] == [[i] for i in range(200, 250)]
+    assert client.get("/results/unknown").status_code == 404
+
+
+def test_cancelled_request_holds_its_admission_slot_until_the_thread_finishes():
+    """
+    Test that cancelling run_admitted does not free the slot while answer_question still runs.
+    """
+    import asyncio
+    import threading
+    from backend.app import api
+    from backend.app.admission import AdmissionController
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_answer(question, session_id=None):
+        started.set()
+        release.wait(5)
+        return {"answer": "done"}
+
+    async def scenario():
+        task = asyncio.create_task(api.run_admitted("q", "batch", bounded=False))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        held = api.admission.in_flight
+        release.set()
+        while api.admission.in_flight:
+            await asyncio.sleep(0.01)
+        return held
+
+    with patch.object(api, "admission", AdmissionController(max_concurrent=2, max_queue=2)), \
+            patch.object(api, "answer_question", slow_answer):
+        assert asyncio.run(scenario()) == 1
+
+
+def test_warmer_without_schedule_or_change_query_is_not_started(caplog):
+    """
+    Test that an enabled warmer with nothing to trigger it logs a warning instead of silently idling.
+    """
+    from backend.app import api
+    with patch.dict("os.environ", {"WARMER_ENABLED": "true", "WARM_UP": "false"}), \
+            patch.object(api.answer_module, "cache", MagicMock()), \
+            patch.object(api.warmer, "schedule", []), patch.object(api.warmer, "change_query", None), \
+            patch.object(api.warmer, "run") as run:
+        with TestClient(app):
+            pass
+
+    run.assert_not_called()
+    assert "set WARMER_SCHEDULE or WARMER_CHANGE_QUERY" in caplog.text
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from src.mssql.approx import parse_aggregate_query, split_top_level
+
+
+def test_split_top_level_ignores_nested_commas():
+    assert split_top_level("region, ROUND(AVG(x), 2) AS avg_x, [a,b]") == ["region", "ROUND(AVG(x), 2) AS avg_x", "[a,b]"]
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT MIN(amount) FROM dbo.Orders",
+    "SELECT COUNT(DISTINCT customer_id) FROM dbo.Orders",
+    "SELECT region, SUM(amount) FROM dbo.Orders o JOIN dbo.Regions r ON r.id = o.region_id GROUP BY region",
+    "SELECT customer_id, SUM(amount) FROM dbo.Orders GROUP BY region",
+    "SELECT TOP 10 region, SUM(amount) FROM dbo.Orders GROUP BY region",
+    "SELECT * FROM dbo.Orders",
+    "SELECT SUM(amount) FROM dbo.Orders WHERE id IN (SELECT id FROM dbo.Big)",
+])
+def test_ineligible_queries_are_rejected(query):
+    assert parse_aggregate_query(query) is None
+
+
+def test_sample_query_rewrites_aggregates_into_moments():
+    """
+    Test that the sampled query keeps keys and filters and adds sum, sum of squares and count.
+    """
+    plan = parse_aggregate_query(
+        "SELECT o.region, AVG(o.amount) AS avg_amount, COUNT(*) AS orders FROM dbo.Orders o "
+        "WHERE o.status = 'paid' GROUP BY o.region ORDER BY avg_amount DESC"
+    )
+
+    sql = plan.sample_query(1, seed=7)
+
+    assert plan.columns == ["region", "avg_amount", "orders"]
+    assert sql == (
+        "SELECT o.region, COUNT_BIG(*) AS [__n], SUM(CAST(o.amount AS float)) AS [__s1], "
+        "SUM(SQUARE(CAST(o.amount AS float))) AS [__q1], COUNT_BIG(o.amount) AS [__c1] "
+        "FROM [dbo].[Orders] AS o TABLESAMPLE SYSTEM (1 PERCENT) REPEATABLE (7) "
+        "WHERE o.status = 'paid' GROUP BY o.region"
+    )
+
+
+def test_estimates_cover_the_true_values():
+    """
+    Test that scaled-up estimates from a 10% row sample land within their 95% bounds.
+    """
+    rng = random.Random(1)
+    values = {"east": [rng.uniform(10, 20) for _ in range(20000)],
+              "west": [rng.uniform(50, 150) for _ in range(10000)]}
+    fraction = 0.1
+    sample_rows = []
+    for region, amounts in values.items():
+        sample = [a for a in amounts if rng.random() < fraction]
+        sample_rows.append((region, len(sample), sum(sample), sum(a * a for a in sample), len(sample)))
+    plan = parse_aggregate_query(
+        "SELECT region, SUM(amount) AS total, COUNT(*) AS n FROM dbo.Orders GROUP BY region ORDER BY total DESC")
+
+    estimate = plan.estimate(["region", "__n", "__s1", "__q1", "__c1"], sample_rows, fraction)
+
+    assert estimate["columns"] == ["region", "total", "total_ci95", "n", "n_ci95"]
+    assert [row[0] for row in estimate["rows"]] == ["west", "east"]
+    for region, total, total_bound, n, n_bound in estimate["rows"]:
+        assert abs(total - sum(values[region])) <= total_bound
+        assert abs(n - len(values[region])) <= n_bound
+    assert 0 < estimate["max_relative_error"] < 0.1
@@ -0,0 +1,86 @@
+import threading
+
+from src.mssql.cache import DiskCache
+
+
+def test_values_survive_a_new_process(tmp_path):
+    """
+    Test that a second cache on the same file (as in another process) sees earlier writes.
+    """
+    path = str(tmp_path / "cache.sqlite")
+    DiskCache(path).set("nl2sql", "how many users?", "SELECT COUNT(*) FROM users")
+
+    fresh = DiskCache(path)
+
+    assert fresh.get("nl2sql", "how many users?") == "SELECT COUNT(*) FROM users"
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.get("nl2sql", "how many users?") == "SELECT COUNT(*) FROM users"
+    assert fresh.stats()["memory_hits"] == 1
+
+
+def test_namespaces_are_separate(tmp_path):
+    """
+    Test that the same key in different namespaces does not collide.
+    """
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    cache.set("result", "q", {"data": "1"})
+
+    assert cache.get("nl2sql", "q") is None
+    assert cache.get("result", "q") == {"data": "1"}
+
+
+def test_expired_entries_are_misses(tmp_path):
+    """
+    Test that entries past their TTL are not returned.
+    """
+    cache = DiskCache(str(tmp_path / "cache.sqlite"))
+    cache.set("result", "q", "old", ttl=-1)
+
+    assert cache.get("result", "q") is None
+
+
+def test_eviction_keeps_file_under_cap(tmp_path):
+    """
+    Test that least recently used entries are evicted once the size cap is exceeded.
+    """
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), max_bytes=1000, memory_items=0, evict_every=1)
+    for i in range(20):
+        cache.set("result", f"q{i}", "x" * 100)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000
+    assert cache.get("result", "q19") is not None
+    assert cache.get("result", "q0") is None
+
+
+def test_preload_warms_memory_tier(tmp_path):
+    """
+    Test that preload pulls recent entries from disk into memory.
+    """
+    path = str(tmp_path / "cache.sqlite")
+    DiskCache(path).set("result", "q", "value")
+    fresh = DiskCache(path)
+
+    assert fresh.preload() == 1
+    assert fresh.get("result", "q") == "value"
+    assert fresh.stats()["memory_hits"] == 1
+
+
+def test_concurrent_writers_share_one_file(tmp_path):
+    """
+    Test that several cache instances writing from threads at once lose no entries.
+    """
+    path = str(tmp_path / "cache.sqlite")
+    caches = [DiskCache(path) for _ in range(4)]
+
+    def write(index, cache):
+        for i in range(25):
+            cache.set("result", f"{index}-{i}", i)
+
+    threads = [threading.Thread(target=write, args=(i, c)) for i, c in enumerate(caches)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert DiskCache(path).stats()["entries"] == 100
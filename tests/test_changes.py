@@ -0,0 +1,157 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from src.mssql.changes import SubscriptionManager, TableFeed
+
+
+class ScriptedCursor:
+    """Answers each query with the first scripted response whose marker it contains."""
+
+    def __init__(self, script):
+        self.script = script
+        self.description = None
+        self.rows = []
+        self.queries = []
+
+    def execute(self, query, *params):
+        self.queries.append((query, params))
+        for marker, columns, rows in self.script:
+            if marker in query:
+                self.description = [(c,) for c in columns]
+                self.rows = list(rows() if callable(rows) else rows)
+                return self
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        return self.rows[:size]
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+def connection_factory(cursor):
+    class Connection:
+        def cursor(self):
+            return cursor
+
+    @contextmanager
+    def connection():
+        yield Connection()
+
+    return connection
+
+
+def test_change_tracking_feed_returns_changed_rows_by_key():
+    """
+    Test that a poll reads CHANGETABLE since the last version and splits keys from rows.
+    """
+    versions = iter([10, 12])
+    cursor = ScriptedCursor([
+        ("is_primary_key", ["name"], [("id",)]),
+        ("change_tracking_tables", ["x"], [(1,)]),
+        ("CURRENT_VERSION", ["v"], lambda: [(next(versions),)]),
+        ("MIN_VALID_VERSION", ["v"], [(1,)]),
+        ("CHANGETABLE", ["SYS_CHANGE_OPERATION", "id", "id", "status"],
+         [("U", 7, 7, "paid"), ("D", 8, None, None)]),
+    ])
+    feed = TableFeed.open(connection_factory(cursor), "Orders")
+
+    delta = feed.poll()
+
+    assert feed.mode == "change_tracking" and feed.version == 12
+    assert delta == {"from_version": 10, "to_version": 12, "changes": [
+        {"operation": "update", "key": {"id": 7}, "row": {"id": 7, "status": "paid"}},
+        {"operation": "delete", "key": {"id": 8}, "row": None},
+    ]}
+    assert cursor.queries[-1][1] == (10, 12)
+
+
+def test_oversized_delta_is_not_read_past_max_rows():
+    """
+    Test that a poll stops after max_rows + 1 rows and reports the delta as truncated.
+    """
+    versions = iter([10, 12])
+    cursor = ScriptedCursor([
+        ("is_primary_key", ["name"], [("id",)]),
+        ("change_tracking_tables", ["x"], [(1,)]),
+        ("CURRENT_VERSION", ["v"], lambda: [(next(versions),)]),
+        ("MIN_VALID_VERSION", ["v"], [(1,)]),
+        ("CHANGETABLE", ["SYS_CHANGE_OPERATION", "id", "id"], [("I", i, i) for i in range(100)]),
+    ])
+    feed = TableFeed.open(connection_factory(cursor), "Orders")
+    cursor.fetchall = lambda: pytest.fail("fetchall() reads the whole delta")
+
+    delta = feed.poll(max_rows=5)
+
+    assert delta == {"from_version": 10, "to_version": 12, "changes": [], "truncated": True}
+    assert feed.version == 12
+
+
+def test_rowversion_feed_is_used_without_change_tracking():
+    """
+    Test that a table with only a rowversion column is read by version range.
+    """
+    cursor = ScriptedCursor([
+        ("is_primary_key", ["name"], []),
+        ("system_type_id = 189", ["name"], [("rv",)]),
+        ("MIN_ACTIVE_ROWVERSION", ["v"], [((5).to_bytes(8, "big"),)]),
+    ])
+    feed = TableFeed.open(connection_factory(cursor), "Events")
+
+    assert feed.mode == "rowversion" and feed.version == 5
+    assert feed.poll() is None
+
+
+class FakeSession:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_notification(self, notification):
+        if self.fail:
+            raise ConnectionError("closed")
+        self.sent.append(notification.root.params)
+
+
+def test_one_poller_per_table_fans_deltas_out_to_subscribers():
+    """
+    Test that subscribers share a poller, receive each delta and gone sessions are dropped.
+    """
+    opened = []
+
+    class Feed:
+        mode = "change_tracking"
+
+        def poll(self, max_rows=None):
+            return None
+
+    def open_feed(table):
+        opened.append(table)
+        return Feed()
+
+    async def scenario():
+        manager = SubscriptionManager(open_feed, interval=60, max_rows=1)
+        first, second, gone = FakeSession(), FakeSession(), FakeSession(fail=True)
+        for session in (first, second, gone):
+            await manager.subscribe("Orders", "mssql://Orders/data", session)
+        await manager.publish("Orders", {"from_version": 1, "to_version": 2,
+                                         "changes": [{"operation": "insert"}]})
+        await manager.publish("Orders", {"from_version": 2, "to_version": 3,
+                                         "changes": [{"operation": "insert"}] * 2})
+        stats = manager.stats()
+        manager.unsubscribe("Orders", first)
+        manager.unsubscribe("Orders", second)
+        return first, stats, manager.stats()
+
+    first, stats, after = asyncio.run(scenario())
+
+    assert opened == ["Orders"]
+    assert str(first.sent[0].uri) == "mssql://Orders/data"
+    assert [p.meta.model_dump()["delta"].get("truncated") for p in first.sent] == [None, True]
+    assert stats["subscribers"] == 2 and stats["rows"] == 1
+    assert after["tables"] == 0 and after["subscribers"] == 0
@@ -0,0 +1,91 @@
+import datetime
+import decimal
+
+from src.mssql.benchmark_encoder import make_rows, run
+from src.mssql.encoder import RowEncoder, encode_rows
+
+
+def test_parallel_encoding_matches_inline_output_in_order():
+    """
+    Test that pool workers produce the same text as the inline encoding.
+    """
+    rows = make_rows(1000, 7)
+    encoder = RowEncoder(workers=2, min_rows=100, chunk_rows=64)
+    try:
+        text = encoder.encode(rows)
+    finally:
+        encoder.close()
+
+    assert text == encode_rows(rows)
+    assert encoder.stats()["parallel"] == 1
+
+
+def test_encoding_is_inline_by_default(monkeypatch):
+    """
+    Test that the worker pool is opt-in.
+    """
+    from src.mssql.encoder import encoder_from_env
+    monkeypatch.delenv("MSSQL_ENCODE_WORKERS", raising=False)
+
+    assert encoder_from_env().workers == 1
+
+
+def test_small_results_are_encoded_inline():
+    """
+    Test that results under min_rows skip the workers.
+    """
+    encoder = RowEncoder(workers=4, min_rows=10)
+    row = (1, decimal.Decimal("2.50"), datetime.datetime(2024, 1, 2, 3, 4, 5), None)
+
+    assert encoder.encode([row]) == "1,2.50,2024-01-02 03:04:05,None"
+    assert encoder.stats()["inline"] == 1
+
+
+def test_benchmark_reports_rows_per_second_per_worker_count():
+    """
+    Test that the benchmark runs each worker count and checks its output.
+    """
+    results = run(make_rows(200, 5), [1, 2], repeat=1, chunk_rows=50)
+
+    assert [r["workers"] for r in results] == [1, 2]
+    assert all(r["rows_per_second"] > 0 for r in results)
+
+
+def main_module_in_worker():
+    """Where a pool worker's __main__ came from, and whether it imported the server."""
+    import sys
+    main = sys.modules["__main__"]
+    return getattr(main, "__file__", None), "src.mssql.server" in sys.modules
+
+
+def test_workers_do_not_re_execute_the_server_script():
+    """
+    Test that running python src/mssql/server.py does not run the server's setup again in pool workers.
+    """
+    import os
+    import subprocess
+    import sys
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = os.path.join(root, "src", "mssql", "server.py")
+    probe = f"""
+import runpy, sys
+sys.path[0] = {os.path.dirname(script)!r}
+sys.path.insert(1, {root!r})
+import src.mssql.server as server
+from src.mssql.encoder import RowEncoder
+from tests.test_encoder import main_module_in_worker
+
+async def probe():
+    encoder = RowEncoder(workers=2)
+    try:
+        print(encoder._executor().submit(main_module_in_worker).result())
+    finally:
+        encoder.close()
+
+server.main = probe
+runpy.run_path({script!r}, run_name="__main__")
+"""
+    result = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "(None, False)"
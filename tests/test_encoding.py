@@ -0,0 +1,93 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.app.encoding import CompressionMiddleware, ETagMiddleware, FastJSONResponse, choose_encoding
+
+
+def make_app():
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.add_middleware(ETagMiddleware)
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/large")
+    async def large():
+        return {"rows": [[i, f"Product {i}"] for i in range(200)]}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(3):
+                yield f'{{"index": {i}}}\n' * 50
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return TestClient(app)
+
+
+def test_choose_encoding_respects_quality_values():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("") is None
+
+
+def test_large_responses_are_gzipped_and_small_ones_are_not():
+    """
+    Test that only bodies above the threshold are compressed.
+    """
+    client = make_app()
+
+    large = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert large.json()["rows"][199] == [199, "Product 199"]
+    assert "content-encoding" not in small.headers
+
+
+def test_streaming_responses_are_compressed_chunk_by_chunk():
+    """
+    Test that NDJSON streams are compressed and decode to the original lines.
+    """
+    client = make_app()
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw).decode().count("\n") == 150
+
+
+def test_if_none_match_returns_304():
+    """
+    Test that a repeated GET with the ETag gets 304 and no body.
+    """
+    client = make_app()
+
+    first = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    second = client.get("/large", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert client.get("/small").headers["etag"] != etag
+
+
+def test_compressed_responses_carry_a_weak_etag():
+    """
+    Test that the gzip and identity representations do not share a strong ETag.
+    """
+    client = make_app()
+
+    compressed = client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    assert compressed == "W/" + identity
+    assert client.get("/large", headers={"If-None-Match": identity, "Accept-Encoding": "gzip"}).status_code == 304
@@ -0,0 +1,123 @@
+import threading
+import time
+import types
+
+import pytest
+
+from backend.app.admission import PrioritySlots, current_priority
+from backend.app.llm import CircuitBreaker, CircuitOpen, LLMClient, LLMError, is_retryable
+
+
+class Overloaded(Exception):
+    status_code = 529
+
+
+class ScriptedClient:
+    """messages.create stand-in that plays back (delay, outcome) steps."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.messages = self
+
+    def create(self, **kwargs):
+        with self.lock:
+            delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+            self.calls += 1
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return types.SimpleNamespace(content=[types.SimpleNamespace(text=outcome)])
+
+
+def make_llm(client, **kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    return LLMClient(lambda: client, **kwargs)
+
+
+def test_is_retryable_classifies_overload_and_client_errors():
+    assert is_retryable(Overloaded())
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_retries_overload_errors_until_success():
+    client = ScriptedClient([(0, Overloaded()), (0, Overloaded()), (0, "SELECT 1")])
+    llm = make_llm(client, max_retries=3)
+
+    response = llm.create(model="m", messages=[])
+
+    assert response.content[0].text == "SELECT 1"
+    assert client.calls == 3
+    assert llm.stats()["retries"] == 2
+
+
+def test_non_retryable_errors_fail_immediately():
+    client = ScriptedClient([(0, ValueError("bad request"))])
+    llm = make_llm(client, max_retries=3)
+
+    with pytest.raises(LLMError):
+        llm.create(model="m", messages=[])
+    assert client.calls == 1
+
+
+def test_hedges_a_call_running_past_p95():
+    client = ScriptedClient([(0, "fast")] * 20 + [(1.0, "slow"), (0, "hedged")])
+    llm = make_llm(client, hedge_min_delay=0.05, hedge_max_ratio=1.0)
+    for _ in range(20):
+        llm.create(model="m", messages=[])
+
+    start = time.perf_counter()
+    response = llm.create(model="m", messages=[])
+    elapsed = time.perf_counter() - start
+
+    assert response.content[0].text == "hedged"
+    assert elapsed < 0.5
+    assert llm.stats()["hedges"] == 1
+    assert llm.stats()["hedge_wins"] == 1
+
+
+def test_hedged_calls_keep_the_caller_priority():
+    seen = []
+    slots = PrioritySlots(4)
+    client = ScriptedClient([(0, "ok")])
+    client.create = lambda **kwargs: seen.append(current_priority.get()) or types.SimpleNamespace(content=[])
+    llm = make_llm(client, slots=slots, hedge_min_delay=0.0)
+    llm.latency.min_samples = 0
+    llm.latency.add(1.0)
+
+    token = current_priority.set("batch")
+    try:
+        llm.create(model="m", messages=[])
+    finally:
+        current_priority.reset(token)
+
+    assert seen == ["batch"]
+
+
+def test_circuit_breaker_fails_fast_then_recovers():
+    client = ScriptedClient([(0, Overloaded())] * 3 + [(0, "ok")])
+    llm = make_llm(client, max_retries=0, breaker=CircuitBreaker(threshold=3, reset_timeout=0.1))
+    for _ in range(3):
+        with pytest.raises(LLMError):
+            llm.create(model="m", messages=[])
+
+    with pytest.raises(CircuitOpen):
+        llm.create(model="m", messages=[])
+    assert client.calls == 3
+    assert llm.stats()["circuit"] == "open"
+
+    time.sleep(0.15)
+    assert llm.create(model="m", messages=[]).content[0].text == "ok"
+    assert llm.stats()["circuit"] == "closed"
+
+
+def test_non_retryable_errors_do_not_open_the_circuit():
+    client = ScriptedClient([(0, ValueError("bad request"))] * 3 + [(0, "ok")])
+    llm = make_llm(client, max_retries=0, breaker=CircuitBreaker(threshold=3, reset_timeout=0.1))
+    for _ in range(3):
+        with pytest.raises(LLMError):
+            llm.create(model="m", messages=[])
+
+    assert llm.stats()["circuit"] == "closed"
+    assert llm.create(model="m", messages=[]).content[0].text == "ok"
@@ -0,0 +1,66 @@
+from backend import loadtest
+from backend.app import answer
+
+
+def test_percentile_nearest_rank():
+    """
+    Test that percentile uses nearest-rank over the sorted sample.
+    """
+    values = list(range(1, 101))
+    assert loadtest.percentile(values, 50) == 50
+    assert loadtest.percentile(values, 95) == 95
+    assert loadtest.percentile(values, 99) == 99
+    assert loadtest.percentile([], 99) == 0.0
+
+
+def test_run_load_test_reports_every_stage():
+    """
+    Test that a short run reports throughput and timings for each pipeline stage.
+    """
+    # Arrange
+    args = loadtest.build_parser().parse_args([
+        "--requests", "6", "--concurrency", "2",
+        "--llm-latency", "0", "--llm-token-rate", "0", "--sql-latency", "0",
+    ])
+
+    # Act
+    report = loadtest.run_load_test(args)
+
+    # Assert
+    assert report["throughput_rps"] > 0
+    assert report["stages"]["request"]["count"] == 6
+    assert report["stages"]["request"]["errors"] == 0
+    for stage in loadtest.STAGES.values():
+        assert report["stages"][stage]["count"] == 6
+
+
+def test_injected_failures_are_attributed_to_their_stage():
+    """
+    Test that failures injected into the SQL stand-in are counted against execute_sql.
+    """
+    # Arrange
+    args = loadtest.build_parser().parse_args([
+        "--requests", "4", "--concurrency", "1",
+        "--llm-latency", "0", "--llm-token-rate", "0", "--sql-latency", "0",
+        "--sql-error-rate", "1.0",
+    ])
+
+    # Act
+    report = loadtest.run_load_test(args)
+
+    # Assert
+    assert report["stages"]["execute_sql"]["errors"] == 4
+    assert report["stages"]["generate_sql"]["errors"] == 0
+
+
+def test_stubbed_backend_restores_answer_module():
+    """
+    Test that the stand-ins are removed once the load test finishes.
+    """
+    original = answer.generate_sql_from_question
+    args = loadtest.build_parser().parse_args([])
+
+    with loadtest.stubbed_backend(loadtest.StageStats(), args):
+        assert answer.generate_sql_from_question is not original
+
+    assert answer.generate_sql_from_question is original
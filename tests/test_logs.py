@@ -0,0 +1,99 @@
+import json
+import logging
+import queue
+
+from backend.app.logs import BackgroundQueueHandler, StructuredFormatter, log_event, parse_sample_rates
+
+
+def make_logger(handler):
+    logger = logging.getLogger("test_logs")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    """
+    Test that logging past the queue size returns immediately and counts drops.
+    """
+    handler = BackgroundQueueHandler(queue.Queue(maxsize=2))
+    logger = make_logger(handler)
+
+    for i in range(5):
+        log_event(logger, "step", i=i)
+
+    assert handler.stats() == {"queued": 2, "dropped": 3, "sampled_out": 0}
+
+
+def test_sampled_events_are_thinned_but_warnings_always_pass():
+    """
+    Test that a zero sample rate drops info events of that kind only.
+    """
+    handler = BackgroundQueueHandler(queue.Queue(), sample_rates=parse_sample_rates("request=0"))
+    logger = make_logger(handler)
+
+    log_event(logger, "request", path="/query")
+    log_event(logger, "request", logging.WARNING, path="/query")
+    log_event(logger, "question", question="How many orders?")
+
+    assert [r.levelno for r in list(handler.queue.queue)] == [logging.WARNING, logging.INFO]
+    assert handler.stats()["sampled_out"] == 1
+
+
+def test_fields_are_truncated_and_rendered_off_the_caller():
+    """
+    Test that long string fields are cut before queueing and other values on formatting.
+    """
+    handler = BackgroundQueueHandler(queue.Queue(), max_field_chars=20)
+    logger = make_logger(handler)
+
+    log_event(logger, "query_result", data="x" * 50, rows=list(range(50)))
+    record = handler.queue.get_nowait()
+
+    assert record.fields["data"] == "x" * 20 + "...[30 more chars]"
+    assert isinstance(record.fields["rows"], list)
+    entry = json.loads(StructuredFormatter(max_field_chars=20, json_lines=True).format(record))
+    assert entry["message"] == "query_result"
+    assert entry["rows"] == "[0, 1, 2, 3, 4, 5, 6...[170 more chars]"
+    text = StructuredFormatter(max_field_chars=20).format(record)
+    assert text.endswith("query_result data=xxxxxxxxxxxxxxxxxxxx...[30 more chars] rows=[0, 1, 2, 3, 4, 5, 6...[170 more chars]")
+
+
+def test_configure_logging_keeps_existing_handlers_and_level(monkeypatch):
+    """
+    Test that logging set up by the embedding application is left alone.
+    """
+    from backend.app import logs
+    root = logging.getLogger()
+    existing = logging.NullHandler()
+    monkeypatch.setattr(root, "handlers", [existing])
+    monkeypatch.setattr(root, "level", logging.WARNING)
+    monkeypatch.setattr(logs, "_handler", None)
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+
+    assert logs.configure_logging() is None
+    assert root.handlers == [existing] and root.level == logging.WARNING
+
+    monkeypatch.setenv("LOG_LEVEL", "debug")
+    logs.configure_logging()
+    assert root.level == logging.DEBUG
+
+
+def test_configure_logging_defaults_to_info_when_it_installs_the_handler(monkeypatch):
+    """
+    Test that the backend's INFO events are logged when nothing else set a level.
+    """
+    from backend.app import logs
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", logging.WARNING)
+    monkeypatch.setattr(logs, "_handler", None)
+    monkeypatch.setattr(logs, "_listener", None)
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+
+    handler = logs.configure_logging()
+    try:
+        assert root.handlers == [handler] and root.level == logging.INFO
+    finally:
+        logs.shutdown_logging()
@@ -0,0 +1,66 @@
+from src.mssql.memory import MemoryBudget, row_bytes
+
+
+class BatchCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetched = 0
+        self.cancelled = False
+
+    def fetchmany(self, size):
+        batch = self.rows[self.fetched:self.fetched + size]
+        self.fetched += len(batch)
+        return batch
+
+    def cancel(self):
+        self.cancelled = True
+
+
+ROWS = [(i, "x" * 100) for i in range(100)]
+
+
+def test_fetch_stops_at_the_request_budget():
+    """
+    Test that rows past the per-request budget are not fetched and the rest is cancelled.
+    """
+    budget = MemoryBudget(request_bytes=row_bytes(ROWS[0]) * 10, batch_rows=4)
+    cursor = BatchCursor(ROWS)
+
+    rows = budget.fetch(cursor)
+
+    assert len(rows) == 10 and rows.truncated == "request"
+    assert cursor.fetched == 12 and cursor.cancelled
+    stats = budget.stats()
+    assert stats["truncated_requests"] == 1 and stats["in_use_bytes"] == 0
+    assert stats["peak_request_bytes"] == stats["avg_request_bytes"] == row_bytes(ROWS[0]) * 10
+
+
+def test_queries_in_one_request_share_its_budget():
+    """
+    Test that a second query in the same request sees the bytes of the first.
+    """
+    size = row_bytes(ROWS[0])
+    budget = MemoryBudget(request_bytes=size * 15)
+
+    with budget.request():
+        first = budget.fetch(BatchCursor(ROWS[:10]))
+        second = budget.fetch(BatchCursor(ROWS[:10]))
+        assert budget.stats()["in_use_bytes"] == size * 15
+
+    assert (len(first), first.truncated) == (10, None)
+    assert (len(second), second.truncated) == (5, "request")
+    assert budget.stats()["requests"] == 1
+    assert budget.stats()["in_use_bytes"] == 0
+
+
+def test_global_budget_truncates_concurrent_requests():
+    """
+    Test that a request is cut short when other requests hold most of the global budget.
+    """
+    size = row_bytes(ROWS[0])
+    budget = MemoryBudget(global_bytes=size * 12)
+    budget.in_use = size * 10  # held by requests still in flight
+
+    rows = budget.fetch(BatchCursor(ROWS))
+
+    assert len(rows) == 2 and rows.truncated == "global"
@@ -0,0 +1,145 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.mssql import server
+from src.mssql.preview import quote_table, sample_table
+
+
+class ScriptedCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.result = []
+
+    def execute(self, sql, *params):
+        self.conn.statements.append((sql, params))
+        for fragment, columns, rows in self.conn.script:
+            if fragment in sql:
+                if isinstance(rows, Exception):
+                    raise rows
+                self.description = [(c,) for c in columns]
+                self.result = rows(params) if callable(rows) else rows
+                return self
+        raise AssertionError(f"Unexpected SQL: {sql}")
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+
+class ScriptedConnection:
+    """
+    Fake connection answering each statement with the first script entry whose fragment it contains.
+    """
+    def __init__(self, script):
+        self.script = script
+        self.statements = []
+        self.timeout = 0
+
+    def cursor(self):
+        return ScriptedCursor(self)
+
+
+def test_quote_table_escapes_identifiers():
+    """
+    Test that table names are bracket-quoted so they cannot inject SQL.
+    """
+    assert quote_table("dbo.Sales") == "[dbo].[Sales]"
+    assert quote_table("Sales]; DROP TABLE x--") == "[Sales]]; DROP TABLE x--]"
+    with pytest.raises(ValueError):
+        quote_table("a.b.c.d")
+
+
+def test_small_table_is_read_directly():
+    """
+    Test that a table smaller than the sample is returned whole with its partition-stats row count.
+    """
+    conn = ScriptedConnection([
+        ("dm_db_partition_stats", ["n"], [(3,)]),
+        ("SELECT TOP (100)", ["id"], [(1,), (2,), (3,)]),
+    ])
+
+    preview = sample_table(conn, "dbo.Small", ["id"])
+
+    assert preview["method"] == "full"
+    assert preview["approx_row_count"] == 3
+    assert preview["rows"] == [[1], [2], [3]]
+    assert not any("COUNT(*)" in sql for sql, _ in conn.statements)
+
+
+def test_large_table_uses_tablesample_with_requested_columns():
+    """
+    Test that large tables are sampled with TABLESAMPLE and only the requested columns.
+    """
+    conn = ScriptedConnection([
+        ("dm_db_partition_stats", ["n"], [(1_000_000_000,)]),
+        ("TABLESAMPLE", ["region", "amount"], [("west", i) for i in range(10)]),
+    ])
+
+    preview = sample_table(conn, "Sales", ["region", "amount"], rows=10)
+
+    sql = conn.statements[-1][0]
+    assert preview["method"] == "tablesample"
+    assert "SELECT TOP (10) [region], [amount] FROM [Sales] TABLESAMPLE SYSTEM" in sql
+    assert len(preview["rows"]) == 10
+
+
+def test_short_tablesample_falls_back_to_key_range_seeks():
+    """
+    Test that a clustered-key range sample is used when TABLESAMPLE comes back short.
+    """
+    conn = ScriptedConnection([
+        ("dm_db_partition_stats", ["n"], [(1_000_000,)]),
+        ("TABLESAMPLE", ["id"], []),
+        ("sys.indexes", ["name"], [("id",)]),
+        ("MIN([id])", ["lo", "hi"], [(1, 1_000_000)]),
+        ("WHERE [id] >= ?", ["id"], lambda params: [(params[0],)]),
+    ])
+
+    preview = sample_table(conn, "Orders", rows=10, seed=7)
+
+    assert preview["method"] == "key_range"
+    assert len(preview["rows"]) == 10
+    assert preview["rows"] == sorted(preview["rows"])
+
+
+def test_short_tablesample_is_kept_when_top_fails():
+    """
+    Test that a short TABLESAMPLE result is returned rather than an error when nothing better is found in time.
+    """
+    conn = ScriptedConnection([
+        ("dm_db_partition_stats", ["n"], [(1_000_000,)]),
+        ("TABLESAMPLE", ["id"], [(3,)]),
+        ("sys.indexes", ["name"], []),
+        ("SELECT TOP (10) * FROM [Orders]", ["id"], TimeoutError("Query timeout expired")),
+    ])
+
+    preview = sample_table(conn, "Orders", rows=10)
+
+    assert preview["method"] == "tablesample"
+    assert preview["rows"] == [[3]]
+
+
+def test_read_resource_preview_uri():
+    """
+    Test that mssql://table/preview returns the sample as JSON.
+    """
+    conn = ScriptedConnection([
+        ("dm_db_partition_stats", ["n"], [(2,)]),
+        ("SELECT TOP (5)", ["id", "name"], [(1, "a"), (2, "b")]),
+    ])
+    db = server.DBConfig({"server": "s"}, pool_size=1)
+    db.connect = lambda: conn
+
+    with patch.object(server, "db", db):
+        text = asyncio.run(server.read_resource("mssql://dbo.Products/preview?columns=id,name&rows=5"))
+
+    preview = json.loads(text)
+    assert preview["columns"] == ["id", "name"]
+    assert preview["rows"] == [[1, "a"], [2, "b"]]
+    assert preview["approx_row_count"] == 2
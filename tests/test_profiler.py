@@ -0,0 +1,143 @@
+import asyncio
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from src.mssql import server
+from src.mssql.profiler import ProfileStore, format_profile, profile_table
+from tests.test_preview import ScriptedConnection
+
+
+def sales_script(row_count=1000):
+    return [
+        ("sys.columns", ["name", "type"], [("region", "nvarchar"), ("amount", "decimal"), ("notes", "xml")]),
+        ("APPROX_COUNT_DISTINCT", ["n"], [(row_count, 3, "east", "west", 0, 900, 1, 500, 100)]),
+        ("GROUP BY [region]", ["region", "n"], [("west", 600), ("east", 300)]),
+        ("GROUP BY [amount]", ["amount", "n"], [(10, 5)]),
+        ("dm_db_partition_stats", ["name", "n"], [("dbo.Sales", row_count)]),
+    ]
+
+
+def test_profile_table_computes_column_statistics():
+    """
+    Test that one aggregate scan yields distinct counts, ranges and null fractions per column.
+    """
+    conn = ScriptedConnection(sales_script())
+
+    profile = profile_table(conn, "dbo.Sales", top_n=2)
+
+    region = profile["columns"]["region"]
+    assert region["approx_distinct"] == 3
+    assert (region["min"], region["max"]) == ("east", "west")
+    assert region["top_values"] == [["west", 600], ["east", 300]]
+    assert profile["columns"]["amount"]["null_fraction"] == 0.1
+    assert profile["columns"]["notes"] == {"type": "xml"}
+    assert "APPROX_COUNT_DISTINCT([region])" in conn.statements[1][0]
+    assert "Table dbo.Sales (~1000 rows)" in format_profile(profile)
+
+
+def test_refresh_only_reprofiles_tables_whose_row_count_changed():
+    """
+    Test that the background refresh skips tables whose partition-stats row count is unchanged.
+    """
+    store = ProfileStore()
+    conn = ScriptedConnection(sales_script())
+
+    @contextmanager
+    def connection_factory():
+        yield conn
+
+    assert store.refresh_changed(connection_factory) == ["dbo.Sales"]
+    assert store.refresh_changed(connection_factory) == []
+
+    conn.script = sales_script(row_count=1200)
+    assert store.refresh_changed(connection_factory) == ["dbo.Sales"]
+    assert store.get("dbo.Sales")["row_count"] == 1200
+
+
+def test_profile_table_tool_serves_cached_profiles():
+    """
+    Test that profile_table answers from the cache without touching the database.
+    """
+    store = ProfileStore()
+    store.put({"table": "dbo.Sales", "row_count": 10, "profiled_at": 0, "columns": {}})
+
+    with patch.object(server, "profiles", store), patch.object(server, "db") as db:
+        result = asyncio.run(server.call_tool("profile_table", {"table": "Sales"}))
+
+    assert json.loads(result[0].text)["row_count"] == 10
+    db.connection.assert_not_called()
+
+
+def test_small_row_count_changes_do_not_trigger_a_reprofile():
+    """
+    Test that the default change ratio ignores row count drift under 10%.
+    """
+    store = ProfileStore()
+    store.put({"table": "dbo.Sales", "row_count": 1000, "profiled_at": 0, "columns": {}})
+
+    assert not store.is_stale("dbo.Sales", 1050)
+    assert store.is_stale("dbo.Sales", 1200)
+
+
+def test_unqualified_names_are_found_in_the_disk_cache(tmp_path):
+    """
+    Test that a new process resolves a table name without its schema from profiles cached on disk.
+    """
+    from src.mssql.cache import DiskCache
+    path = str(tmp_path / "cache.db")
+    ProfileStore(cache=DiskCache(path)).put({"table": "dbo.Sales", "row_count": 10, "profiled_at": 0, "columns": {}})
+
+    store = ProfileStore(cache=DiskCache(path))
+
+    assert store.find("Sales")["row_count"] == 10
+    assert store.find("Orders") is None
+
+
+def test_top_values_are_skipped_when_their_query_runs_out_of_budget():
+    """
+    Test that a GROUP BY cut off by the time budget leaves that column without top values.
+    """
+    script = sales_script()
+    script[2] = ("GROUP BY [region]", ["region", "n"], TimeoutError("Query timeout expired"))
+    conn = ScriptedConnection(script)
+
+    profile = profile_table(conn, "dbo.Sales", budget=30)
+
+    assert profile["columns"]["region"]["top_values"] == []
+    assert profile["columns"]["amount"]["top_values"] == [[10, 5]]
+
+
+def test_profile_table_tool_lists_profiles_cached_by_an_earlier_process(tmp_path):
+    """
+    Test that listing every profile includes those on disk after a restart.
+    """
+    from src.mssql.cache import DiskCache
+    path = str(tmp_path / "cache.db")
+    ProfileStore(cache=DiskCache(path)).put({"table": "dbo.Sales", "row_count": 10, "profiled_at": 0, "columns": {}})
+
+    with patch.object(server, "profiles", ProfileStore(cache=DiskCache(path))):
+        result = asyncio.run(server.call_tool("profile_table", {}))
+
+    assert [p["table"] for p in json.loads(result[0].text)] == ["dbo.Sales"]
+
+
+def test_refreshing_an_unqualified_name_stores_the_schema_qualified_profile():
+    """
+    Test that profile_table with refresh and a bare table name does not add a second cache entry.
+    """
+    store = ProfileStore()
+    conn = ScriptedConnection([
+        ("OBJECT_SCHEMA_NAME", ["s", "t"], [("dbo", "Sales")]),
+        ("COALESCE(SUM(row_count), 0)", ["n"], [(1000,)]),
+    ] + sales_script())
+
+    @contextmanager
+    def connection():
+        yield conn
+
+    with patch.object(server, "profiles", store), patch.object(server.db, "connection", connection):
+        profile = server.get_profile("Sales", refresh=True)
+
+    assert profile["table"] == "dbo.Sales"
+    assert store.tables() == ["dbo.Sales"]
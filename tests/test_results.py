@@ -0,0 +1,30 @@
+from backend.app.results import ResultStore
+
+
+def test_pages_are_slices_of_the_stored_result():
+    """
+    Test that a page returns the requested window and the total row count.
+    """
+    store = ResultStore()
+    result_id = store.put(["id"], [[i] for i in range(10)])
+
+    page = store.page(result_id, 4, 3)
+
+    assert page == {"columns": ["id"], "offset": 4, "total": 10, "rows": [[4], [5], [6]]}
+    assert store.page("missing", 0, 3) is None
+
+
+def test_least_recently_read_results_are_dropped_over_the_row_budget():
+    """
+    Test that the store stays under max_rows by evicting old results.
+    """
+    store = ResultStore(max_rows=10)
+    first = store.put(["id"], [[i] for i in range(5)])
+    second = store.put(["id"], [[i] for i in range(5)])
+    store.page(first, 0, 1)
+    third = store.put(["id"], [[i] for i in range(5)])
+
+    assert store.page(second, 0, 1) is None
+    assert store.page(first, 0, 1) is not None
+    assert store.page(third, 0, 1) is not None
+    assert store.put(["id"], [[i] for i in range(11)]) is None
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+from schema_snapshot import COLUMNS_QUERY, VERSION_QUERY, SchemaSnapshot
+
+
+class FakeServer:
+    """Answers the snapshot's execute_sql calls from an in-memory schema."""
+
+    def __init__(self, tables):
+        self.tables = tables  # {(schema, name): (modified, [columns])}
+        self.queries = []
+
+    async def call_tool(self, name, arguments):
+        # Schema probes must not be answered from the result cache
+        assert arguments.get("cache") is False
+        query = arguments["query"]
+        self.queries.append(query)
+        if query == VERSION_QUERY:
+            text = f"tables,version\n{len(self.tables)},{hash(frozenset(self.tables.items()))}"
+        elif query.startswith(COLUMNS_QUERY):
+            lines = [f"{s},{n},{c}" for (s, n), (_, columns) in self.tables.items() for c in columns
+                     if "WHERE" not in query or f"'{n}'" in query]
+            text = "\n".join(["TABLE_SCHEMA,TABLE_NAME,COLUMN_NAME"] + lines)
+        else:
+            lines = [f"{s},{n},{modified}" for (s, n), (modified, _) in self.tables.items()]
+            text = "\n".join(["schema_name,name,modified"] + lines)
+        return [SimpleNamespace(text=text)]
+
+
+def test_unchanged_schema_costs_one_query(tmp_path):
+    """
+    Test that a reloaded snapshot revalidates with the version query alone.
+    """
+    path = str(tmp_path / "schema.json")
+    server = FakeServer({("dbo", "Orders"): ("2024-01-01", ("id", "amount"))})
+    changed = asyncio.run(SchemaSnapshot(path).refresh(server))
+    server.queries.clear()
+
+    snapshot = SchemaSnapshot.load(path)
+    assert asyncio.run(snapshot.refresh(server)) == []
+
+    assert changed == ["dbo.Orders"]
+    assert server.queries == [VERSION_QUERY]
+    assert snapshot.schema_info() == {"dbo.Orders": ["id", "amount"]}
+    assert snapshot.table_schemas() == {"Orders": "dbo"}
+
+
+def test_only_altered_tables_are_refetched(tmp_path):
+    """
+    Test that columns are read again only for altered tables and dropped tables are removed.
+    """
+    path = str(tmp_path / "schema.json")
+    server = FakeServer({
+        ("dbo", "Orders"): ("2024-01-01", ("id",)),
+        ("dbo", "Customers"): ("2024-01-01", ("id", "name")),
+        ("dbo", "Legacy"): ("2024-01-01", ("id",)),
+    })
+    asyncio.run(SchemaSnapshot(path).refresh(server))
+    del server.tables[("dbo", "Legacy")]
+    server.tables[("dbo", "Orders")] = ("2024-02-01", ("id", "status"))
+    server.queries.clear()
+
+    snapshot = SchemaSnapshot.load(path)
+    changed = asyncio.run(snapshot.refresh(server))
+
+    assert changed == ["dbo.Orders", "dbo.Legacy"]
+    columns_query = [q for q in server.queries if q.startswith(COLUMNS_QUERY)][0]
+    assert "'Orders'" in columns_query and "'Customers'" not in columns_query
+    assert SchemaSnapshot.load(path).schema_info() == {"dbo.Orders": ["id", "status"],
+                                                       "dbo.Customers": ["id", "name"]}
+
+
+def test_snapshot_from_another_database_is_ignored(tmp_path, monkeypatch):
+    """
+    Test that a snapshot saved for a different MSSQL_DATABASE loads empty.
+    """
+    path = str(tmp_path / "schema.json")
+    monkeypatch.setenv("MSSQL_DATABASE", "Sales")
+    asyncio.run(SchemaSnapshot(path).refresh(FakeServer({("dbo", "Orders"): ("2024-01-01", ("id",))})))
+    monkeypatch.setenv("MSSQL_DATABASE", "Inventory")
+
+    assert not SchemaSnapshot.load(path)
@@ -0,0 +1,464 @@
+import asyncio
+import json
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+from src.mssql import server
+
+
+class FakeCursor:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.queries = []
+        self.description = None
+
+    def execute(self, query, *params):
+        self.queries.append(query)
+        self.description = [(name,) for name in self.columns]
+        self.position = 0
+        return self
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchmany(self, size):
+        batch = self.rows[self.position:self.position + size]
+        self.position += len(batch)
+        return batch
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    def __init__(self, columns=("id", "name"), rows=((1, "Widget"), (2, "Gadget"))):
+        self.cursor_obj = FakeCursor(list(columns), list(rows))
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_db():
+    """
+    Replace the server's DBConfig with a fresh pool that hands out fake connections.
+    """
+    db = server.DBConfig()
+    db.pool_size = 2
+    connections = []
+
+    def connect():
+        conn = FakeConnection()
+        connections.append(conn)
+        return conn
+
+    db.connect = MagicMock(side_effect=connect)
+    with patch.object(server, "db", db):
+        yield db, connections
+
+
+def test_pool_reuses_released_connections(fake_db):
+    """
+    Test that a released connection is handed out again instead of reconnecting.
+    """
+    db, connections = fake_db
+
+    with db.connection() as first:
+        pass
+    with db.connection() as second:
+        pass
+
+    assert first is second
+    assert db.connect.call_count == 1
+
+
+def test_pool_discards_connection_after_link_failure(fake_db):
+    """
+    Test that a connection is closed rather than pooled after an OperationalError.
+    """
+    db, connections = fake_db
+    OperationalError = type("OperationalError", (Exception,), {})
+
+    with pytest.raises(OperationalError):
+        with db.connection():
+            raise OperationalError("link failure")
+
+    assert connections[0].closed
+    assert db._idle == []
+
+
+def test_pool_drops_connections_closed_while_in_use(fake_db):
+    """
+    Test that a connection closed by its user (e.g. after a failed state reset) is not pooled.
+    """
+    db, connections = fake_db
+
+    with db.connection() as conn:
+        conn.close()
+
+    assert db._idle == []
+
+
+def test_warm_up_fills_pool_and_catalog(fake_db):
+    """
+    Test that warm_up opens the pool and loads the table catalog before any request.
+    """
+    db, connections = fake_db
+    catalog = server.SchemaCatalog(ttl=300)
+
+    with patch.object(server, "catalog", catalog), patch.object(server, "_import_pyodbc"):
+        timings = server.warm_up()
+
+    assert timings["pool_count"] == 2
+    assert timings["catalog_count"] == 2
+    assert "import_ms" in timings
+    assert len(db._idle) == 2
+
+
+def test_list_resources_uses_cached_catalog(fake_db):
+    """
+    Test that list_resources serves table names from the catalog cache.
+    """
+    db, connections = fake_db
+    catalog = server.SchemaCatalog(ttl=300)
+
+    with patch.object(server, "catalog", catalog):
+        first = asyncio.run(server.list_resources())
+        second = asyncio.run(server.list_resources())
+
+    assert [str(r.uri) for r in first] == ["mssql://1/data", "mssql://2/data"]
+    assert len(second) == len(first)
+    assert len(connections[0].cursor_obj.queries) == 1
+
+
+def test_execute_sql_returns_csv(fake_db):
+    """
+    Test that execute_sql returns the header and rows as comma-separated text.
+    """
+    result = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT id, name FROM products"}))
+
+    assert result[0].text == "id,name\n1,Widget\n2,Gadget"
+
+
+@pytest.fixture
+def tenants():
+    """
+    Registry with two tenant targets whose fake connections return different rows.
+    """
+    def make_target(rows):
+        target = server.DBConfig({"server": "s", "database": "d"}, pool_size=1)
+        target.connect = MagicMock(side_effect=lambda: FakeConnection(("region", "total"), rows))
+        return target
+
+    registry = server.TargetRegistry({
+        "default": make_target([]),
+        "tenant_a": make_target([("west", 10), ("east", 5)]),
+        "tenant_b": make_target([("west", 7)]),
+    })
+    with patch.object(server, "registry", registry):
+        yield registry
+
+
+def test_registry_from_env_inherits_default_settings(monkeypatch):
+    """
+    Test that MSSQL_TARGETS entries override only the keys they name.
+    """
+    monkeypatch.setenv("MSSQL_SERVER", "primary")
+    monkeypatch.setenv("MSSQL_DATABASE", "Main")
+    monkeypatch.setenv("MSSQL_TARGETS", '{"tenant_a": {"database": "TenantA", "pool_size": 2}}')
+
+    registry = server.TargetRegistry.from_env()
+
+    assert registry.get("tenant_a").config["server"] == "primary"
+    assert registry.get("tenant_a").config["database"] == "TenantA"
+    assert registry.get("tenant_a").pool_size == 2
+    assert registry.resolve(["*"]) == ["tenant_a"]
+
+
+def test_execute_sql_fans_out_with_source_column(tenants):
+    """
+    Test that a query sent to several targets merges rows tagged with their source.
+    """
+    result = asyncio.run(server.call_tool(
+        "execute_sql", {"query": "SELECT region, total FROM sales", "targets": ["*"]}
+    ))
+
+    assert result[0].text == "_source,region,total\ntenant_a,west,10\ntenant_a,east,5\ntenant_b,west,7"
+
+
+def test_execute_sql_combines_aggregates_across_targets(tenants):
+    """
+    Test that aggregate columns are combined per group-by key across targets.
+    """
+    result = asyncio.run(server.call_tool("execute_sql", {
+        "query": "SELECT region, SUM(amount) AS total FROM sales GROUP BY region",
+        "targets": ["tenant_a", "tenant_b"],
+        "aggregate": {"total": "sum"},
+    }))
+
+    assert result[0].text == "region,total\nwest,17\neast,5"
+
+
+def test_execute_sql_reports_unknown_target(tenants):
+    """
+    Test that an unknown target name is reported as an error.
+    """
+    result = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT 1", "targets": ["nope"]}))
+
+    assert "Unknown database target: nope" in result[0].text
+
+
+def make_replicated_target(lags):
+    """
+    Primary DBConfig with one fake replica per entry in `lags` (None = unreachable).
+    """
+    primary = server.DBConfig({"server": "primary", "database": "d", "user": "u", "password": "p", "driver": "x"}, pool_size=1)
+    primary.connect = MagicMock(side_effect=lambda: FakeConnection(("server",), [("primary",)]))
+    primary.add_replicas([f"replica{i}" for i in range(len(lags))])
+    for replica, lag in zip(primary.router.replicas, lags):
+        if lag is None:
+            replica.db.connect = MagicMock(side_effect=RuntimeError("unreachable"))
+        else:
+            rows = [(lag,)]
+            replica.db.connect = MagicMock(side_effect=lambda rows=rows: FakeConnection(("lag",), rows))
+    return primary
+
+
+def test_replicas_connect_with_read_only_intent():
+    """
+    Test that replica connection strings ask for ApplicationIntent=ReadOnly.
+    """
+    primary = make_replicated_target([0])
+
+    assert "ApplicationIntent=ReadOnly" in primary.router.replicas[0].db.connection_string()
+    assert "ApplicationIntent" not in primary.connection_string()
+
+
+def test_router_prefers_lowest_latency_fresh_replica():
+    """
+    Test that queries go to the fastest replica whose lag is within the limit.
+    """
+    primary = make_replicated_target([0, 0, 120])
+    primary.router.probe_all()
+    fast, slow, stale = primary.router.replicas
+    fast.latency_ms, slow.latency_ms, stale.latency_ms = 1.0, 5.0, 0.5
+
+    assert primary.router.choose() is fast
+    with primary.connection():
+        assert fast.in_flight == 1
+    assert fast.queries == 1
+    assert stale.lag_seconds == 120
+
+
+def test_router_falls_back_to_primary():
+    """
+    Test that the primary serves reads when no replica is healthy.
+    """
+    primary = make_replicated_target([None])
+    primary.router.probe_all()
+
+    with primary.connection() as conn:
+        assert conn.cursor().execute("SELECT @@SERVERNAME").fetchone() == ("primary",)
+
+    stats = primary.router.stats()
+    assert stats["primary_queries"] == 1
+    assert stats["replicas"][0]["healthy"] is False
+    assert "unreachable" in stats["replicas"][0]["last_error"]
+
+
+def test_server_stats_tool_reports_replicas():
+    """
+    Test that server_stats exposes per-replica health.
+    """
+    registry = server.TargetRegistry({"default": make_replicated_target([0])})
+    with patch.object(server, "registry", registry):
+        server.probe_replicas()
+        result = asyncio.run(server.call_tool("server_stats", {}))
+
+    stats = json.loads(result[0].text)
+    assert stats["replicas"]["default"]["replicas"][0]["healthy"] is True
+
+
+def test_execute_sql_batch_returns_per_query_results(fake_db):
+    """
+    Test that execute_sql_batch runs every query and reports errors per item.
+    """
+    result = asyncio.run(server.call_tool("execute_sql_batch", {"queries": [
+        "SELECT id, name FROM products",
+        "DELETE FROM products",
+        "SELECT id, name FROM parts",
+    ]}))
+
+    items = json.loads(result[0].text)
+    assert [item["error"] for item in items] == [None, "Only SELECT queries are allowed", None]
+    assert items[0]["result"] == "id,name\n1,Widget\n2,Gadget"
+    assert items[2]["query"] == "SELECT id, name FROM parts"
+
+
+def test_execute_sql_batch_runs_queries_concurrently(fake_db):
+    """
+    Test that batch queries overlap on separate pooled connections.
+    """
+    db, connections = fake_db
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_query(query, target=None):
+        barrier.wait()  # only passes if both queries are running at once
+        return ["n"], [(1,)]
+
+    with patch.object(server, "run_query", side_effect=run_query):
+        items = asyncio.run(server.run_batch(["SELECT 1", "SELECT 2"]))
+
+    assert [item["error"] for item in items] == [None, None]
+
+
+def test_slow_queries_tool_ranks_logged_queries(fake_db, tmp_path):
+    """
+    Test that queries over the threshold are logged and ranked by slow_queries.
+    """
+    from src.mssql.slowlog import SlowQueryLog
+    with patch.object(server, "slow_log", SlowQueryLog(str(tmp_path / "slow.log"), threshold_ms=0)):
+        for product_id in (1, 2):
+            asyncio.run(server.call_tool("execute_sql", {"query": f"SELECT * FROM Products WHERE id = {product_id}"}))
+        content = asyncio.run(server.call_tool("slow_queries", {"limit": 5}))
+
+    top = json.loads(content[0].text)
+    assert len(top) == 1
+    assert top[0]["count"] == 2
+    assert top[0]["normalized"] == "select * from products where id = ?"
+
+
+def test_execute_sql_returns_statistics_when_requested(fake_db):
+    """
+    Test that the statistics option switches STATISTICS on and reports the figures.
+    """
+    db, connections = fake_db
+
+    content = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT * FROM Products", "statistics": True}))
+
+    assert content[0].text.startswith("id,name")
+    stats = json.loads(content[1].text)["statistics"]
+    assert stats["rows"] == 2
+    assert "elapsed_ms" in stats and "logical_reads" in stats
+    assert connections[0].cursor_obj.queries[0] == "SET STATISTICS IO, TIME ON"
+
+
+def test_execute_sql_approximate_stops_when_estimate_is_accurate(fake_db, monkeypatch):
+    """
+    Test that approximate mode returns a sampled estimate without running the exact query.
+    """
+    queries = []
+
+    def run_query(query, target=None):
+        queries.append(query)
+        return ["region", "__n"], [("east", 1_000_000)]
+
+    monkeypatch.setattr(server, "run_query", run_query)
+    monkeypatch.setattr(server, "table_row_count", lambda table: 10_000_000_000)
+    monkeypatch.setattr(server, "APPROX_STEPS", [0.1, 1])
+
+    content = asyncio.run(server.call_tool("execute_sql", {
+        "query": "SELECT region, COUNT(*) AS orders FROM dbo.Orders GROUP BY region",
+        "approximate": True,
+    }))
+
+    assert content[0].text.splitlines()[0] == "region,orders,orders_ci95"
+    summary = json.loads(content[1].text)
+    assert summary["exact"] is False
+    assert [stage["sample_percent"] for stage in summary["stages"]] == [0.1]
+    assert len(queries) == 1 and "TABLESAMPLE SYSTEM (0.1 PERCENT)" in queries[0]
+
+
+def test_execute_sql_approximate_runs_ineligible_queries_exactly(fake_db):
+    """
+    Test that a query that cannot be estimated falls back to the exact result.
+    """
+    content = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT * FROM Products", "approximate": True}))
+
+    assert content[0].text.startswith("id,name")
+    assert json.loads(content[1].text)["exact"] is True
+
+
+def test_execute_sql_marks_results_cut_short_by_the_memory_budget(fake_db):
+    """
+    Test that a result over the request budget ends in a truncation marker and is counted.
+    """
+    from src.mssql.memory import MemoryBudget, row_bytes
+    budget = MemoryBudget(request_bytes=row_bytes((1, "Widget")) + 1)
+    with patch.object(server, "memory", budget):
+        content = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT * FROM Products"}))
+
+    assert content[0].text.split("\n") == [
+        "id,name", "1,Widget", "-- TRUNCATED after 1 rows: result exceeded the request memory budget"]
+    assert budget.stats()["truncated_requests"] == 1
+
+
+def test_result_cache_is_separate_from_the_backend_and_other_databases(fake_db, tmp_path):
+    """
+    Test that a shared cache file never serves the backend's entries or another database's rows.
+    """
+    from src.mssql.cache import DiskCache
+    from backend.app import answer
+    db, connections = fake_db
+    cache = DiskCache(str(tmp_path / "cache.db"))
+    cache.set("api_result", answer.result_cache_key("SELECT * FROM Products"), {"data": "stale"})
+    other = server.DBConfig({**db.config, "database": "Other"})
+    cache.set("mcp_result", server.result_cache_key("SELECT * FROM Products", other), "id\n99")
+
+    with patch.object(server, "result_cache", cache):
+        content = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT * FROM Products"}))
+
+    assert content[0].text == "id,name\n1,Widget\n2,Gadget"
+
+
+def test_cache_false_skips_the_cached_result(fake_db, tmp_path):
+    """
+    Test that execute_sql with cache set to false queries the database and refreshes the entry.
+    """
+    from src.mssql.cache import DiskCache
+    cache = DiskCache(str(tmp_path / "cache.db"))
+    cache.set("mcp_result", server.result_cache_key("SELECT * FROM Products"), "id\n99")
+
+    with patch.object(server, "result_cache", cache):
+        content = asyncio.run(server.call_tool("execute_sql", {"query": "SELECT * FROM Products", "cache": False}))
+
+    assert content[0].text == "id,name\n1,Widget\n2,Gadget"
+    assert cache.get("mcp_result", server.result_cache_key("SELECT * FROM Products")) == content[0].text
+
+
+def test_fan_out_reports_truncated_targets_and_refuses_to_aggregate_them(tenants):
+    """
+    Test that a target cut short by the memory budget is marked in row output and
+    left out of combined aggregates.
+    """
+    from src.mssql.memory import MemoryBudget, row_bytes
+    with patch.object(server, "memory", MemoryBudget(request_bytes=row_bytes(("west", 10)) + 1)):
+        rows = asyncio.run(server.call_tool(
+            "execute_sql", {"query": "SELECT region, total FROM t", "targets": ["tenant_a"]}))
+        combined = asyncio.run(server.call_tool("execute_sql", {
+            "query": "SELECT region, SUM(total) AS total FROM t GROUP BY region",
+            "targets": ["tenant_a"], "aggregate": {"total": "sum"}}))
+
+    assert rows[0].text.endswith("-- TRUNCATED after 1 rows: result exceeded the request memory budget on tenant_a")
+    assert [c.text for c in combined] == [
+        "Error: tenant_a: result exceeded the request memory budget, not aggregated"]
+
+
+def test_finished_background_tasks_are_released():
+    """
+    Test that a background task is referenced while it runs and dropped once it finishes.
+    """
+    async def scenario():
+        task = server.start_background(asyncio.sleep(0))
+        running = task in server._background_tasks
+        await task
+        await asyncio.sleep(0)  # done callbacks run on the next loop iteration
+        return running, task in server._background_tasks
+
+    assert asyncio.run(scenario()) == (True, False)
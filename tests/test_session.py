@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from backend.app.session import Session, SessionStore, is_local_query, result_to_rows
+
+RESULT = {"data": "id,name,price,state\n1,Widget,9.99,CA\n2,Gadget,19.5,NY\n3,Doohickey,None,CA"}
+
+
+def test_result_to_rows_rejects_errors_and_ragged_csv():
+    """
+    Test that only clean tabular results are converted.
+    """
+    assert result_to_rows({"error": "boom"}) is None
+    assert result_to_rows({"count": 5}) is None
+    assert result_to_rows({"data": "a,b\n1,2,3"}) is None
+    assert result_to_rows({"data": "a,b\n1,2"}) == (["a", "b"], [["1", "2"]])
+
+
+
+def test_truncated_results_are_parsed_without_the_marker_but_not_cached():
+    """
+    Test that the memory-budget marker line is not read as a data row.
+    """
+    truncated = {"data": "id\n1\n2\n-- TRUNCATED after 2 rows: result exceeded the request memory budget"}
+
+    assert result_to_rows(truncated) == (["id"], [["1"], ["2"]])
+    assert Session(max_results=3, max_rows=100).add("all ids", "SELECT id FROM t", truncated) is None
+
+def test_session_answers_refinements_from_cached_result():
+    """
+    Test that a stored result can be sorted and filtered with typed columns.
+    """
+    session = Session(max_results=3, max_rows=100)
+    table = session.add("List products", "SELECT * FROM Products", RESULT)
+
+    by_price = session.query(f"-- session\nSELECT name FROM {table} WHERE price IS NOT NULL ORDER BY price DESC")
+    in_ca = session.query(f"SELECT COUNT(*) AS n FROM {table} WHERE state = 'CA'")
+
+    assert by_price == {"data": "name\nGadget\nWidget", "source": "session"}
+    assert in_ca["data"] == "n\n2"
+    assert "result_1 (3 rows; columns: id, name, price, state)" in session.describe()
+
+
+def test_session_queries_cannot_modify_or_attach():
+    """
+    Test that follow-up queries are read-only.
+    """
+    session = Session(max_results=3, max_rows=100)
+    table = session.add("List products", "SELECT * FROM Products", RESULT)
+
+    with pytest.raises(sqlite3.DatabaseError):
+        session.query(f"DELETE FROM {table}")
+    with pytest.raises(sqlite3.DatabaseError):
+        session.query("ATTACH DATABASE 'other.db' AS other")
+    assert session.query(f"SELECT COUNT(*) FROM {table}")["data"].endswith("3")
+
+
+def test_session_keeps_only_recent_results():
+    """
+    Test that older result tables are dropped beyond max_results.
+    """
+    session = Session(max_results=2, max_rows=100)
+    for i in range(3):
+        session.add(f"question {i}", "SELECT 1", RESULT)
+
+    assert [r["table"] for r in session.results] == ["result_2", "result_3"]
+    with pytest.raises(sqlite3.OperationalError):
+        session.query("SELECT * FROM result_1")
+
+
+def test_store_evicts_least_recently_used_sessions():
+    """
+    Test that the store is bounded by max_sessions.
+    """
+    store = SessionStore(max_sessions=2)
+    first = store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+
+    assert store.get("b", create=False) is None
+    assert store.get("a", create=False) is first
+
+
+def test_is_local_query():
+    assert is_local_query("  -- session\nSELECT * FROM result_1")
+    assert not is_local_query("SELECT * FROM Products")
+    assert not is_local_query(None)
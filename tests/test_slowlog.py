@@ -0,0 +1,174 @@
+import json
+
+import pytest
+
+from src.mssql.slowlog import SlowQueryLog, capture_statistics, fingerprint, normalize_query, parse_statistics
+
+MESSAGES = [
+    ("01000", "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]SQL Server parse and compile time: \n"
+              "   CPU time = 3 ms, elapsed time = 4 ms."),
+    ("01000", "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]Table 'Products'. Scan count 1, "
+              "logical reads 120, physical reads 2, page server reads 0, read-ahead reads 0."),
+    ("01000", "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]Table 'Orders'. Scan count 3, "
+              "logical reads 30, physical reads 0, read-ahead reads 0."),
+    ("01000", "[Microsoft][ODBC Driver 17 for SQL Server][SQL Server]\n SQL Server Execution Times:\n"
+              "   CPU time = 15 ms,  elapsed time = 42 ms."),
+]
+
+
+class StatisticsCursor:
+    """Cursor that reports STATISTICS messages the way pyodbc does."""
+
+    def __init__(self):
+        self.queries = []
+        self.messages = []
+        self.description = None
+        self.sets = 0
+
+    def execute(self, query, *params):
+        self.queries.append(query)
+        self.description = [("id",)]
+        self.messages = MESSAGES[:3] if not query.startswith("SET") else []
+        self.sets = 1
+        return self
+
+    def fetchall(self):
+        return [(1,), (2,)]
+
+    def nextset(self):
+        if self.sets:
+            self.sets -= 1
+            self.messages = MESSAGES[3:]
+            return True
+        return False
+
+
+class StatisticsConnection:
+    def __init__(self):
+        self.cursor_obj = StatisticsCursor()
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+def test_fingerprint_ignores_literals_comments_and_whitespace():
+    """
+    Test that queries differing only in constants share a fingerprint.
+    """
+    first = "SELECT * FROM dbo.Orders WHERE id = 42 AND name = 'Widget' -- lookup"
+    second = "select *\n  from dbo.Orders where id = 7 and name = N'Gadget'"
+    third = "SELECT * FROM dbo.Orders2 WHERE id IN (1, 2, 3)"
+
+    assert fingerprint(first) == fingerprint(second)
+    assert fingerprint(first) != fingerprint(third)
+    assert normalize_query(third) == "select * from dbo.orders2 where id in (?)"
+
+
+def test_parse_statistics_sums_times_and_reads():
+    """
+    Test that STATISTICS IO, TIME messages are parsed into totals.
+    """
+    stats = parse_statistics(MESSAGES)
+
+    assert stats["compile_ms"] == 4
+    assert stats["cpu_ms"] == 15
+    assert stats["server_elapsed_ms"] == 42
+    assert stats["logical_reads"] == 150
+    assert stats["physical_reads"] == 2
+    assert stats["tables"] == {"Products": 120, "Orders": 30}
+
+
+def test_capture_statistics_collects_messages_from_every_result_set():
+    """
+    Test that statistics are switched on around the query and messages after
+    the last result set are included.
+    """
+    conn = StatisticsConnection()
+
+    columns, rows, stats = capture_statistics(conn, "SELECT id FROM dbo.Products")
+
+    assert columns == ["id"]
+    assert rows == [(1,), (2,)]
+    assert stats["logical_reads"] == 150
+    assert stats["server_elapsed_ms"] == 42
+    assert conn.cursor_obj.queries[0] == "SET STATISTICS IO, TIME ON"
+    assert conn.cursor_obj.queries[-1] == "SET STATISTICS IO, TIME OFF"
+
+
+def test_failed_statistics_reset_keeps_the_query_error_and_closes_the_connection():
+    """
+    Test that an error switching statistics off neither hides the query's error nor leaves the connection usable.
+    """
+    conn = StatisticsConnection()
+    conn.closed = False
+    executed = conn.cursor_obj.execute
+
+    def execute(query, *params):
+        if query == "SET STATISTICS IO, TIME OFF":
+            raise RuntimeError("Communication link failure")
+        if query.startswith("SELECT"):
+            raise ValueError("Invalid column name 'nope'")
+        return executed(query, *params)
+
+    def close():
+        conn.closed = True
+
+    conn.cursor_obj.execute = execute
+    conn.close = close
+
+    with pytest.raises(ValueError, match="Invalid column name"):
+        capture_statistics(conn, "SELECT nope FROM dbo.Products")
+    assert conn.closed
+
+
+def test_capture_statistics_skips_later_result_sets_after_a_budget_cancel():
+    """
+    Test that a fetch cut short by the memory budget is not followed by nextset() on the
+    cancelled statement.
+    """
+    from src.mssql.memory import MemoryBudget, row_bytes
+    conn = StatisticsConnection()
+    conn.cursor_obj.fetchmany = lambda size: [(1,), (2,)][:size]
+    conn.cursor_obj.cancel = lambda: None
+    conn.cursor_obj.nextset = lambda: pytest.fail("nextset() called after cancel")
+    budget = MemoryBudget(request_bytes=row_bytes((1,)))
+
+    columns, rows, stats = capture_statistics(conn, "SELECT id FROM dbo.Products", fetch=budget.fetch)
+
+    assert rows == [(1,)] and rows.truncated == "request"
+    assert stats["logical_reads"] == 150
+    assert conn.cursor_obj.queries[-1] == "SET STATISTICS IO, TIME OFF"
+
+
+def test_slow_log_records_only_slow_queries_and_ranks_fingerprints(tmp_path):
+    """
+    Test that fast queries are skipped and top() aggregates by fingerprint.
+    """
+    log = SlowQueryLog(str(tmp_path / "slow.log"), threshold_ms=100)
+
+    assert not log.record("SELECT 1", {"elapsed_ms": 5})
+    log.record("SELECT * FROM Orders WHERE id = 1", {"elapsed_ms": 300, "cpu_ms": 20, "logical_reads": 10})
+    log.record("SELECT * FROM Orders WHERE id = 2", {"elapsed_ms": 500, "cpu_ms": 30, "logical_reads": 10})
+    log.record("SELECT * FROM Products", {"elapsed_ms": 700})
+
+    top = log.top()
+
+    assert [group["count"] for group in top] == [2, 1]
+    assert top[0]["total_ms"] == 800
+    assert top[0]["avg_ms"] == 400
+    assert top[0]["logical_reads"] == 20
+    assert log.top(sort_by="max_ms")[0]["sample"] == "SELECT * FROM Products"
+
+
+def test_slow_log_reads_rotated_files(tmp_path):
+    """
+    Test that entries in rotated backups still count towards the ranking.
+    """
+    path = tmp_path / "slow.log"
+    log = SlowQueryLog(str(path), threshold_ms=0, max_bytes=200, backup_count=5)
+    for i in range(6):
+        log.record(f"SELECT * FROM Orders WHERE id = {i}", {"elapsed_ms": 100})
+
+    assert (tmp_path / "slow.log.1").exists()
+    assert log.top()[0]["count"] == 6
+    assert all(json.loads(line)["fingerprint"] for line in path.read_text().splitlines())
@@ -0,0 +1,60 @@
+import datetime
+from unittest.mock import patch
+
+import pytest
+
+from backend.app.admission import current_priority
+from backend.app.warmer import AnswerWarmer, QuestionStats, next_run, parse_schedule
+
+
+def test_question_stats_rank_by_normalized_question():
+    """
+    Test that differently spaced or cased repeats count as one question.
+    """
+    stats = QuestionStats()
+    for question in ["How many orders?", "how many  orders?", "HOW MANY ORDERS?", "List customers"]:
+        stats.record(question)
+
+    assert stats.top(5) == [("How many orders?", 3), ("List customers", 1)]
+    assert stats.top(5, min_count=2) == [("How many orders?", 3)]
+
+
+def test_schedule_finds_next_time_today_or_tomorrow():
+    schedule = parse_schedule("12:00, 06:30")
+    morning = datetime.datetime(2026, 3, 2, 7, 0)
+    night = datetime.datetime(2026, 3, 2, 23, 0)
+
+    assert schedule == [(6, 30), (12, 0)]
+    assert next_run(schedule, morning) == datetime.datetime(2026, 3, 2, 12, 0)
+    assert next_run(schedule, night) == datetime.datetime(2026, 3, 3, 6, 30)
+    with pytest.raises(ValueError):
+        parse_schedule("25:00")
+
+
+def test_warm_precomputes_top_questions_at_batch_priority():
+    """
+    Test that the warmer answers the popular questions and tolerates failures.
+    """
+    stats = QuestionStats()
+    for question in ["How many orders?"] * 3 + ["Broken question"] * 2 + ["Rare question"]:
+        stats.record(question)
+    seen = []
+
+    def warm_answer(question, ttl):
+        seen.append((question, current_priority.get()))
+        if question == "Broken question":
+            raise RuntimeError("boom")
+
+    with patch("backend.app.answer.warm_answer", side_effect=warm_answer):
+        summary = AnswerWarmer(stats, top_n=10, min_count=2).warm()
+
+    assert seen == [("How many orders?", "batch"), ("Broken question", "batch")]
+    assert summary["warmed"] == 1 and summary["failed"] == 1
+
+
+def test_data_changed_compares_successive_results():
+    warmer = AnswerWarmer(QuestionStats(), change_query="SELECT MAX(modified) FROM dbo.Orders")
+    versions = iter([{"data": "v1"}, {"data": "v1"}, {"data": "v2"}])
+
+    with patch("backend.app.answer.execute_sql_query", side_effect=lambda q, refresh: next(versions)):
+        assert [warmer.data_changed() for _ in range(3)] == [False, False, True]